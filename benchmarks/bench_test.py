@@ -21,7 +21,11 @@ import gym
 import pytest
 
 from compiler_gym.envs import CompilerEnv, LlvmEnv, llvm
-from compiler_gym.service import CompilerGymServiceConnection
+from compiler_gym.service import (
+    CompilerGymServiceConnection,
+    ConnectionOpts,
+    ServicePool,
+)
 from tests.test_main import main
 
 pytest_plugins = ["tests.pytest_plugins.llvm"]
@@ -51,10 +55,23 @@ def action_name(request) -> str:
     yield request.param
 
 
+def get_uncached_observation(env: CompilerEnv, observation_space: str):
+    """Compute an observation in the service, rather than returning the
+    observation cached by a previous call.
+    """
+    env.observation.invalidate()
+    return env.observation[observation_space]
+
+
 def test_make_local(benchmark):
     benchmark(lambda: gym.make("llvm-v0").close())
 
 
+def test_make_pooled(benchmark):
+    with ServicePool(llvm.LLVM_SERVICE_BINARY, size=2) as pool:
+        benchmark(lambda: gym.make("llvm-v0", service_pool=pool).close())
+
+
 def test_make_service(benchmark):
     service = CompilerGymServiceConnection(llvm.LLVM_SERVICE_BINARY)
     try:
@@ -81,12 +98,49 @@ def test_observation(
     benchmark, env: CompilerEnv, fast_benchmark_name, observation_space
 ):
     env.reset(fast_benchmark_name)
-    benchmark(lambda: env.observation[observation_space])
+    benchmark(lambda: get_uncached_observation(env, observation_space))
+
+
+@pytest.mark.parametrize("observation_name", ["Ir", "Programl"])
+@pytest.mark.parametrize("unix_socket", [False, True], ids=["tcp", "unix"])
+def test_observation_transport(
+    benchmark, fast_benchmark_name, observation_name, unix_socket
+):
+    """Compare the cost of large observations over TCP and unix sockets."""
+    env = gym.make(
+        "llvm-v0",
+        connection_settings=ConnectionOpts(local_service_unix_socket=unix_socket),
+    )
+    try:
+        env.reset(fast_benchmark_name)
+        benchmark(lambda: get_uncached_observation(env, observation_name))
+    finally:
+        env.close()
+
+
+@pytest.mark.parametrize("step_stream", [False, True], ids=["unary", "stream"])
+def test_step_transport(benchmark, fast_benchmark_name, step_stream):
+    """Compare the cost of cheap steps using unary calls and a step stream."""
+    env = gym.make(
+        "llvm-v0",
+        connection_settings=ConnectionOpts(step_stream=step_stream),
+    )
+    try:
+        env.reset(fast_benchmark_name)
+        action = env.action_space.flags.index("-mem2reg")
+        benchmark(env.step, action)
+    finally:
+        env.close()
 
 
 def test_reward(benchmark, env: CompilerEnv, benchmark_name, reward_space):
     env.reset(benchmark_name)
-    benchmark(lambda: env.reward[reward_space])
+
+    def get_uncached_reward():
+        env.observation.invalidate()
+        return env.reward[reward_space]
+
+    benchmark(get_uncached_reward)
 
 
 def test_fork(benchmark, env: CompilerEnv, benchmark_name):
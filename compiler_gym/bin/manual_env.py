@@ -556,6 +556,25 @@ The 'tutorial' command will give a step by step guide."""
                     f"Warning previous reward at {i}: {hist.action_name} was {hist.reward:.6f} now {reward:.6f}"
                 )
 
+    def snapshot(self):
+        """Save the state of the environment, or return None if the
+        environment does not support snapshots."""
+        try:
+            return self.env.snapshot()
+        except NotImplementedError:
+            return None
+
+    def restore_or_rerun_stack(self, snapshot):
+        """Restore the state of the actions on the stack from a snapshot, or
+        rerun the stack if the snapshot is not available."""
+        if snapshot is not None and self.env.in_episode:
+            try:
+                self.env.restore(snapshot)
+                return
+            except ValueError:
+                pass
+        self.rerun_stack()
+
     def do_hill_climb(self, arg):
         """Do some steps of hill climbing.
         A random action is taken, but only accepted if it has a positive reward.
@@ -582,6 +601,7 @@ The 'tutorial' command will give a step by step guide."""
                 index = random.randrange(self.env.action_space.n)
                 action = self.env.action_space.names[index]
 
+                snapshot = self.snapshot()
                 observation, reward, done, info = self.env.step(index)
 
                 accept = not done and (reward is not None) and (reward > 0)
@@ -595,7 +615,7 @@ The 'tutorial' command will give a step by step guide."""
                     cum_reward += reward
                 else:
                     # Basically undo
-                    self.rerun_stack()
+                    self.restore_or_rerun_stack(snapshot)
 
                 print(
                     f"Step: {i+1} Action: {action} Reward: {reward:.6f} Accept: {accept}"
@@ -609,14 +629,15 @@ The 'tutorial' command will give a step by step guide."""
     def get_action_rewards(self):
         """Get all the rewards for the possible actions at this point"""
         items = []
+        snapshot = self.snapshot()
         for index, action in enumerate(self.env.action_space.names):
-            self.rerun_stack()
+            self.restore_or_rerun_stack(snapshot)
             observation, reward, done, info = self.env.step(index)
             hist = ActionHistoryElement(action, index, observation, reward, done, info)
             items.append(hist)
             print(f"Action: {action} Reward: {reward:.6f}")
 
-        self.rerun_stack()
+        self.restore_or_rerun_stack(snapshot)
         items.sort(key=lambda h: h.reward, reverse=True)
         return items
 
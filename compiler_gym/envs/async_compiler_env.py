@@ -0,0 +1,237 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""This module defines an asyncio interface to compiler environments."""
+from typing import Iterable, Optional, Union
+
+from compiler_gym.datasets import Benchmark
+from compiler_gym.envs.compiler_env import CompilerEnv, step_t
+from compiler_gym.service import (
+    ServiceError,
+    ServiceOSError,
+    ServiceTransportError,
+    observation_t,
+)
+from compiler_gym.service.connection import AsyncServiceConnection
+from compiler_gym.service.proto import (
+    EndSessionReply,
+    EndSessionRequest,
+    ForkSessionReply,
+    ForkSessionRequest,
+    StepReply,
+    StepRequest,
+)
+from compiler_gym.views import AsyncObservationView
+
+
+class AsyncCompilerEnv(object):
+    """An asyncio interface to a :class:`CompilerEnv
+    <compiler_gym.envs.CompilerEnv>`.
+
+    An AsyncCompilerEnv wraps a compiler environment and replaces its blocking
+    :meth:`reset() <compiler_gym.envs.CompilerEnv.reset>`, :meth:`step()
+    <compiler_gym.envs.CompilerEnv.step>`, :meth:`fork()
+    <compiler_gym.envs.CompilerEnv.fork>`, and :code:`observation` methods
+    with coroutines that are backed by a :code:`grpc.aio` channel to the same
+    service. This allows many environments to be driven from a single event
+    loop without a thread per environment.
+
+    Example usage:
+
+    .. code-block:: python
+
+        async def run_episode(env: AsyncCompilerEnv):
+            await env.reset(benchmark="cBench-v1/crc32")
+            for _ in range(100):
+                _, _, done, _ = await env.step(env.action_space.sample())
+                if done:
+                    break
+            return await env.observation["IrInstructionCount"]
+
+        async def main():
+            envs = [AsyncCompilerEnv(gym.make("llvm-v0")) for _ in range(10)]
+            try:
+                return await asyncio.gather(*[run_episode(env) for env in envs])
+            finally:
+                await asyncio.gather(*[env.close() for env in envs])
+
+    Other attributes, such as :code:`action_space`, :code:`reward_space`, and
+    :code:`actions`, are read from the wrapped environment. Configure the
+    environment, e.g. to set the observation or reward space, through the
+    :code:`env` attribute.
+
+    Starting a service, and reward spaces that compute additional observations
+    on the first step of an episode, still use blocking calls.
+
+    An AsyncCompilerEnv must be created from within a running event loop.
+
+    :ivar env: The wrapped environment.
+    :vartype env: CompilerEnv
+
+    :ivar observation: A view of the available observation spaces that
+        computes observations asynchronously.
+    :vartype observation: compiler_gym.views.AsyncObservationView
+    """
+
+    def __init__(self, env: CompilerEnv):
+        """Constructor.
+
+        :param env: The environment to wrap. The AsyncCompilerEnv takes
+            ownership of the environment, and closes it on :meth:`close()`.
+        """
+        self.env = env
+        self._connection: Optional[AsyncServiceConnection] = None
+        self.observation = AsyncObservationView(env.observation, self._get_observation)
+
+    def __getattr__(self, name: str):
+        # Delegate to the wrapped environment for any attribute that is not
+        # defined here. Access through __dict__ to prevent infinite recursion
+        # if called before the constructor has set self.env.
+        return getattr(self.__dict__["env"], name)
+
+    def __repr__(self):
+        return f"AsyncCompilerEnv({self.env})"
+
+    async def _get_connection(self) -> AsyncServiceConnection:
+        """Return an asyncio connection to the environment's service, creating
+        one if the service has changed since the last call.
+        """
+        # pylint: disable=protected-access
+        self.env._ensure_service()
+        url = self.env.service.connection.url
+        if self._connection is None or self._connection.url != url:
+            if self._connection:
+                await self._connection.close()
+            self._connection = AsyncServiceConnection(
+                url, opts=self.env._connection_settings, logger=self.env.logger
+            )
+        return self._connection
+
+    async def _get_observation(self, request: StepRequest) -> StepReply:
+        connection = await self._get_connection()
+        return await connection(connection.stub.Step, request)
+
+    async def reset(
+        self,
+        benchmark: Optional[Union[str, Benchmark]] = None,
+        action_space: Optional[str] = None,
+        retry_count: int = 0,
+    ) -> Optional[observation_t]:
+        """Reset the environment state.
+
+        See :meth:`CompilerEnv.reset() <compiler_gym.envs.CompilerEnv.reset>`.
+
+        :return: The initial observation.
+        """
+        # pylint: disable=protected-access
+        env = self.env
+        connection = await self._get_connection()
+        env.action_space_name = action_space or env.action_space_name
+
+        # Stop an existing episode.
+        if env.in_episode:
+            await connection(
+                connection.stub.EndSession,
+                EndSessionRequest(session_id=env._session_id),
+            )
+            env._session_id = None
+
+        try:
+            reply = await connection(
+                connection.stub.StartSession,
+                env._make_start_session_request(benchmark),
+            )
+        except (ServiceError, ServiceTransportError, TimeoutError) as e:
+            # Abort and retry on error.
+            env._reset_error(e, retry_count)
+            return await self.reset(
+                benchmark=benchmark,
+                action_space=action_space,
+                retry_count=retry_count + 1,
+            )
+
+        return env._process_start_session_reply(reply)
+
+    async def step(self, action: Union[int, Iterable[int]]) -> step_t:
+        """Take a step.
+
+        See :meth:`CompilerEnv.step() <compiler_gym.envs.CompilerEnv.step>`.
+
+        :param action: An action, or a sequence of actions.
+        :return: A tuple of observation, reward, done, and info.
+        """
+        # pylint: disable=protected-access
+        env = self.env
+        assert env.in_episode, "Must call reset() before step()"
+        request, observation_spaces = env._make_step_request(action)
+
+        connection = await self._get_connection()
+        try:
+            reply = await connection(connection.stub.Step, request)
+        except (ServiceError, ServiceTransportError, ServiceOSError, TimeoutError) as e:
+            return env._step_error(e)
+
+        return env._process_step_reply(action, reply, observation_spaces)
+
+    async def fork(self) -> "AsyncCompilerEnv":
+        """Fork a new environment with exactly the same state.
+
+        See :meth:`CompilerEnv.fork() <compiler_gym.envs.CompilerEnv.fork>`.
+
+        :return: A new environment instance.
+        """
+        # pylint: disable=protected-access
+        env = self.env
+        if not env.in_episode:
+            # Recovering from a dead parent service requires replaying the
+            # episode, which is done by the blocking implementation.
+            return AsyncCompilerEnv(env.fork())
+
+        connection = await self._get_connection()
+        reply: ForkSessionReply = await connection(
+            connection.stub.ForkSession,
+            ForkSessionRequest(session_id=env._session_id),
+        )
+        return AsyncCompilerEnv(env._make_fork(reply.session_id))
+
+    async def close(self) -> None:
+        """Close the environment.
+
+        See :meth:`CompilerEnv.close() <compiler_gym.envs.CompilerEnv.close>`.
+        """
+        # pylint: disable=protected-access
+        env = self.env
+        close_service, service_healthy = True, True
+        if env.in_episode and self._connection:
+            try:
+                reply: EndSessionReply = await self._connection(
+                    self._connection.stub.EndSession,
+                    EndSessionRequest(session_id=env._session_id),
+                )
+                # The service still has other sessions attached so we should
+                # not kill it.
+                if reply.remaining_sessions:
+                    close_service = False
+            except:  # noqa pylint: disable=bare-except
+                # The session may still be open, so the connection must not
+                # be reused.
+                service_healthy = False
+            env._session_id = None
+
+        if self._connection:
+            await self._connection.close()
+            self._connection = None
+
+        if env.in_episode:
+            # No asyncio connection was ever made, so fall back to the blocking
+            # implementation to end the session.
+            env.close()
+        else:
+            env._release_service(close_service, service_healthy)
+
+    async def __aenter__(self) -> "AsyncCompilerEnv":
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
@@ -7,13 +7,27 @@ import logging
 import numbers
 import os
 import sys
+import threading
 import warnings
+from collections import OrderedDict
 from collections.abc import Iterable as IterableType
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from copy import deepcopy
 from math import isclose
 from pathlib import Path
 from time import time
-from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
 import fasteners
 import gym
@@ -26,11 +40,18 @@ from compiler_gym.service import (
     CompilerGymServiceConnection,
     ConnectionOpts,
     ServiceError,
+    ServiceIsClosed,
     ServiceOSError,
+    ServicePool,
     ServiceTransportError,
     observation_t,
 )
-from compiler_gym.service.proto import AddBenchmarkRequest
+from compiler_gym.service.connection import StepStream
+from compiler_gym.service.proto import (
+    AddBenchmarkRequest,
+    BatchStepReply,
+    BatchStepRequest,
+)
 from compiler_gym.service.proto import Benchmark as BenchmarkProto
 from compiler_gym.service.proto import (
     EndSessionReply,
@@ -40,7 +61,12 @@ from compiler_gym.service.proto import (
     GetBenchmarksRequest,
     GetVersionReply,
     GetVersionRequest,
+    RestoreSessionRequest,
+    SnapshotSessionReply,
+    SnapshotSessionRequest,
+    StartSessionReply,
     StartSessionRequest,
+    StepReply,
     StepRequest,
 )
 from compiler_gym.spaces import NamedDiscrete, Reward
@@ -48,6 +74,7 @@ from compiler_gym.util.debug_util import get_logging_level
 from compiler_gym.util.timer import Timer
 from compiler_gym.validation_result import ValidationError, ValidationResult
 from compiler_gym.views import ObservationSpaceSpec, ObservationView, RewardView
+from compiler_gym.views.observation_space_spec import release_shared_memory_buffers
 
 # Type hints.
 info_t = Dict[str, Any]
@@ -81,6 +108,21 @@ class DefaultRewardFromObservation(Reward):
         return reward
 
 
+# The maximum number of snapshots whose client-side state is kept. This matches
+# the number of snapshots that the LLVM service keeps per session.
+_MAX_SNAPSHOTS = 64
+
+
+class _EpisodeSnapshot(NamedTuple):
+    """The client-side episode state saved by CompilerEnv.snapshot()."""
+
+    actions: List[int]
+    episode_reward: Optional[float]
+    reward_spaces: Dict[str, Reward]
+    service_side_reward_spaces: Set[str]
+    client_side_reward_spaces: Set[str]
+
+
 class CompilerEnv(gym.Env):
     """An OpenAI gym environment for compiler optimizations.
 
@@ -160,6 +202,7 @@ class CompilerEnv(gym.Env):
         action_space: Optional[str] = None,
         connection_settings: Optional[ConnectionOpts] = None,
         service_connection: Optional[CompilerGymServiceConnection] = None,
+        service_pool: Optional[ServicePool] = None,
         logger: Optional[logging.Logger] = None,
     ):
         """Construct and initialize a CompilerGym service environment.
@@ -196,9 +239,15 @@ class CompilerEnv(gym.Env):
         :param action_space: The name of the action space to use. If not
             specified, the default action space for this compiler is used.
         :param connection_settings: The settings used to establish a connection
-            with the remote service.
+            with the remote service. If not provided and a
+            :code:`service_pool` is used, the pool's settings are used.
         :param service_connection: An existing compiler gym service connection
             to use.
+        :param service_pool: A pool of service connections to lease from. If
+            provided, a connection is acquired from the pool rather than
+            started, and is returned to the pool when the environment is
+            closed. The pool must have been created for the same
+            :code:`service` endpoint.
         :param logger: The logger to use for this environment. If not provided,
             a :code:`compiler_gym.envs` logger is used and assigned the
             verbosity returned by
@@ -207,6 +256,8 @@ class CompilerEnv(gym.Env):
             found.
         :raises TimeoutError: If the compiler service fails to initialize
             within the parameters provided in :code:`connection_settings`.
+        :raises ValueError: If :code:`service_pool` was created for a different
+            service endpoint.
         """
         self.metadata = {"render.modes": ["human", "ansi"]}
 
@@ -220,17 +271,33 @@ class CompilerEnv(gym.Env):
         self._session_id: Optional[int] = None
 
         self._service_endpoint: Union[str, Path] = service
-        self._connection_settings = connection_settings or ConnectionOpts()
+        self._connection_settings = connection_settings or (
+            service_pool.opts if service_pool else ConnectionOpts()
+        )
+        if service_pool and str(service_pool.endpoint) != str(service):
+            raise ValueError(
+                f"Service pool endpoint {service_pool.endpoint} does not match "
+                f"environment service {service}"
+            )
+        self._service_pool = service_pool
         self.datasets_site_path: Optional[Path] = None
         self.available_datasets: Dict[str, LegacyDataset] = {}
 
         self.action_space_name = action_space
 
-        self.service = service_connection or CompilerGymServiceConnection(
-            endpoint=self._service_endpoint,
-            opts=self._connection_settings,
-            logger=self.logger,
-        )
+        # A stream of step calls, opened lazily if enabled by the connection
+        # settings.
+        self._step_stream: Optional[StepStream] = None
+        # A single worker thread that runs the steps submitted by
+        # step_async(), in order. Created lazily.
+        self._step_executor: Optional[ThreadPoolExecutor] = None
+        self._step_worker_thread: Optional[threading.Thread] = None
+        self._last_step_future: Optional[Future] = None
+        # Held while a step request is built and sent by step_async(), and
+        # while the worker thread updates the environment state with the
+        # result of a step.
+        self._step_lock = threading.Lock()
+        self.service = service_connection or self._new_service_connection()
 
         # If no reward space is specified, generate some from numeric observation spaces
         rewards = rewards or [
@@ -279,6 +346,7 @@ class CompilerEnv(gym.Env):
             spaces=self.service.observation_spaces,
         )
         self.reward = self._reward_view_type(rewards, self.observation)
+        self.reward.get_service_reward = self._get_service_reward
 
         # Lazily evaluated version strings.
         self._versions: Optional[GetVersionReply] = None
@@ -290,6 +358,9 @@ class CompilerEnv(gym.Env):
         self.episode_reward: Optional[float] = None
         self.episode_start_time: float = time()
         self.actions: List[int] = []
+        # The episode state of each snapshot of the current session, keyed by
+        # snapshot ID and ordered from least to most recently used.
+        self._snapshots: "OrderedDict[int, _EpisodeSnapshot]" = OrderedDict()
 
         # Initialize the default observation/reward spaces.
         self._default_observation_space: Optional[ObservationSpaceSpec] = None
@@ -560,6 +631,7 @@ class CompilerEnv(gym.Env):
 
         :return: A new environment instance.
         """
+        self._wait_for_pending_steps()
         if not self.in_episode:
             if self.actions:
                 state_to_replay = self.state
@@ -574,18 +646,27 @@ class CompilerEnv(gym.Env):
 
         request = ForkSessionRequest(session_id=self._session_id)
         reply: ForkSessionReply = self.service(self.service.stub.ForkSession, request)
+        return self._make_fork(reply.session_id)
+
+    def _make_fork(self, session_id: int) -> "CompilerEnv":
+        """Create a new environment that shares this environment's service
+        connection and adopts the given forked session.
 
+        :param session_id: The ID of a session created by a ForkSession call.
+        :return: A new environment instance.
+        """
         # Create a new environment that shares the connection.
         new_env = type(self)(
             service=self._service_endpoint,
             action_space=self.action_space,
             connection_settings=self._connection_settings,
             service_connection=self.service,
+            service_pool=self._service_pool,
         )
 
         # Set the session ID.
-        new_env._session_id = reply.session_id  # pylint: disable=protected-access
-        new_env.observation.session_id = reply.session_id
+        new_env._session_id = session_id  # pylint: disable=protected-access
+        new_env.observation.session_id = session_id
 
         # Re-register any custom benchmarks with the new environment.
         if self._custom_benchmarks:
@@ -608,6 +689,8 @@ class CompilerEnv(gym.Env):
         # Create copies of the mutable reward and observation spaces. This
         # is required to correctly calculate incremental updates.
         new_env.reward.spaces = deepcopy(self.reward.spaces)
+        new_env.reward.service_side_spaces = self.reward.service_side_spaces.copy()
+        new_env.reward.client_side_spaces = self.reward.client_side_spaces.copy()
         new_env.observation.spaces = deepcopy(self.observation.spaces)
 
         # Set the default observation and reward types. Note the use of IDs here
@@ -624,11 +707,113 @@ class CompilerEnv(gym.Env):
 
         return new_env
 
+    def snapshot(self) -> int:
+        """Save the current state of the environment.
+
+        The returned ID can be passed to :meth:`restore()
+        <compiler_gym.envs.CompilerEnv.restore>` to return the environment to
+        this state without replaying the episode's actions. This is useful for
+        backtracking search:
+
+        >>> env.reset()
+        >>> snapshot = env.snapshot()
+        >>> for action in range(env.action_space.n):
+        ...     env.restore(snapshot)
+        ...     env.step(action)
+
+        Snapshots are valid until the end of the episode. Only a bounded number
+        of the most recently used snapshots are kept, and restoring a
+        discarded snapshot raises :code:`ValueError`.
+
+        :meth:`reset() <compiler_gym.envs.CompilerEnv.reset>` must be called
+        before :code:`snapshot()`.
+
+        :return: A snapshot ID.
+        :raises NotImplementedError: If the service does not support
+            snapshots.
+        """
+        self._wait_for_pending_steps()
+        assert self.in_episode, "Must call reset() before snapshot()"
+        reply: SnapshotSessionReply = self.service(
+            self.service.stub.SnapshotSession,
+            SnapshotSessionRequest(session_id=self._session_id),
+        )
+        self._snapshots[reply.snapshot_id] = _EpisodeSnapshot(
+            actions=self.actions.copy(),
+            episode_reward=self.episode_reward,
+            reward_spaces=deepcopy(self.reward.spaces),
+            service_side_reward_spaces=self.reward.service_side_spaces.copy(),
+            client_side_reward_spaces=self.reward.client_side_spaces.copy(),
+        )
+        if len(self._snapshots) > _MAX_SNAPSHOTS:
+            self._snapshots.popitem(last=False)
+        return reply.snapshot_id
+
+    def restore(self, snapshot_id: int) -> None:
+        """Restore the environment to a state saved by :meth:`snapshot()
+        <compiler_gym.envs.CompilerEnv.snapshot>`.
+
+        The environment state, including :code:`actions`,
+        :code:`episode_reward`, and the state of incremental rewards, is
+        returned to exactly the state at the time of the snapshot. A snapshot
+        may be restored any number of times.
+
+        :param snapshot_id: A snapshot ID of the current episode.
+        :raises ValueError: If the snapshot does not exist, or has been
+            discarded by the service.
+        :raises NotImplementedError: If the service does not support
+            snapshots.
+        """
+        self._wait_for_pending_steps()
+        assert self.in_episode, "Must call reset() before restore()"
+        snapshot = self._snapshots.get(snapshot_id)
+        if snapshot is None:
+            raise ValueError(f"Snapshot not found: {snapshot_id}")
+        self._snapshots.move_to_end(snapshot_id)
+
+        try:
+            self.service(
+                self.service.stub.RestoreSession,
+                RestoreSessionRequest(
+                    session_id=self._session_id, snapshot_id=snapshot_id
+                ),
+            )
+        except ValueError:
+            # The service has discarded the snapshot.
+            del self._snapshots[snapshot_id]
+            raise
+
+        self.observation.invalidate()
+        self.actions = snapshot.actions.copy()
+        self.episode_reward = snapshot.episode_reward
+        # Copy the reward spaces so that the snapshot can be restored again.
+        self.reward.spaces = deepcopy(snapshot.reward_spaces)
+        self.reward.service_side_spaces = snapshot.service_side_reward_spaces.copy()
+        self.reward.client_side_spaces = snapshot.client_side_reward_spaces.copy()
+        if self.reward_space:
+            self.reward_space = self.reward_space.id
+
     def close(self):
         """Close the environment.
 
         Once closed, :func:`reset` must be called before the environment is used
         again."""
+        self._close()
+
+    def _close(self, service_healthy: bool = True) -> None:
+        """Close the environment.
+
+        :param service_healthy: Whether the service connection may be reused.
+            If false, the connection is closed rather than returned to the
+            service pool.
+        """
+        self._wait_for_pending_steps()
+        if threading.current_thread() is not self._step_worker_thread:
+            self._last_step_future = None
+            if self._step_executor:
+                self._step_executor.shutdown(wait=False)
+                self._step_executor = None
+
         # Try and close out the episode, but errors are okay.
         close_service = True
         if self.in_episode:
@@ -642,14 +827,117 @@ class CompilerEnv(gym.Env):
                 if reply.remaining_sessions:
                     close_service = False
             except:  # noqa pylint: disable=bare-except
-                pass  # Don't feel bad, computer, you tried ;-)
+                # Don't feel bad, computer, you tried ;-) The session may
+                # still be open, so the connection must not be reused.
+                service_healthy = False
             self._session_id = None
 
+        self._release_service(close_service, service_healthy)
+
+    def _release_service(
+        self, close_service: bool = True, service_healthy: bool = True
+    ) -> None:
+        """Detach the service connection from this environment.
+
+        :param close_service: If true, the service is closed, or returned to
+            the service pool if one is used. Else the connection is left open
+            for other environments that share it.
+        :param service_healthy: Whether the connection may be returned to the
+            service pool. If false, the connection is closed.
+        """
+        self._close_step_stream()
         if self.service and close_service:
-            self.service.close()
+            if self._service_pool and service_healthy:
+                self._service_pool.release(self.service)
+            else:
+                self.service.close()
 
         self.service = None
 
+    def _close_step_stream(self) -> None:
+        if self._step_stream:
+            self._step_stream.close()
+            self._step_stream = None
+
+    def _get_step_stream(self) -> Optional[StepStream]:
+        """Return the step stream, opening one if required, or None if step
+        streams are not enabled by the connection settings.
+        """
+        if not self._connection_settings.step_stream:
+            return None
+        stream = self._step_stream
+        if stream and not stream.closed and stream.service is self.service:
+            return stream
+        # Steps that are in flight on an earlier stream must complete before a
+        # new stream is opened, else the new stream could overtake them.
+        self._wait_for_pending_steps()
+        if not self.in_episode:
+            return None
+        self._close_step_stream()
+        self._step_stream = StepStream(self.service)
+        return self._step_stream
+
+    def _send_step_request(self, request: StepRequest) -> StepReply:
+        """Send a step request to the service and wait for the reply.
+
+        If enabled by the connection settings, the request is sent on a
+        long-lived step stream. Else a unary Step call is made.
+        """
+        stream = self._get_step_stream()
+        if stream:
+            stream.send(request)
+        return self._receive_step_reply(request, stream)
+
+    def _receive_step_reply(
+        self, request: StepRequest, stream: Optional[StepStream]
+    ) -> StepReply:
+        """Wait for the reply to a step request that was sent on the given
+        stream, or make a unary Step call if no stream is used.
+        """
+        if stream:
+            try:
+                return stream.receive()
+            except NotImplementedError:
+                # The service does not support step streams. Fall back to
+                # unary calls for the lifetime of this environment.
+                self.logger.debug("%s does not support step streams", self.service)
+                self._connection_settings = self._connection_settings._replace(
+                    step_stream=False
+                )
+            except ServiceIsClosed:
+                # An earlier request on the stream failed, so the service did
+                # not run this request.
+                pass
+        return self.service(self.service.stub.Step, request)
+
+    def _wait_for_pending_steps(self) -> None:
+        """Block until the steps submitted by :meth:`step_async()` have
+        completed.
+        """
+        future = self._last_step_future
+        if future and threading.current_thread() is not self._step_worker_thread:
+            wait([future])
+
+    def _init_step_worker(self) -> None:
+        self._step_worker_thread = threading.current_thread()
+
+    def _ensure_service(self) -> None:
+        """Start a new service if required."""
+        if self.service is None:
+            self.service = self._new_service_connection()
+            # Re-register the custom benchmarks with the new service.
+            self._add_custom_benchmarks(self._custom_benchmarks.values())
+
+    def _new_service_connection(self) -> CompilerGymServiceConnection:
+        """Acquire a connection from the service pool, or start a new one."""
+        if self._service_pool:
+            return self._service_pool.acquire(self._connection_settings)
+        return CompilerGymServiceConnection(
+            endpoint=self._service_endpoint,
+            opts=self._connection_settings,
+            logger=self.logger,
+        )
+
     def __del__(self):
         # Don't let the service be orphaned if user forgot to close(), or
         # if an exception was thrown. The conditional guard is because this
@@ -679,13 +967,8 @@ class CompilerEnv(gym.Env):
             If no aciton space is provided, the default action space is used.
         :return: The initial observation.
         """
-        # Start a new service if required.
-        if self.service is None:
-            self.service = CompilerGymServiceConnection(
-                self._service_endpoint, self._connection_settings
-            )
-            # Re-register the custom benchmarks with the new service.
-            self._add_custom_benchmarks(self._custom_benchmarks.values())
+        self._wait_for_pending_steps()
+        self._ensure_service()
 
         self.action_space_name = action_space or self.action_space_name
 
@@ -697,55 +980,120 @@ class CompilerEnv(gym.Env):
             )
             self._session_id = None
 
-        # Update the user requested benchmark, if provided. NOTE: This means
-        # that env.reset(benchmark=None) does NOT unset a forced benchmark.
-        if benchmark:
-            self.benchmark = benchmark
-
         try:
             reply = self.service(
                 self.service.stub.StartSession,
-                StartSessionRequest(
-                    benchmark=self._user_specified_benchmark_uri,
-                    action_space=(
-                        [a.name for a in self.action_spaces].index(
-                            self.action_space_name
-                        )
-                        if self.action_space_name
-                        else 0
-                    ),
-                    observation_space=(
-                        [self.observation_space.index]
-                        if self.observation_space
-                        else None
-                    ),
-                ),
+                self._make_start_session_request(benchmark),
             )
         except (ServiceError, ServiceTransportError, TimeoutError) as e:
             # Abort and retry on error.
-            self.logger.warning("%s on reset(): %s", type(e).__name__, e)
-            if self.service:
-                self.service.close()
-            self.service = None
+            self._reset_error(e, retry_count)
+            return self.reset(
+                benchmark=benchmark,
+                action_space=action_space,
+                retry_count=retry_count + 1,
+            )
 
-            if retry_count >= self._connection_settings.init_max_attempts:
-                raise OSError(
-                    f"Failed to reset environment after {retry_count - 1} attempts.\n"
-                    f"Last error ({type(e).__name__}): {e}"
-                ) from e
-            else:
-                return self.reset(
-                    benchmark=benchmark,
-                    action_space=action_space,
-                    retry_count=retry_count + 1,
-                )
+        return self._process_start_session_reply(reply)
+
+    def _reset_error(self, error: Exception, retry_count: int) -> None:
+        """Close the service after a failed attempt to start a session so that
+        the next attempt starts a new one.
+
+        :raises OSError: If there are no attempts remaining.
+        """
+        self.logger.warning("%s on reset(): %s", type(error).__name__, error)
+        if self.service:
+            self.service.close()
+        self.service = None
+
+        if retry_count >= self._connection_settings.init_max_attempts:
+            raise OSError(
+                f"Failed to reset environment after {retry_count - 1} attempts.\n"
+                f"Last error ({type(error).__name__}): {error}"
+            ) from error
+
+    def _make_start_session_request(
+        self, benchmark: Optional[Union[str, Benchmark]] = None
+    ) -> StartSessionRequest:
+        """Build the request message to start a new session.
+
+        :param benchmark: The benchmark to use. If provided, it becomes the
+            benchmark for subsequent sessions.
+        :return: A StartSessionRequest message.
+        """
+        # Update the user requested benchmark, if provided. NOTE: This means
+        # that env.reset(benchmark=None) does NOT unset a forced benchmark.
+        if benchmark:
+            self.benchmark = benchmark
+
+        return StartSessionRequest(
+            benchmark=self._user_specified_benchmark_uri,
+            action_space=(
+                [a.name for a in self.action_spaces].index(self.action_space_name)
+                if self.action_space_name
+                else 0
+            ),
+            observation_space=(
+                [self.observation_space.index] if self.observation_space else None
+            ),
+            use_shared_memory=self._connection_settings.shared_memory_observations,
+            reward_space=(
+                self.reward_space.id if self._service_side_reward() else None
+            ),
+        )
+
+    def _service_side_reward(self) -> bool:
+        """Return whether the default reward is computed by the service rather
+        than from observations.
+
+        Service-side rewards are used if enabled by the connection settings and
+        the service lists the reward space as supported, unless the reward
+        space has already been computed on the client during this episode, in
+        which case the service's state for it is out of date. The state of
+        each reward space is held by either the client or the service for the
+        duration of an episode, so that switching reward spaces, forking, and
+        using :code:`env.reward` return the same rewards as the client.
+        """
+        return bool(
+            self.reward_space
+            and self._connection_settings.service_side_rewards
+            and self.service
+            and self.reward_space.id in self.service.reward_spaces
+            and self.reward_space.id not in self.reward.client_side_spaces
+        )
 
+    def _get_service_reward(self, reward_space: str) -> float:
+        """Return the reward that the service computes for the current state.
+
+        The service updates its state for the reward space, so the reward is
+        relative to the state at which it was last computed.
+
+        :param reward_space: The name of a service-side reward space.
+        :return: A reward.
+        """
+        reply: StepReply = self.service(
+            self.service.stub.Step,
+            StepRequest(session_id=self._session_id, reward_space=reward_space),
+        )
+        return reply.reward
+
+    def _process_start_session_reply(
+        self, reply: StartSessionReply
+    ) -> Optional[observation_t]:
+        """Update the environment state from a StartSession reply.
+
+        :param reply: The reply message from the service.
+        :return: The initial observation, if an observation space is set.
+        """
         self._benchmark_in_use_uri = reply.benchmark
         self._session_id = reply.session_id
         self.observation.session_id = reply.session_id
+        self.observation.invalidate()
         self.reward.get_cost = self.observation.__getitem__
         self.episode_start_time = time()
         self.actions = []
+        self._snapshots = OrderedDict()
 
         # If the action space has changed, update it.
         if reply.HasField("new_action_space"):
@@ -758,81 +1106,363 @@ class CompilerEnv(gym.Env):
             self.episode_reward = 0
 
         if self.observation_space:
-            if len(reply.observation) != 1:
-                raise OSError(
-                    f"Expected one observation from service, received {len(reply.observation)}"
+            try:
+                if len(reply.observation) != 1:
+                    raise OSError(
+                        f"Expected one observation from service, received {len(reply.observation)}"
+                    )
+                return self.observation.spaces[self.observation_space.id].translate(
+                    reply.observation[0]
                 )
-            return self.observation.spaces[self.observation_space.id].translate(
-                reply.observation[0]
-            )
+            finally:
+                release_shared_memory_buffers(reply.observation)
 
-    def step(self, action: Union[int, Iterable[int]]) -> step_t:
+    def step(self, action: Union[int, Iterable[int]], pipeline: bool = False) -> step_t:
         """Take a step.
 
         :param action: An action, or a sequence of actions. When multiple
             actions are provided the observation and reward are returned
             after running all of the actions.
+        :param pipeline: If :code:`True`, the service may run a sequence of
+            actions as a single pipeline, sharing work between them. For LLVM,
+            this schedules all of the passes into a single pass manager, as
+            when running the equivalent :code:`opt` command line. This can be
+            much faster for long action sequences, but the result may differ
+            from running the actions one at a time.
         :return: A tuple of observation, reward, done, and info. Observation and
             reward are None if default observation/reward is not set. If done
             is True, observation and reward may also be None (e.g. because the
             service failed).
         """
+        self._wait_for_pending_steps()
         assert self.in_episode, "Must call reset() before step()"
+        request, observation_spaces = self._make_step_request(action, pipeline)
+
+        # Send the request to the backend service.
+        try:
+            reply = self._send_step_request(request)
+        except (ServiceError, ServiceTransportError, ServiceOSError, TimeoutError) as e:
+            return self._step_error(e)
+
+        return self._process_step_reply(action, reply, observation_spaces)
+
+    def step_async(self, action: Union[int, Iterable[int]]) -> "Future[step_t]":
+        """Submit a step without waiting for it to complete.
+
+        Steps are run in the order that they are submitted. This allows the
+        caller to prepare later steps while earlier steps are still running.
+        If step streams are enabled using :code:`ConnectionOpts.step_stream`,
+        requests are pipelined so that the service runs them back to back.
+
+        Example usage:
+
+        >>> env.reset()
+        >>> futures = [env.step_async(action) for action in actions]
+        >>> results = [future.result() for future in futures]
+
+        :meth:`step() <compiler_gym.envs.CompilerEnv.step>`, :meth:`reset()
+        <compiler_gym.envs.CompilerEnv.reset>`, :meth:`fork()
+        <compiler_gym.envs.CompilerEnv.fork>`, and :meth:`close()
+        <compiler_gym.envs.CompilerEnv.close>` wait for pending steps to
+        complete. Other environment attributes, such as :code:`observation`
+        and :code:`episode_reward`, must not be used until the returned
+        futures have completed.
+
+        If a step fails and ends the episode, the steps that were submitted
+        after it are not run and return the same result as calling
+        :meth:`step() <compiler_gym.envs.CompilerEnv.step>` on a closed
+        environment. Their actions are not recorded in :code:`actions`. This
+        does not depend on whether they were submitted before or after the
+        failure.
+
+        :param action: An action, or a sequence of actions.
+        :return: A future that resolves to a tuple of observation, reward,
+            done, and info.
+        """
+        # The episode may have been ended by a pending step.
+        assert (
+            self.in_episode or self._last_step_future is not None
+        ), "Must call reset() before step_async()"
+        stream = self._get_step_stream()
+
+        # The environment state is only modified by the worker thread while
+        # steps are pending. Hold the lock so that an earlier step cannot end
+        # the episode and close the stream while this request is sent.
+        with self._step_lock:
+            request, observation_spaces = None, []
+            if self.in_episode:
+                request, observation_spaces = self._build_step_request(action)
+                if stream:
+                    stream.send(request)
+
+            if self._step_executor is None:
+                self._step_executor = ThreadPoolExecutor(
+                    max_workers=1, initializer=self._init_step_worker
+                )
+            future = self._step_executor.submit(
+                self._run_async_step, action, request, observation_spaces, stream
+            )
+            self._last_step_future = future
+        return future
+
+    def _run_async_step(
+        self,
+        action: Union[int, Iterable[int]],
+        request: Optional[StepRequest],
+        observation_spaces: List[str],
+        stream: Optional[StepStream],
+    ) -> step_t:
+        with self._step_lock:
+            if request is None or not self.in_episode:
+                return self._step_error(
+                    ServiceIsClosed("Environment was closed by an earlier step")
+                )
+            self._record_step(request)
+
+        # Only this thread modifies the environment state, so the reply can be
+        # received without holding the lock.
+        try:
+            reply = self._receive_step_reply(request, stream)
+        except (ServiceError, ServiceTransportError, ServiceOSError, TimeoutError) as e:
+            with self._step_lock:
+                return self._step_error(e)
+
+        with self._step_lock:
+            return self._process_step_reply(action, reply, observation_spaces)
+
+    @staticmethod
+    def step_many(
+        envs: List["CompilerEnv"], actions: List[Union[int, Iterable[int]]]
+    ) -> List[step_t]:
+        """Take a step in each of a list of environments.
+
+        This is equivalent to:
+
+        >>> [env.step(action) for env, action in zip(envs, actions)]
+
+        except that environments which share a service connection, such as
+        those created using :meth:`fork() <compiler_gym.envs.CompilerEnv.fork>`,
+        are stepped using a single batched RPC call. The service may run the
+        batched steps concurrently.
+
+        Example usage:
+
+        >>> env = gym.make("llvm-v0")
+        >>> env.reset()
+        >>> envs = [env] + [env.fork() for _ in range(7)]
+        >>> results = CompilerEnv.step_many(
+            envs, [env.action_space.sample() for env in envs]
+        )
+
+        :param envs: A list of environments. Each environment may appear at
+            most once.
+        :param actions: A list of actions, one per environment. Each action may
+            be an action or a sequence of actions.
+        :return: A list of :code:`(observation, reward, done, info)` tuples, one
+            per environment, in the same order as :code:`envs`.
+        :raises ValueError: If the number of environments and actions differ,
+            if an environment appears more than once, or if an action is not
+            in the action space of its environment. No environment is stepped
+            if this is raised.
+        """
+        # pylint: disable=protected-access
+        envs, actions = list(envs), list(actions)
+        if len(envs) != len(actions):
+            raise ValueError(
+                f"Received {len(envs)} environments but {len(actions)} actions"
+            )
+        if len(set(id(env) for env in envs)) != len(envs):
+            raise ValueError("Cannot step the same environment twice in a batch")
+
+        results: List[Optional[step_t]] = [None] * len(envs)
+
+        # Group the environments by service connection so that there is one
+        # round trip per service.
+        batches: Dict[int, List[int]] = {}
+        for i, env in enumerate(envs):
+            # Steps that were submitted by step_async() must complete first so
+            # that steps run in the order that they were submitted.
+            env._wait_for_pending_steps()
+            assert env.in_episode, "Must call reset() before step()"
+            batches.setdefault(id(env.service), []).append(i)
+
+        # Check the actions before any requests are made. The service steps
+        # the sessions of a batch concurrently, so an invalid action would
+        # otherwise fail the batch after the other sessions have been
+        # modified.
+        for env, action in zip(envs, actions):
+            for a in action if isinstance(action, IterableType) else [action]:
+                if not env.action_space.contains(a):
+                    raise ValueError(f"Action not in action space: {a}")
+
+        for indices in batches.values():
+            if len(indices) == 1:
+                i = indices[0]
+                results[i] = envs[i].step(actions[i])
+                continue
+
+            service = envs[indices[0]].service
+            requests, observation_spaces = zip(
+                *[envs[i]._make_step_request(actions[i]) for i in indices]
+            )
+            try:
+                reply: BatchStepReply = service(
+                    service.stub.BatchStep, BatchStepRequest(request=requests)
+                )
+            except NotImplementedError:
+                # The service does not support batching. Send the requests one
+                # at a time. The actions have already been recorded by
+                # _make_step_request() so we call the service directly rather
+                # than going through step().
+                for i, request, spaces in zip(indices, requests, observation_spaces):
+                    env = envs[i]
+                    try:
+                        step_reply = env.service(env.service.stub.Step, request)
+                    except (
+                        ServiceError,
+                        ServiceTransportError,
+                        ServiceOSError,
+                        TimeoutError,
+                    ) as e:
+                        results[i] = env._step_error(e)
+                    else:
+                        results[i] = env._process_step_reply(
+                            actions[i], step_reply, spaces
+                        )
+                continue
+            except (
+                ServiceError,
+                ServiceTransportError,
+                ServiceOSError,
+                TimeoutError,
+            ) as e:
+                # A batch succeeds or fails as a whole.
+                for i in indices:
+                    results[i] = envs[i]._step_error(e)
+                continue
+
+            if len(reply.reply) != len(indices):
+                for step_reply in reply.reply:
+                    release_shared_memory_buffers(step_reply.observation)
+                raise ServiceError(
+                    f"Requested {len(indices)} steps but received {len(reply.reply)}"
+                )
+            for i, step_reply, spaces in zip(indices, reply.reply, observation_spaces):
+                results[i] = envs[i]._process_step_reply(actions[i], step_reply, spaces)
+
+        return results
+
+    def _make_step_request(
+        self, action: Union[int, Iterable[int]], pipeline: bool = False
+    ) -> Tuple[StepRequest, List[str]]:
+        """Build the request message for a step and record the actions.
+
+        :param action: An action, or a sequence of actions.
+        :param pipeline: Whether to run the actions as a single pipeline.
+        :return: A tuple of the request message and the list of observation
+            space names that are required to compute the observation and
+            reward, in order. This list may contain duplicates.
+        """
+        request, observation_spaces = self._build_step_request(action, pipeline)
+        self._record_step(request)
+        return request, observation_spaces
+
+    def _build_step_request(
+        self, action: Union[int, Iterable[int]], pipeline: bool = False
+    ) -> Tuple[StepRequest, List[str]]:
+        """Build the request message for a step without modifying the
+        environment state.
+
+        See :meth:`_make_step_request`.
+        """
         actions = action if isinstance(action, IterableType) else [action]
-        observation, reward = None, None
 
         # Build the list of observations that must be computed by the backend
         # service to generate the user-requested observation and reward.
-        # TODO(cummins): We could de-duplicate this list to improve effiency
-        # when multiple redundant copies of the same observation space are
-        # requested.
-        observation_indices, observation_spaces = [], []
+        observation_spaces = []
         if self.observation_space:
-            observation_indices.append(self.observation_space.index)
             observation_spaces.append(self.observation_space.id)
-        if self.reward_space:
-            observation_indices += [
-                self.observation.spaces[obs].index
-                for obs in self.reward_space.observation_spaces
-            ]
+        service_side_reward = self._service_side_reward()
+        if self.reward_space and not service_side_reward:
             observation_spaces += self.reward_space.observation_spaces
 
-        # Record the actions.
-        self.actions += actions
+        # Request each distinct observation space only once.
+        observation_indices = [
+            self.observation.spaces[obs].index
+            for obs in dict.fromkeys(observation_spaces)
+        ]
 
-        # Send the request to the backend service.
         request = StepRequest(
             session_id=self._session_id,
             action=actions,
             observation_space=observation_indices,
+            pipeline=pipeline,
+            reward_space=self.reward_space.id if service_side_reward else None,
         )
-        try:
-            reply = self.service(self.service.stub.Step, request)
-        except (ServiceError, ServiceTransportError, ServiceOSError, TimeoutError) as e:
-            self.close()
-            info = {"error_details": str(e)}
-            if self.reward_space:
-                reward = self.reward_space.reward_on_error(self.episode_reward)
-            if self.observation_space:
-                observation = self.observation_space.default_value
-            return observation, reward, True, info
+        return request, observation_spaces
 
-        # If the action space has changed, update it.
-        if reply.HasField("new_action_space"):
-            self.action_space = self._make_action_space(
-                self.action_space.name, reply.action_space.action
-            )
+    def _record_step(self, request: StepRequest) -> None:
+        """Record the actions of a step request that is about to be sent."""
+        self.actions += list(request.action)
+        self.observation.invalidate()
 
-        # Translate observations to python representations.
-        if len(reply.observation) != len(observation_indices):
-            raise ServiceError(
-                f"Requested {observation_indices} observations "
-                f"but received {len(reply.observation)}"
-            )
-        observations = [
-            self.observation.spaces[obs].translate(val)
-            for obs, val in zip(observation_spaces, reply.observation)
-        ]
+    def _step_error(self, error: Exception) -> step_t:
+        """Close the environment and return the result of a step that failed
+        with the given error.
+        """
+        observation, reward = None, None
+        # The service may be in a bad state, so do not return it to the
+        # service pool.
+        self._close(service_healthy=False)
+        info = {"error_details": str(error)}
+        if self.reward_space:
+            reward = self.reward_space.reward_on_error(self.episode_reward)
+        if self.observation_space:
+            observation = self.observation_space.default_value
+        return observation, reward, True, info
+
+    def _process_step_reply(
+        self,
+        action: Union[int, Iterable[int]],
+        reply: StepReply,
+        observation_spaces: List[str],
+    ) -> step_t:
+        """Compute the observation, reward, and info from a step reply.
+
+        :param action: The action, or sequence of actions, that was requested.
+        :param reply: The reply message from the service.
+        :param observation_spaces: The names of the observation spaces that
+            were requested, as returned by :meth:`_make_step_request`.
+        :return: A tuple of observation, reward, done, and info.
+        """
+        observation, reward = None, None
+        self.observation.invalidate()
+
+        try:
+            # If the action space has changed, update it.
+            if reply.HasField("new_action_space"):
+                self.action_space = self._make_action_space(
+                    self.action_space.name, reply.action_space.action
+                )
+
+            # Translate observations to python representations. The reply
+            # contains one observation for each distinct observation space that
+            # was requested.
+            requested_spaces = list(dict.fromkeys(observation_spaces))
+            if len(reply.observation) != len(requested_spaces):
+                raise ServiceError(
+                    f"Requested {requested_spaces} observations "
+                    f"but received {len(reply.observation)}"
+                )
+            translated = {
+                obs: self.observation.spaces[obs].translate(val)
+                for obs, val in zip(requested_spaces, reply.observation)
+            }
+        finally:
+            # Delete the shared memory files of any observations that were not
+            # translated, e.g. because of an error.
+            release_shared_memory_buffers(reply.observation)
+        observations = [translated[obs] for obs in observation_spaces]
 
         # Pop the requested observation.
         if self.observation_space:
@@ -841,7 +1471,14 @@ class CompilerEnv(gym.Env):
         # Compute reward.
         self.reward.previous_action = action
         if self.reward_space:
-            reward = self.reward_space.update(action, observations, self.observation)
+            if self._service_side_reward():
+                reward = reply.reward
+                self.reward.service_side_spaces.add(self.reward_space.id)
+            else:
+                reward = self.reward_space.update(
+                    action, observations, self.observation
+                )
+                self.reward.client_side_spaces.add(self.reward_space.id)
             self.episode_reward += reward
 
         info = {
@@ -1026,15 +1663,22 @@ class CompilerEnv(gym.Env):
         for benchmark in benchmarks:
             self._custom_benchmarks[benchmark.uri] = benchmark
 
+        # A pooled service must not leak this environment's benchmarks to the
+        # next environment that leases it.
+        if self._service_pool:
+            self._service_pool.mark_modified(self.service)
+
         self.service(
             self.service.stub.AddBenchmark,
             AddBenchmarkRequest(benchmark=benchmarks),
         )
 
-    def apply(self, state: CompilerEnvState) -> None:  # noqa
+    def apply(self, state: CompilerEnvState, pipeline: bool = False) -> None:  # noqa
         """Replay this state on the given an environment.
 
         :param env: A :class:`CompilerEnv` instance.
+        :param pipeline: If :code:`True`, replay the actions as a single
+            pipeline. See :meth:`step() <compiler_gym.envs.CompilerEnv.step>`.
         :raises ValueError: If this state cannot be applied.
         """
         if not self.in_episode:
@@ -1047,7 +1691,7 @@ class CompilerEnv(gym.Env):
             )
 
         actions = self.commandline_to_actions(state.commandline)
-        _, _, done, info = self.step(actions)
+        _, _, done, info = self.step(actions, pipeline=pipeline)
         if done:
             raise ValueError(
                 f"Environment terminated with error: `{info.get('error_details')}`"
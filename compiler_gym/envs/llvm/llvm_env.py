@@ -201,20 +201,16 @@ class LlvmEnv(CompilerEnv):
         )
         self.observation.add_derived_space(
             id="Inst2vecEmbeddingIndices",
-            base_id="Ir",
+            base_id="Inst2vecPreprocessedText",
             space=Sequence(size_range=(0, None), dtype=np.int32),
-            translate=lambda base_observation: self.inst2vec.encode(
-                self.inst2vec.preprocess(base_observation)
-            ),
+            translate=self.inst2vec.encode,
             default_value=np.array([self.inst2vec.vocab["!UNK"]]),
         )
         self.observation.add_derived_space(
             id="Inst2vec",
-            base_id="Ir",
+            base_id="Inst2vecEmbeddingIndices",
             space=Sequence(size_range=(0, None), dtype=np.ndarray),
-            translate=lambda base_observation: self.inst2vec.embed(
-                self.inst2vec.encode(self.inst2vec.preprocess(base_observation))
-            ),
+            translate=self.inst2vec.embed,
             default_value=np.vstack(
                 [self.inst2vec.embeddings[self.inst2vec.vocab["!UNK"]]]
             ),
@@ -105,6 +105,7 @@ class BaselineImprovementNormalizedReward(NormalizedReward):
 
     def get_cost_norm(self, observation_view: ObservationView) -> float:
         """Return the value used to normalize costs."""
-        init_cost = observation_view[self.init_cost_function]
-        baseline_cost = observation_view[self.baseline_cost_function]
+        init_cost, baseline_cost = observation_view.get_many(
+            [self.init_cost_function, self.baseline_cost_function]
+        )
         return max(init_cost - baseline_cost, 1)
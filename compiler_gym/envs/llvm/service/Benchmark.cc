@@ -9,9 +9,11 @@
 
 #include <stdexcept>
 
+#include "compiler_gym/util/RunfilesPath.h"
 #include "llvm/ADT/SmallVector.h"
 #include "llvm/Bitcode/BitcodeReader.h"
 #include "llvm/Bitcode/BitcodeWriter.h"
+#include "llvm/Config/llvm-config.h"
 #include "llvm/Support/SHA1.h"
 
 namespace fs = boost::filesystem;
@@ -22,11 +24,49 @@ namespace compiler_gym::llvm_service {
 
 namespace {
 
-BaselineCosts getBaselineCosts(const llvm::Module& unoptimizedModule,
-                               const fs::path& workingDirectory) {
-  BaselineCosts baselineCosts;
-  setbaselineCosts(unoptimizedModule, &baselineCosts, workingDirectory);
-  return baselineCosts;
+// The version of the on-disk baseline costs cache. Increment this whenever the
+// computation of baseline costs changes to invalidate existing cache entries.
+constexpr int kBaselineCostsCacheVersion = 2;
+
+// Return the path of the on-disk cache file for the baseline costs of a
+// module. Entries are keyed by the module hash, the LLVM version, and the
+// number of costs, so that a cache may be shared between processes and across
+// builds.
+fs::path getBaselineCostsCachePath(const BenchmarkHash& hash) {
+  return util::getCachePath(fmt::format("llvm-v0/baseline-costs/v{}-llvm-{}-n{}/{}.bin",
+                                        kBaselineCostsCacheVersion, LLVM_VERSION_STRING,
+                                        numBaselineCosts, benchmarkHashToString(hash)));
+}
+
+std::shared_ptr<const BaselineCosts> makeBaselineCosts(const Bitcode& bitcode,
+                                                       const BenchmarkHash& hash,
+                                                       const fs::path& workingDirectory) {
+  return std::make_shared<const BaselineCosts>(bitcode.str(), workingDirectory,
+                                               getBaselineCostsCachePath(hash));
+}
+
+std::unique_ptr<llvm::Module> makeModuleOrDie(llvm::LLVMContext& context, const Bitcode& bitcode,
+                                              const std::string& name) {
+  Status status;
+  auto module = makeModule(context, bitcode, name, &status);
+  CHECK(status.ok()) << "Failed to make LLVM module: " << status.error_message();
+  return module;
+}
+
+// Compute the hash of a bitcode by parsing it into a temporary context.
+BenchmarkHash getBitcodeHash(const Bitcode& bitcode, const std::string& name) {
+  llvm::LLVMContext context;
+  return getModuleHash(*makeModuleOrDie(context, bitcode, name));
+}
+
+}  // anonymous namespace
+
+Bitcode getModuleBitcode(const llvm::Module& module, BenchmarkHash* hash) {
+  Bitcode bitcode;
+  llvm::raw_svector_ostream ostream(bitcode);
+  llvm::WriteBitcodeToFile(module, ostream, /*ShouldPreserveUseListOrder=*/false,
+                           /*Index=*/nullptr, /*GenerateHash=*/hash != nullptr, hash);
+  return bitcode;
 }
 
 BenchmarkHash getModuleHash(const llvm::Module& module) {
@@ -40,16 +80,14 @@ BenchmarkHash getModuleHash(const llvm::Module& module) {
   return hash;
 }
 
-std::unique_ptr<llvm::Module> makeModuleOrDie(llvm::LLVMContext& context, const Bitcode& bitcode,
-                                              const std::string& name) {
-  Status status;
-  auto module = makeModule(context, bitcode, name, &status);
-  CHECK(status.ok()) << "Failed to make LLVM module: " << status.error_message();
-  return module;
+std::string benchmarkHashToString(const BenchmarkHash& hash) {
+  std::string hex;
+  for (const auto word : hash) {
+    hex += fmt::format("{:08x}", word);
+  }
+  return hex;
 }
 
-}  // anonymous namespace
-
 Status readBitcodeFile(const fs::path& path, Bitcode* bitcode) {
   std::ifstream ifs;
   ifs.open(path.string());
@@ -102,11 +140,12 @@ std::unique_ptr<llvm::Module> makeModule(llvm::LLVMContext& context, const Bitco
 // A benchmark is an LLVM module and the LLVM context that owns it.
 Benchmark::Benchmark(const std::string& name, const Bitcode& bitcode,
                      const fs::path& workingDirectory, std::optional<fs::path> bitcodePath,
-                     const BaselineCosts* baselineCosts)
+                     std::shared_ptr<const BaselineCosts> baselineCosts)
     : context_(std::make_unique<llvm::LLVMContext>()),
       module_(makeModuleOrDie(*context_, bitcode, name)),
-      baselineCosts_(baselineCosts ? *baselineCosts : getBaselineCosts(*module_, workingDirectory)),
       hash_(getModuleHash(*module_)),
+      baselineCosts_(baselineCosts ? baselineCosts
+                                   : makeBaselineCosts(bitcode, *hash_, workingDirectory)),
       name_(name),
       bitcodeSize_(bitcode.size()),
       bitcodePath_(bitcodePath) {}
@@ -114,22 +153,62 @@ Benchmark::Benchmark(const std::string& name, const Bitcode& bitcode,
 Benchmark::Benchmark(const std::string& name, std::unique_ptr<llvm::LLVMContext> context,
                      std::unique_ptr<llvm::Module> module, size_t bitcodeSize,
                      const fs::path& workingDirectory, std::optional<fs::path> bitcodePath,
-                     const BaselineCosts* baselineCosts)
+                     std::shared_ptr<const BaselineCosts> baselineCosts)
     : context_(std::move(context)),
       module_(std::move(module)),
-      baselineCosts_(baselineCosts ? *baselineCosts : getBaselineCosts(*module_, workingDirectory)),
       hash_(getModuleHash(*module_)),
+      baselineCosts_(baselineCosts
+                         ? baselineCosts
+                         : makeBaselineCosts(getModuleBitcode(*module_), *hash_, workingDirectory)),
       name_(name),
       bitcodeSize_(bitcodeSize),
       bitcodePath_(bitcodePath) {}
 
+Benchmark::Benchmark(const std::string& name, std::shared_ptr<const Bitcode> snapshot,
+                     const fs::path& workingDirectory, std::optional<fs::path> bitcodePath,
+                     std::shared_ptr<const BaselineCosts> baselineCosts)
+    : snapshot_(snapshot),
+      baselineCosts_(baselineCosts ? baselineCosts
+                                   : makeBaselineCosts(*snapshot, getBitcodeHash(*snapshot, name),
+                                                       workingDirectory)),
+      name_(name),
+      bitcodeSize_(snapshot->size()),
+      bitcodePath_(bitcodePath) {}
+
 std::unique_ptr<Benchmark> Benchmark::clone(const fs::path& workingDirectory) const {
-  Bitcode bitcode;
-  llvm::raw_svector_ostream ostream(bitcode);
-  llvm::WriteBitcodeToFile(module(), ostream);
+  return clone(snapshot(), workingDirectory);
+}
+
+std::unique_ptr<Benchmark> Benchmark::clone(std::shared_ptr<const Bitcode> snapshot,
+                                            const fs::path& workingDirectory) const {
+  return std::make_unique<Benchmark>(name(), snapshot, workingDirectory, bitcodePath(),
+                                     baselineCosts_);
+}
+
+std::shared_ptr<const Bitcode> Benchmark::snapshot() const {
+  if (!materialized()) {
+    // The module has not been parsed, so it is unchanged since the snapshot.
+    return snapshot_;
+  }
+  return std::make_shared<const Bitcode>(getModuleBitcode(*module_));
+}
 
-  return std::make_unique<Benchmark>(name(), bitcode, workingDirectory, bitcodePath(),
-                                     &baselineCosts());
+const BenchmarkHash Benchmark::hash() const {
+  if (!hash_.has_value()) {
+    // Hash the snapshot rather than the module, which may have been changed
+    // since the benchmark was constructed.
+    hash_ = getBitcodeHash(*snapshot_, name_);
+  }
+  return *hash_;
+}
+
+void Benchmark::materialize() const {
+  if (module_) {
+    return;
+  }
+  DCHECK(snapshot_) << "Benchmark has no module or snapshot";
+  context_ = std::make_unique<llvm::LLVMContext>();
+  module_ = makeModuleOrDie(*context_, *snapshot_, name_);
 }
 
 }  // namespace compiler_gym::llvm_service
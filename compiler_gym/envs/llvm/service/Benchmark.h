@@ -33,61 +33,129 @@ grpc::Status readBitcodeFile(const boost::filesystem::path& path, Bitcode* bitco
 std::unique_ptr<llvm::Module> makeModule(llvm::LLVMContext& context, const Bitcode& bitcode,
                                          const std::string& name, grpc::Status* status);
 
+// Serialize a module to bitcode. If hash is not null, it is set to the hash of
+// the module, which is computed at the same time.
+Bitcode getModuleBitcode(const llvm::Module& module, BenchmarkHash* hash = nullptr);
+
+// Compute the hash of a module.
+BenchmarkHash getModuleHash(const llvm::Module& module);
+
+// Format a hash as a string of 40 hexadecimal digits.
+std::string benchmarkHashToString(const BenchmarkHash& hash);
+
 // A benchmark is an LLVM module and the LLVM context that owns it. A benchmark
 // is mutable and can be changed over the course of a session.
+//
+// A benchmark may be constructed from an immutable bitcode snapshot that is
+// shared with other benchmarks. In that case the module is not parsed until
+// it is first accessed, so copies that are never used do not pay for parsing.
 class Benchmark {
  public:
   Benchmark(const std::string& name, const Bitcode& bitcode,
             const boost::filesystem::path& workingDirectory,
             std::optional<boost::filesystem::path> bitcodePath = std::nullopt,
-            const BaselineCosts* baselineCosts = nullptr);
+            std::shared_ptr<const BaselineCosts> baselineCosts = nullptr);
 
   Benchmark(const std::string& name, std::unique_ptr<llvm::LLVMContext> context,
             std::unique_ptr<llvm::Module> module, size_t bitcodeSize,
             const boost::filesystem::path& workingDirectory,
             std::optional<boost::filesystem::path> bitcodePath = std::nullopt,
-            const BaselineCosts* baselineCosts = nullptr);
+            std::shared_ptr<const BaselineCosts> baselineCosts = nullptr);
+
+  // Construct a benchmark from a shared bitcode snapshot. The module is
+  // parsed from the snapshot the first time that it is accessed.
+  Benchmark(const std::string& name, std::shared_ptr<const Bitcode> snapshot,
+            const boost::filesystem::path& workingDirectory,
+            std::optional<boost::filesystem::path> bitcodePath = std::nullopt,
+            std::shared_ptr<const BaselineCosts> baselineCosts = nullptr);
 
   // Make a copy of the benchmark.
   std::unique_ptr<Benchmark> clone(const boost::filesystem::path& workingDirectory) const;
 
+  // Make a copy of the benchmark from a snapshot of its current module, as
+  // returned by snapshot().
+  std::unique_ptr<Benchmark> clone(std::shared_ptr<const Bitcode> snapshot,
+                                   const boost::filesystem::path& workingDirectory) const;
+
+  // Return an immutable bitcode snapshot of the current module. If the module
+  // has not been parsed from the snapshot that this benchmark was constructed
+  // from, that snapshot is returned without serializing the module.
+  std::shared_ptr<const Bitcode> snapshot() const;
+
+  // Whether the module has been parsed. This is false only for benchmarks that
+  // were constructed from a snapshot and have not yet been accessed.
+  inline bool materialized() const { return module_ != nullptr; }
+
   inline const std::string& name() const { return name_; }
 
   inline const std::optional<boost::filesystem::path> bitcodePath() const { return bitcodePath_; }
 
   inline const size_t bitcodeSize() const { return bitcodeSize_; }
 
-  inline llvm::Module& module() { return *module_; }
+  inline llvm::Module& module() {
+    materialize();
+    return *module_;
+  }
 
-  inline const llvm::Module& module() const { return *module_; }
+  inline const llvm::Module& module() const {
+    materialize();
+    return *module_;
+  }
 
-  inline llvm::LLVMContext& context() { return *context_; }
+  inline llvm::LLVMContext& context() {
+    materialize();
+    return *context_;
+  }
 
-  inline const llvm::LLVMContext& context() const { return *context_; }
+  inline const llvm::LLVMContext& context() const {
+    materialize();
+    return *context_;
+  }
 
-  inline const BaselineCosts& baselineCosts() const { return baselineCosts_; }
+  // The baseline costs of the benchmark. These are computed lazily and shared
+  // with clones of this benchmark.
+  inline const BaselineCosts& baselineCosts() const { return *baselineCosts_; }
 
   // Accessors for the underlying raw pointers.
-  inline const llvm::LLVMContext* context_ptr() const { return context_.get(); }
+  inline const llvm::LLVMContext* context_ptr() const {
+    materialize();
+    return context_.get();
+  }
 
-  inline const llvm::Module* module_ptr() const { return module_.get(); }
+  inline const llvm::Module* module_ptr() const {
+    materialize();
+    return module_.get();
+  }
 
-  inline const BenchmarkHash hash() const { return hash_; }
+  // A hash of the module at the time that the benchmark was constructed.
+  const BenchmarkHash hash() const;
 
   // Replace the benchmark module with a new one. This is to enable
   // out-of-process modification of the IR by serializing the benchmark to a
   // file, modifying the file, then loading the modified file and updating the
   // module pointer here.
-  inline void replaceModule(std::unique_ptr<llvm::Module> module) { module_ = std::move(module); }
+  inline void replaceModule(std::unique_ptr<llvm::Module> module) {
+    materialize();
+    module_ = std::move(module);
+  }
 
  private:
+  // Parse the module from the snapshot if it has not been parsed already.
+  void materialize() const;
+
   // NOTE(cummins): Order here is important! The LLVMContext must be declared
   // before Module, as class members are destroyed in the reverse order they are
   // declared, and a module must never outlive its context.
-  std::unique_ptr<llvm::LLVMContext> context_;
-  std::unique_ptr<llvm::Module> module_;
-  const BaselineCosts baselineCosts_;
-  const BenchmarkHash hash_;
+  mutable std::unique_ptr<llvm::LLVMContext> context_;
+  mutable std::unique_ptr<llvm::Module> module_;
+  // The bitcode that the module is parsed from. Null if the benchmark was not
+  // constructed from a snapshot.
+  const std::shared_ptr<const Bitcode> snapshot_;
+  // The hash must be declared before the baseline costs, which are looked up
+  // by hash. For benchmarks constructed from a snapshot, the hash is computed
+  // on first use.
+  mutable std::optional<BenchmarkHash> hash_;
+  const std::shared_ptr<const BaselineCosts> baselineCosts_;
   const std::string name_;
   // The length of the bitcode string for this benchmark.
   const size_t bitcodeSize_;
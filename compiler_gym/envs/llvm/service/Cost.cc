@@ -8,6 +8,11 @@
 #include <glog/logging.h>
 #include <grpcpp/grpcpp.h>
 
+#include <algorithm>
+#include <cmath>
+#include <fstream>
+#include <limits>
+#include <mutex>
 #include <subprocess/subprocess.hpp>
 #include <system_error>
 
@@ -15,8 +20,19 @@
 #include "compiler_gym/util/GrpcStatusMacros.h"
 #include "compiler_gym/util/RunfilesPath.h"
 #include "compiler_gym/util/Unreachable.h"
+#include "llvm/ADT/SmallVector.h"
+#include "llvm/ADT/Triple.h"
+#include "llvm/Bitcode/BitcodeReader.h"
 #include "llvm/IR/LegacyPassManager.h"
+#include "llvm/Object/ObjectFile.h"
+#include "llvm/Support/Host.h"
+#include "llvm/Support/TargetRegistry.h"
+#include "llvm/Support/TargetSelect.h"
+#include "llvm/Support/raw_ostream.h"
+#include "llvm/Target/TargetMachine.h"
+#include "llvm/Target/TargetOptions.h"
 #include "llvm/Transforms/IPO.h"
+#include "llvm/Transforms/IPO/AlwaysInliner.h"
 #include "llvm/Transforms/IPO/PassManagerBuilder.h"
 #include "llvm/Transforms/Utils/Cloning.h"
 
@@ -53,6 +69,101 @@ bool applyBaselineOptimizations(llvm::Module* module, unsigned optLevel, unsigne
   return changed;
 }
 
+// Return the CPU that the clang driver targets for a triple when no -march or
+// -mcpu flag is given.
+std::string getClangDefaultCpu(const llvm::Triple& triple) {
+  switch (triple.getArch()) {
+    case llvm::Triple::x86:
+    case llvm::Triple::x86_64: {
+      const bool is64Bit = triple.getArch() == llvm::Triple::x86_64;
+      if (triple.isOSDarwin()) {
+        if (triple.isMacOSX() && !triple.isMacOSXVersionLT(10, 12)) {
+          return "penryn";
+        }
+        return is64Bit ? "core2" : "yonah";
+      }
+      return is64Bit ? "x86-64" : "pentium4";
+    }
+    case llvm::Triple::aarch64:
+      return triple.isOSDarwin() ? "cyclone" : "generic";
+    default:
+      return "";
+  }
+}
+
+// Lower the module to an object file in memory and return the size of its
+// .text section. This is equivalent to running `clang -c` on the module and
+// reading the text size reported by `llvm-size`, without the subprocesses or
+// the round trip through a textual IR file.
+Status getObjectTextSizeInBytes(llvm::Module& module, int64_t* value) {
+  static std::once_flag targetsInitialized;
+  std::call_once(targetsInitialized, []() {
+    llvm::InitializeAllTargetInfos();
+    llvm::InitializeAllTargets();
+    llvm::InitializeAllTargetMCs();
+    llvm::InitializeAllAsmPrinters();
+  });
+
+  // clang compiles IR files for its default target, overriding the triple of
+  // the module, and uses the default CPU of that target with no additional
+  // features.
+  const std::string triple = llvm::sys::getDefaultTargetTriple();
+  const std::string cpu = getClangDefaultCpu(llvm::Triple(triple));
+  std::string error;
+  const llvm::Target* target = llvm::TargetRegistry::lookupTarget(triple, error);
+  if (!target) {
+    return Status(StatusCode::INTERNAL,
+                  fmt::format("Failed to find target for triple {}: {}", triple, error));
+  }
+
+  // Match the code generation options of `clang -c` on an IR file. Without an
+  // optimization level, clang does not optimize and relaxes all instructions
+  // in the integrated assembler.
+  llvm::TargetOptions options;
+  options.MCOptions.MCRelaxAll = true;
+  std::unique_ptr<llvm::TargetMachine> targetMachine(
+      target->createTargetMachine(triple, cpu, /*Features=*/"", options,
+                                  /*RM=*/llvm::None, /*CM=*/llvm::None, llvm::CodeGenOpt::None));
+  if (!targetMachine) {
+    return Status(StatusCode::INTERNAL,
+                  fmt::format("Failed to create target machine for triple {}", triple));
+  }
+
+  // Code generation modifies the module, so lower a copy.
+  std::unique_ptr<llvm::Module> clone = llvm::CloneModule(module);
+  clone->setTargetTriple(triple);
+  clone->setDataLayout(targetMachine->createDataLayout());
+
+  llvm::SmallVector<char, 0> buffer;
+  llvm::raw_svector_ostream stream(buffer);
+  llvm::legacy::PassManager passManager;
+  // The -O0 pipeline of clang runs only the always-inliner.
+  passManager.add(llvm::createAlwaysInlinerLegacyPass());
+  if (targetMachine->addPassesToEmitFile(passManager, stream, /*DwoOut=*/nullptr,
+                                         llvm::CGFT_ObjectFile)) {
+    return Status(StatusCode::INTERNAL, fmt::format("Target {} cannot emit object files", triple));
+  }
+  passManager.run(*clone);
+
+  auto object = llvm::object::ObjectFile::createObjectFile(
+      llvm::MemoryBufferRef(llvm::StringRef(buffer.data(), buffer.size()), module.getName()));
+  if (!object) {
+    return Status(StatusCode::INTERNAL, fmt::format("Failed to read object file: {}",
+                                                    llvm::toString(object.takeError())));
+  }
+
+  // Sum the sizes of the sections that llvm-size counts as text.
+  int64_t size = 0;
+  for (const auto& section : (*object)->sections()) {
+    if (section.isBerkeleyText()) {
+      size += static_cast<int64_t>(section.getSize());
+    }
+  }
+  *value = size;
+  return Status::OK;
+}
+
+#ifdef COMPILER_GYM_EXPERIMENTAL_TEXT_SIZE_COST
 // Serialize the module to a string.
 std::string moduleToString(llvm::Module& module) {
   std::string str;
@@ -61,15 +172,12 @@ std::string moduleToString(llvm::Module& module) {
   return str;
 }
 
-// For the experimental binary .text size cost, getTextSizeInBytes() is extended
-// to support a list of additional args to pass to clang.
-#ifdef COMPILER_GYM_EXPERIMENTAL_TEXT_SIZE_COST
+// Compile the module using clang with a list of additional args and extract
+// the .text size of the generated file using llvm-size. This is used by the
+// experimental binary .text size cost, which requires linking.
 Status getTextSizeInBytes(llvm::Module& module, int64_t* value,
                           const std::vector<std::string>& clangArgs,
                           const fs::path& workingDirectory) {
-#else
-Status getTextSizeInBytes(llvm::Module& module, int64_t* value, const fs::path& workingDirectory) {
-#endif
   const auto clangPath = util::getSiteDataPath("llvm-v0/bin/clang");
   const auto llvmSizePath = util::getSiteDataPath("llvm-v0/bin/llvm-size");
   DCHECK(fs::exists(clangPath)) << fmt::format("File not found: {}", clangPath.string());
@@ -81,18 +189,11 @@ Status getTextSizeInBytes(llvm::Module& module, int64_t* value, const fs::path&
 
   const auto tmpFile = fs::unique_path(workingDirectory / "obj-%%%%");
 
-#ifdef COMPILER_GYM_EXPERIMENTAL_TEXT_SIZE_COST
   std::vector<std::string> clangCmd{clangPath.string(), "-w", "-xir", "-", "-o", tmpFile.string()};
   clangCmd.insert(clangCmd.end(), clangArgs.begin(), clangArgs.end());
   auto clang =
       subprocess::Popen(clangCmd, subprocess::input{subprocess::PIPE},
                         subprocess::output{subprocess::PIPE}, subprocess::error{subprocess::PIPE});
-#else
-  auto clang =
-      subprocess::Popen({clangPath.string(), "-w", "-xir", "-", "-o", tmpFile.string(), "-c"},
-                        subprocess::input{subprocess::PIPE}, subprocess::output{subprocess::PIPE},
-                        subprocess::error{subprocess::PIPE});
-#endif
   const auto clangOutput = clang.communicate(ir.c_str(), ir.size());
   if (clang.retcode()) {
     fs::remove(tmpFile);
@@ -132,6 +233,7 @@ Status getTextSizeInBytes(llvm::Module& module, int64_t* value, const fs::path&
   }
   return Status::OK;
 }
+#endif
 
 inline size_t getBaselineCostIndex(LlvmBaselinePolicy policy, LlvmCostFunction cost) {
   return static_cast<size_t>(magic_enum::enum_count<LlvmCostFunction>()) *
@@ -139,6 +241,63 @@ inline size_t getBaselineCostIndex(LlvmBaselinePolicy policy, LlvmCostFunction c
          static_cast<size_t>(cost);
 }
 
+// Read a file of baseline costs. Costs that have not been computed are stored
+// as NaN. Returns false if there is no complete file.
+bool readBaselineCostsFile(const fs::path& path,
+                           std::array<std::optional<double>, numBaselineCosts>* costs) {
+  std::array<double, numBaselineCosts> values;
+  std::ifstream file(path.string(), std::ios::binary);
+  if (!file) {
+    return false;
+  }
+  file.read(reinterpret_cast<char*>(values.data()), sizeof(values));
+  if (file.gcount() != sizeof(values)) {
+    return false;
+  }
+  for (size_t i = 0; i < numBaselineCosts; ++i) {
+    if (!std::isnan(values[i])) {
+      (*costs)[i] = values[i];
+    }
+  }
+  return true;
+}
+
+// Write a file of baseline costs. The file is written to a temporary path and
+// then renamed into place so that concurrent readers never observe a partially
+// written file. Failure to write the file is not an error.
+void writeBaselineCostsFile(const fs::path& path,
+                            const std::array<std::optional<double>, numBaselineCosts>& costs) {
+  std::array<double, numBaselineCosts> values;
+  for (size_t i = 0; i < numBaselineCosts; ++i) {
+    values[i] = costs[i].value_or(std::numeric_limits<double>::quiet_NaN());
+  }
+
+  boost::system::error_code error;
+  fs::create_directories(path.parent_path(), error);
+  if (error) {
+    LOG(WARNING) << "Failed to create baseline costs cache directory: "
+                 << path.parent_path().string();
+    return;
+  }
+
+  const auto tmpPath = fs::unique_path(path.string() + ".tmp-%%%%%%%%");
+  {
+    std::ofstream file(tmpPath.string(), std::ios::binary);
+    file.write(reinterpret_cast<const char*>(values.data()), sizeof(values));
+    if (!file) {
+      LOG(WARNING) << "Failed to write baseline costs cache entry: " << tmpPath.string();
+      fs::remove(tmpPath, error);
+      return;
+    }
+  }
+
+  fs::rename(tmpPath, path, error);
+  if (error) {
+    LOG(WARNING) << "Failed to write baseline costs cache entry: " << path.string();
+    fs::remove(tmpPath, error);
+  }
+}
+
 }  // anonymous namespace
 
 double getCost(const LlvmCostFunction& cost, llvm::Module& module,
@@ -148,11 +307,7 @@ double getCost(const LlvmCostFunction& cost, llvm::Module& module,
       return static_cast<double>(module.getInstructionCount());
     case LlvmCostFunction::OBJECT_TEXT_SIZE_BYTES: {
       int64_t size;
-#ifdef COMPILER_GYM_EXPERIMENTAL_TEXT_SIZE_COST
-      const auto status = getTextSizeInBytes(module, &size, {"-c"}, workingDirectory);
-#else
-      const auto status = getTextSizeInBytes(module, &size, workingDirectory);
-#endif
+      const auto status = getObjectTextSizeInBytes(module, &size);
       CHECK(status.ok()) << status.error_message();
       return static_cast<double>(size);
     }
@@ -177,46 +332,102 @@ double getCost(const LlvmCostFunction& cost, llvm::Module& module,
   UNREACHABLE("Unhandled cost");
 }
 
-double getBaselineCost(const BaselineCosts& baselineCosts, LlvmBaselinePolicy policy,
-                       LlvmCostFunction cost) {
-  return baselineCosts[getBaselineCostIndex(policy, cost)];
-}
-
-void setbaselineCosts(const llvm::Module& unoptimizedModule, BaselineCosts* baselineCosts,
-                      const fs::path& workingDirectory) {
-  // Create a copy of the unoptimized module and apply the default set of LLVM
-  // optimizations.
-  std::unique_ptr<llvm::Module> moduleO0 = llvm::CloneModule(unoptimizedModule);
+BaselineCosts::BaselineCosts(llvm::StringRef unoptimizedBitcode, const fs::path& workingDirectory,
+                             std::optional<fs::path> cachePath)
+    : unoptimizedBitcode_(unoptimizedBitcode),
+      workingDirectory_(workingDirectory),
+      cachePath_(cachePath),
+      cacheRead_(false) {}
 
-  std::unique_ptr<llvm::Module> moduleOz = llvm::CloneModule(unoptimizedModule);
-  applyBaselineOptimizations(moduleOz.get(), /*optLevel=*/2, /*sizeLevel=*/2);
+double BaselineCosts::get(LlvmBaselinePolicy policy, LlvmCostFunction cost) const {
+  const std::lock_guard<std::mutex> lock(mutex_);
+  if (!cacheRead_) {
+    readCache();
+    cacheRead_ = true;
+  }
 
-  std::unique_ptr<llvm::Module> moduleO3 = llvm::CloneModule(unoptimizedModule);
-  applyBaselineOptimizations(moduleO3.get(), /*optLevel=*/3, /*sizeLevel=*/0);
+  auto& entry = costs_[getBaselineCostIndex(policy, cost)];
+  if (!entry.has_value()) {
+    entry = getCost(cost, baselineModule(policy), workingDirectory_);
+    writeCache();
+    releaseCompleteModules();
+  }
+  return *entry;
+}
 
+void BaselineCosts::releaseCompleteModules() const {
+  bool anyModules = false;
   for (const auto policy : magic_enum::enum_values<LlvmBaselinePolicy>()) {
-    // Set the baseline module.
-    llvm::Module* baselineModule{nullptr};
-    switch (policy) {
-      case LlvmBaselinePolicy::O0:
-        baselineModule = moduleO0.get();
-        break;
-      case LlvmBaselinePolicy::O3:
-        baselineModule = moduleO3.get();
-        break;
-      case LlvmBaselinePolicy::Oz:
-        baselineModule = moduleOz.get();
-        break;
+    auto& module = modules_[static_cast<size_t>(policy)];
+    if (!module) {
+      continue;
+    }
+    const auto& costFunctions = magic_enum::enum_values<LlvmCostFunction>();
+    if (std::all_of(costFunctions.begin(), costFunctions.end(), [&](LlvmCostFunction cost) {
+          return costs_[getBaselineCostIndex(policy, cost)].has_value();
+        })) {
+      module.reset();
+    } else {
+      anyModules = true;
     }
-    DCHECK(baselineModule);
+  }
+  if (!anyModules) {
+    context_.reset();
+  }
+}
+
+llvm::Module& BaselineCosts::baselineModule(LlvmBaselinePolicy policy) const {
+  auto& module = modules_[static_cast<size_t>(policy)];
+  if (module) {
+    return *module;
+  }
 
-    // Compute and set the baseline costs.
-    for (const auto cost : magic_enum::enum_values<LlvmCostFunction>()) {
-      const auto idx = getBaselineCostIndex(policy, cost);
-      const auto cc = getCost(cost, *baselineModule, workingDirectory);
-      (*baselineCosts)[idx] = cc;
+  if (!context_) {
+    context_ = std::make_unique<llvm::LLVMContext>();
+  }
+  llvm::MemoryBufferRef buffer(unoptimizedBitcode_.str(), "baseline");
+  auto moduleOrError = llvm::parseBitcodeFile(buffer, *context_);
+  CHECK(moduleOrError) << "Failed to parse baseline bitcode: "
+                       << llvm::toString(moduleOrError.takeError());
+  module = std::move(moduleOrError.get());
+
+  // Apply the default set of LLVM optimizations for the policy.
+  switch (policy) {
+    case LlvmBaselinePolicy::O0:
+      break;
+    case LlvmBaselinePolicy::O3:
+      applyBaselineOptimizations(module.get(), /*optLevel=*/3, /*sizeLevel=*/0);
+      break;
+    case LlvmBaselinePolicy::Oz:
+      applyBaselineOptimizations(module.get(), /*optLevel=*/2, /*sizeLevel=*/2);
+      break;
+  }
+  return *module;
+}
+
+void BaselineCosts::readCache() const {
+  if (!cachePath_.has_value()) {
+    return;
+  }
+  std::array<std::optional<double>, numBaselineCosts> cached;
+  if (readBaselineCostsFile(*cachePath_, &cached)) {
+    VLOG(3) << "Read baseline costs from cache: " << cachePath_->string();
+    for (size_t i = 0; i < numBaselineCosts; ++i) {
+      if (!costs_[i].has_value()) {
+        costs_[i] = cached[i];
+      }
     }
   }
 }
 
+void BaselineCosts::writeCache() const {
+  if (!cachePath_.has_value()) {
+    return;
+  }
+  // Merge with any entries that other processes have added since the cache
+  // was read so that they are not lost.
+  readCache();
+  writeBaselineCostsFile(*cachePath_, costs_);
+}
+
 }  // namespace compiler_gym::llvm_service
@@ -4,10 +4,16 @@
 // LICENSE file in the root directory of this source tree.
 #pragma once
 
+#include <array>
 #include <magic_enum.hpp>
+#include <memory>
+#include <mutex>
 #include <optional>
 
 #include "boost/filesystem.hpp"
+#include "llvm/ADT/SmallString.h"
+#include "llvm/ADT/StringRef.h"
+#include "llvm/IR/LLVMContext.h"
 #include "llvm/IR/Module.h"
 
 namespace compiler_gym::llvm_service {
@@ -31,9 +37,9 @@ enum class LlvmBaselinePolicy {
 };
 
 constexpr size_t numCosts = magic_enum::enum_count<LlvmCostFunction>();
-constexpr size_t numBaselineCosts = magic_enum::enum_count<LlvmBaselinePolicy>() * numCosts;
+constexpr size_t numBaselinePolicies = magic_enum::enum_count<LlvmBaselinePolicy>();
+constexpr size_t numBaselineCosts = numBaselinePolicies * numCosts;
 
-using BaselineCosts = std::array<double, numBaselineCosts>;
 using PreviousCosts = std::array<std::optional<double>, numCosts>;
 
 // TODO(cummins): Refactor cost calculation to allow graceful error handling
@@ -43,12 +49,49 @@ using PreviousCosts = std::array<std::optional<double>, numCosts>;
 double getCost(const LlvmCostFunction& cost, llvm::Module& module,
                const boost::filesystem::path& workingDirectory);
 
-// Return a baseline cost.
-double getBaselineCost(const BaselineCosts& baselineCosts, LlvmBaselinePolicy policy,
-                       LlvmCostFunction cost);
+// A table of the costs of a module after applying each of the baseline
+// policies. The table is lazily evaluated: an entry is computed the first time
+// it is requested, and a baseline policy is only applied to the module when
+// one of its costs is first needed. The module of a policy is released once
+// all of its costs are known.
+//
+// If a cache path is provided, computed costs are persisted to that file and
+// shared with other processes that use the same path.
+//
+// A table is thread safe, and is shared between a benchmark and its clones.
+class BaselineCosts {
+ public:
+  // Construct a table for the unoptimized module with the given bitcode.
+  BaselineCosts(llvm::StringRef unoptimizedBitcode, const boost::filesystem::path& workingDirectory,
+                std::optional<boost::filesystem::path> cachePath = std::nullopt);
+
+  // Return a baseline cost, computing it if required.
+  double get(LlvmBaselinePolicy policy, LlvmCostFunction cost) const;
+
+ private:
+  // Return the module for the given baseline policy, creating it if required.
+  // The caller must hold mutex_.
+  llvm::Module& baselineModule(LlvmBaselinePolicy policy) const;
 
-// Compute the costs of baseline policies.
-void setbaselineCosts(const llvm::Module& unoptimizedModule, BaselineCosts* baselineCosts,
-                      const boost::filesystem::path& workingDirectory);
+  // Release the modules of the policies whose costs are all known, and the
+  // LLVM context once no modules remain. The caller must hold mutex_.
+  void releaseCompleteModules() const;
+
+  // Read and write the cost entries that are persisted at cachePath_. The
+  // caller must hold mutex_.
+  void readCache() const;
+  void writeCache() const;
+
+  const llvm::SmallString<0> unoptimizedBitcode_;
+  const boost::filesystem::path workingDirectory_;
+  const std::optional<boost::filesystem::path> cachePath_;
+
+  mutable std::mutex mutex_;
+  mutable bool cacheRead_;
+  mutable std::array<std::optional<double>, numBaselineCosts> costs_;
+  // NOTE: The LLVMContext must be declared before the modules that it owns.
+  mutable std::unique_ptr<llvm::LLVMContext> context_;
+  mutable std::array<std::unique_ptr<llvm::Module>, numBaselinePolicies> modules_;
+};
 
 }  // namespace compiler_gym::llvm_service
@@ -4,13 +4,19 @@
 // LICENSE file in the root directory of this source tree.
 #include "compiler_gym/envs/llvm/service/LlvmService.h"
 
+#include <gflags/gflags.h>
 #include <glog/logging.h>
 
+#include <future>
 #include <optional>
+#include <shared_mutex>
 #include <sstream>
+#include <unordered_set>
+#include <vector>
 
 #include "compiler_gym/envs/llvm/service/ActionSpace.h"
 #include "compiler_gym/envs/llvm/service/ObservationSpaces.h"
+#include "compiler_gym/envs/llvm/service/RewardSpaces.h"
 #include "compiler_gym/service/proto/compiler_gym_service.pb.h"
 #include "compiler_gym/util/EnumUtil.h"
 #include "compiler_gym/util/GrpcStatusMacros.h"
@@ -18,6 +24,12 @@
 #include "llvm/ADT/Triple.h"
 #include "llvm/Config/llvm-config.h"
 
+DEFINE_int32(transposition_table_size, 0,
+             "If greater than zero, the service records the results of actions and the "
+             "observations of modules in a transposition table that is shared by all sessions, "
+             "holding up to this many modules. Actions whose results are in the table are not "
+             "run again.");
+
 namespace compiler_gym::llvm_service {
 
 using grpc::ServerContext;
@@ -26,7 +38,12 @@ using grpc::StatusCode;
 namespace fs = boost::filesystem;
 
 LlvmService::LlvmService(const fs::path& workingDirectory)
-    : workingDirectory_(workingDirectory), benchmarkFactory_(workingDirectory), nextSessionId_(0) {}
+    : workingDirectory_(workingDirectory),
+      benchmarkFactory_(workingDirectory),
+      nextSessionId_(0),
+      transpositionTable_(FLAGS_transposition_table_size > 0
+                              ? std::make_shared<TranspositionTable>(FLAGS_transposition_table_size)
+                              : nullptr) {}
 
 Status LlvmService::GetVersion(ServerContext* /* unused */, const GetVersionRequest* /* unused */,
                                GetVersionReply* reply) {
@@ -45,30 +62,39 @@ Status LlvmService::GetSpaces(ServerContext* /* unused */, const GetSpacesReques
   *reply->mutable_action_space_list() = {actionSpaces.begin(), actionSpaces.end()};
   const auto observationSpaces = getLlvmObservationSpaceList();
   *reply->mutable_observation_space_list() = {observationSpaces.begin(), observationSpaces.end()};
+  const auto rewardSpaces = getLlvmRewardSpaceNameList();
+  *reply->mutable_reward_space_list() = {rewardSpaces.begin(), rewardSpaces.end()};
 
   return Status::OK;
 }
 
 Status LlvmService::StartSession(ServerContext* /* unused */, const StartSessionRequest* request,
                                  StartSessionReply* reply) {
-  const std::lock_guard<std::mutex> lock(sessionsMutex_);
-
   std::unique_ptr<Benchmark> benchmark;
-  if (request->benchmark().size()) {
-    RETURN_IF_ERROR(benchmarkFactory_.getBenchmark(request->benchmark(), &benchmark));
-  } else {
-    RETURN_IF_ERROR(benchmarkFactory_.getBenchmark(&benchmark));
+  {
+    const std::lock_guard<std::mutex> lock(benchmarkFactoryMutex_);
+    if (request->benchmark().size()) {
+      RETURN_IF_ERROR(benchmarkFactory_.getBenchmark(request->benchmark(), &benchmark));
+    } else {
+      RETURN_IF_ERROR(benchmarkFactory_.getBenchmark(&benchmark));
+    }
   }
 
   reply->set_benchmark(benchmark->name());
-  VLOG(1) << "StartSession(" << benchmark->name() << "), [" << nextSessionId_ << "]";
+  VLOG(1) << "StartSession(" << benchmark->name() << ")";
 
   LlvmActionSpace actionSpace;
   RETURN_IF_ERROR(util::intToEnum(request->action_space(), &actionSpace));
 
-  // Construct the environment.
+  // Construct the environment. The session is not visible to other threads
+  // until it is added to the session table, so no locking is required.
   auto session =
-      std::make_unique<LlvmSession>(std::move(benchmark), actionSpace, workingDirectory_);
+      std::make_shared<LlvmSession>(std::move(benchmark), actionSpace, workingDirectory_);
+  session->setUseSharedMemory(request->use_shared_memory());
+  session->setTranspositionTable(transpositionTable_);
+  if (!request->reward_space().empty()) {
+    RETURN_IF_ERROR(session->initReward(request->reward_space()));
+  }
 
   // Compute the initial observations.
   for (int i = 0; i < request->observation_space_size(); ++i) {
@@ -78,63 +104,168 @@ Status LlvmService::StartSession(ServerContext* /* unused */, const StartSession
     RETURN_IF_ERROR(session->getObservation(observationSpace, observation));
   }
 
-  reply->set_session_id(nextSessionId_);
-  sessions_[nextSessionId_] = std::move(session);
-  ++nextSessionId_;
+  reply->set_session_id(addSession(std::move(session)));
 
   return Status::OK;
 }
 
 Status LlvmService::ForkSession(ServerContext* /* unused */, const ForkSessionRequest* request,
                                 ForkSessionReply* reply) {
-  const std::lock_guard<std::mutex> lock(sessionsMutex_);
-
-  LlvmSession* environment;
+  std::shared_ptr<LlvmSession> environment;
   RETURN_IF_ERROR(session(request->session_id(), &environment));
-  VLOG(1) << "ForkSession(" << request->session_id() << "), [" << nextSessionId_ << "]";
-
-  // Construct the environment.
-  reply->set_session_id(nextSessionId_);
-  sessions_[nextSessionId_] =
-      std::make_unique<LlvmSession>(environment->benchmark().clone(environment->workingDirectory()),
-                                    environment->actionSpace(), environment->workingDirectory());
+  VLOG(1) << "ForkSession(" << request->session_id() << ")";
+
+  // Construct the environment. Only the parent session is locked while it is
+  // forked, so forks of distinct sessions proceed in parallel.
+  std::shared_ptr<LlvmSession> fork;
+  {
+    const std::lock_guard<std::mutex> lock(environment->mutex());
+    fork = environment->fork();
+  }
 
-  ++nextSessionId_;
+  reply->set_session_id(addSession(std::move(fork)));
 
   return Status::OK;
 }
 
 Status LlvmService::EndSession(grpc::ServerContext* /* unused */, const EndSessionRequest* request,
                                EndSessionReply* reply) {
-  const std::lock_guard<std::mutex> lock(sessionsMutex_);
-
   // Note that unlike the other methods, no error is thrown if the requested
   // session does not exist.
-  if (sessions_.find(request->session_id()) != sessions_.end()) {
-    const LlvmSession* environment;
-    RETURN_IF_ERROR(session(request->session_id(), &environment));
+  std::shared_ptr<LlvmSession> environment;
+  {
+    const std::unique_lock<std::shared_mutex> lock(sessionsMutex_);
+    auto it = sessions_.find(request->session_id());
+    if (it != sessions_.end()) {
+      environment = std::move(it->second);
+      sessions_.erase(it);
+    }
+    reply->set_remaining_sessions(sessions_.size());
+  }
+
+  // The session is destroyed outside of the session table lock, once any
+  // in-flight operation on it has released its reference.
+  if (environment) {
+    const std::lock_guard<std::mutex> lock(environment->mutex());
     VLOG(1) << "Step " << environment->actionCount() << " EndSession("
             << environment->benchmark().name() << "), [" << request->session_id() << "]";
-
-    sessions_.erase(request->session_id());
   }
 
-  reply->set_remaining_sessions(sessions_.size());
   return Status::OK;
 }
 
+Status LlvmService::SnapshotSession(ServerContext* /* unused */,
+                                    const SnapshotSessionRequest* request,
+                                    SnapshotSessionReply* reply) {
+  std::shared_ptr<LlvmSession> environment;
+  RETURN_IF_ERROR(session(request->session_id(), &environment));
+  VLOG(1) << "SnapshotSession(" << request->session_id() << ")";
+
+  const std::lock_guard<std::mutex> lock(environment->mutex());
+  reply->set_snapshot_id(environment->snapshot());
+  return Status::OK;
+}
+
+Status LlvmService::RestoreSession(ServerContext* /* unused */,
+                                   const RestoreSessionRequest* request,
+                                   RestoreSessionReply* /* unused */) {
+  std::shared_ptr<LlvmSession> environment;
+  RETURN_IF_ERROR(session(request->session_id(), &environment));
+  VLOG(1) << "RestoreSession(" << request->session_id() << ", " << request->snapshot_id() << ")";
+
+  const std::lock_guard<std::mutex> lock(environment->mutex());
+  return environment->restore(request->snapshot_id());
+}
+
 Status LlvmService::Step(ServerContext* /* unused */, const StepRequest* request,
                          StepReply* reply) {
-  LlvmSession* environment;
+  std::shared_ptr<LlvmSession> environment;
   RETURN_IF_ERROR(session(request->session_id(), &environment));
 
+  const std::lock_guard<std::mutex> lock(environment->mutex());
   VLOG(2) << "Step " << environment->actionCount() << " Step()";
   return environment->step(*request, reply);
 }
 
+Status LlvmService::BatchStep(ServerContext* /* unused */, const BatchStepRequest* request,
+                              BatchStepReply* reply) {
+  VLOG(2) << "BatchStep(" << request->request_size() << ")";
+
+  // Resolve all of the sessions before running any actions so that an invalid
+  // batch fails without modifying any session state.
+  std::vector<std::shared_ptr<LlvmSession>> environments;
+  std::unordered_set<uint64_t> sessionIds;
+  environments.reserve(request->request_size());
+  for (int i = 0; i < request->request_size(); ++i) {
+    const uint64_t sessionId = request->request(i).session_id();
+    if (!sessionIds.insert(sessionId).second) {
+      return Status(StatusCode::INVALID_ARGUMENT,
+                    fmt::format("Duplicate session in batch: {}", sessionId));
+    }
+    std::shared_ptr<LlvmSession> environment;
+    RETURN_IF_ERROR(session(sessionId, &environment));
+    environments.push_back(std::move(environment));
+  }
+
+  // Allocate the replies up front so that each worker thread writes to its own
+  // message.
+  std::vector<StepReply*> replies;
+  replies.reserve(request->request_size());
+  for (int i = 0; i < request->request_size(); ++i) {
+    replies.push_back(reply->add_reply());
+  }
+
+  // Each session owns its own LLVMContext, so distinct sessions can be stepped
+  // in parallel.
+  std::vector<std::future<Status>> steps;
+  steps.reserve(request->request_size());
+  for (int i = 0; i < request->request_size(); ++i) {
+    steps.push_back(std::async(std::launch::async, [&, i]() {
+      const std::lock_guard<std::mutex> lock(environments[i]->mutex());
+      return environments[i]->step(request->request(i), replies[i]);
+    }));
+  }
+
+  // Wait for every step to complete before returning, reporting the first
+  // error in request order.
+  Status status = Status::OK;
+  for (auto& step : steps) {
+    const Status stepStatus = step.get();
+    if (status.ok() && !stepStatus.ok()) {
+      status = stepStatus;
+    }
+  }
+  return status;
+}
+
+Status LlvmService::StepStream(ServerContext* /* unused */,
+                               grpc::ServerReaderWriter<StepReply, StepRequest>* stream) {
+  VLOG(2) << "StepStream()";
+  StepRequest request;
+  while (stream->Read(&request)) {
+    std::shared_ptr<LlvmSession> environment;
+    RETURN_IF_ERROR(session(request.session_id(), &environment));
+
+    StepReply reply;
+    {
+      const std::lock_guard<std::mutex> lock(environment->mutex());
+      VLOG(2) << "Step " << environment->actionCount() << " StepStream()";
+      RETURN_IF_ERROR(environment->step(request, &reply));
+    }
+
+    if (!stream->Write(reply)) {
+      // The client has closed the stream.
+      break;
+    }
+  }
+
+  return Status::OK;
+}
+
 Status LlvmService::AddBenchmark(ServerContext* /* unused */, const AddBenchmarkRequest* request,
                                  AddBenchmarkReply* reply) {
   VLOG(2) << "AddBenchmark()";
+  const std::lock_guard<std::mutex> lock(benchmarkFactoryMutex_);
   for (int i = 0; i < request->benchmark_size(); ++i) {
     RETURN_IF_ERROR(addBenchmark(request->benchmark(i)));
   }
@@ -171,6 +302,7 @@ Status LlvmService::addBenchmark(const ::compiler_gym::Benchmark& request) {
 Status LlvmService::GetBenchmarks(ServerContext* /* unused */,
                                   const GetBenchmarksRequest* /* unused */,
                                   GetBenchmarksReply* reply) {
+  const std::lock_guard<std::mutex> lock(benchmarkFactoryMutex_);
   for (const auto& benchmark : benchmarkFactory_.getBenchmarkNames()) {
     reply->add_benchmark(benchmark);
   }
@@ -178,24 +310,22 @@ Status LlvmService::GetBenchmarks(ServerContext* /* unused */,
   return Status::OK;
 }
 
-Status LlvmService::session(uint64_t id, LlvmSession** environment) {
+Status LlvmService::session(uint64_t id, std::shared_ptr<LlvmSession>* environment) const {
+  const std::shared_lock<std::shared_mutex> lock(sessionsMutex_);
   auto it = sessions_.find(id);
   if (it == sessions_.end()) {
     return Status(StatusCode::INVALID_ARGUMENT, fmt::format("Session not found: {}", id));
   }
 
-  *environment = it->second.get();
+  *environment = it->second;
   return Status::OK;
 }
 
-Status LlvmService::session(uint64_t id, const LlvmSession** environment) const {
-  auto it = sessions_.find(id);
-  if (it == sessions_.end()) {
-    return Status(StatusCode::INVALID_ARGUMENT, fmt::format("Session not found: {}", id));
-  }
-
-  *environment = it->second.get();
-  return Status::OK;
+uint64_t LlvmService::addSession(std::shared_ptr<LlvmSession> environment) {
+  const uint64_t id = nextSessionId_++;
+  const std::unique_lock<std::shared_mutex> lock(sessionsMutex_);
+  sessions_[id] = std::move(environment);
+  return id;
 }
 
 }  // namespace compiler_gym::llvm_service
@@ -6,13 +6,16 @@
 
 #include <grpcpp/grpcpp.h>
 
+#include <atomic>
 #include <memory>
 #include <mutex>
+#include <shared_mutex>
 
 #include "boost/filesystem.hpp"
 #include "compiler_gym/envs/llvm/service/Benchmark.h"
 #include "compiler_gym/envs/llvm/service/BenchmarkFactory.h"
 #include "compiler_gym/envs/llvm/service/LlvmSession.h"
+#include "compiler_gym/envs/llvm/service/TranspositionTable.h"
 #include "compiler_gym/service/proto/compiler_gym_service.grpc.pb.h"
 #include "compiler_gym/service/proto/compiler_gym_service.pb.h"
 
@@ -39,12 +42,27 @@ class LlvmService final : public CompilerGymService::Service {
   grpc::Status EndSession(grpc::ServerContext* context, const EndSessionRequest* request,
                           EndSessionReply* reply) final override;
 
-  // NOTE: Step() is not thread safe. The underlying assumption is that each
-  // LlvmSession is managed by a single thread, so race conditions between
-  // operations that affect the same LlvmSession are not protected against.
+  grpc::Status SnapshotSession(grpc::ServerContext* context, const SnapshotSessionRequest* request,
+                               SnapshotSessionReply* reply) final override;
+
+  grpc::Status RestoreSession(grpc::ServerContext* context, const RestoreSessionRequest* request,
+                              RestoreSessionReply* reply) final override;
+
+  // Step() holds the lock of the session being stepped, so distinct sessions
+  // may be stepped in parallel and concurrent calls on the same session are
+  // serialized.
   grpc::Status Step(grpc::ServerContext* context, const StepRequest* request,
                     StepReply* reply) final override;
 
+  // Step a batch of sessions concurrently, one thread per session. The batch
+  // must not contain duplicate session IDs.
+  grpc::Status BatchStep(grpc::ServerContext* context, const BatchStepRequest* request,
+                         BatchStepReply* reply) final override;
+
+  // Step sessions from a stream of requests, writing one reply per request.
+  grpc::Status StepStream(grpc::ServerContext* context,
+                          grpc::ServerReaderWriter<StepReply, StepRequest>* stream) final override;
+
   grpc::Status AddBenchmark(grpc::ServerContext* context, const AddBenchmarkRequest* request,
                             AddBenchmarkReply* reply) final override;
 
@@ -52,18 +70,29 @@ class LlvmService final : public CompilerGymService::Service {
                              GetBenchmarksReply* reply) final override;
 
  protected:
-  grpc::Status session(uint64_t id, LlvmSession** environment);
-  grpc::Status session(uint64_t id, const LlvmSession** environment) const;
+  // Look up a session by ID. The returned pointer keeps the session alive
+  // even if it is concurrently removed by EndSession().
+  grpc::Status session(uint64_t id, std::shared_ptr<LlvmSession>* environment) const;
+
+  // Add a session to the session table and return its ID.
+  uint64_t addSession(std::shared_ptr<LlvmSession> environment);
 
   grpc::Status addBenchmark(const ::compiler_gym::Benchmark& request);
 
  private:
   const boost::filesystem::path workingDirectory_;
-  std::unordered_map<uint64_t, std::unique_ptr<LlvmSession>> sessions_;
-  // Mutex used to ensure thread safety of creation and destruction of sessions.
-  std::mutex sessionsMutex_;
+  std::unordered_map<uint64_t, std::shared_ptr<LlvmSession>> sessions_;
+  // Reader/writer lock for the session table. Lookups take a shared lock and
+  // are held only for the duration of the lookup. Insertion and removal take
+  // an exclusive lock. Operations on a session are protected by the session's
+  // own mutex, see LlvmSession::mutex().
+  mutable std::shared_mutex sessionsMutex_;
   BenchmarkFactory benchmarkFactory_;
-  uint64_t nextSessionId_;
+  // Mutex used to ensure thread safety of the benchmark factory.
+  std::mutex benchmarkFactoryMutex_;
+  std::atomic<uint64_t> nextSessionId_;
+  // A transposition table shared by all sessions. Null if disabled.
+  const std::shared_ptr<TranspositionTable> transpositionTable_;
 };
 
 }  // namespace compiler_gym::llvm_service
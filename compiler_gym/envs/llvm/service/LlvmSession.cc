@@ -5,22 +5,27 @@
 #include "compiler_gym/envs/llvm/service/LlvmSession.h"
 
 #include <cpuinfo.h>
+#include <fcntl.h>
 #include <fmt/format.h>
 #include <glog/logging.h>
+#include <sys/mman.h>
+#include <unistd.h>
 
+#include <algorithm>
+#include <cstring>
+#include <limits>
 #include <optional>
-#include <subprocess/subprocess.hpp>
 
 #include "boost/filesystem.hpp"
 #include "compiler_gym/envs/llvm/service/ActionSpace.h"
 #include "compiler_gym/envs/llvm/service/Cost.h"
+#include "compiler_gym/envs/llvm/service/ProgramlBinary.h"
 #include "compiler_gym/envs/llvm/service/passes/ActionHeaders.h"
 #include "compiler_gym/envs/llvm/service/passes/ActionSwitch.h"
 #include "compiler_gym/third_party/autophase/InstCount.h"
 #include "compiler_gym/third_party/llvm/InstCount.h"
 #include "compiler_gym/util/EnumUtil.h"
 #include "compiler_gym/util/GrpcStatusMacros.h"
-#include "compiler_gym/util/RunfilesPath.h"
 #include "llvm/Bitcode/BitcodeWriter.h"
 #include "llvm/CodeGen/Passes.h"
 #include "llvm/IR/DebugInfo.h"
@@ -30,6 +35,8 @@
 #include "llvm/IR/Verifier.h"
 #include "llvm/InitializePasses.h"
 #include "llvm/Pass.h"
+#include "llvm/Passes/PassBuilder.h"
+#include "llvm/Support/Error.h"
 #include "llvm/Support/TargetSelect.h"
 #include "llvm/Support/raw_ostream.h"
 #include "nlohmann/json.hpp"
@@ -116,6 +123,44 @@ Status writeBitcodeToFile(const llvm::Module& module, const fs::path& path) {
   return Status::OK;
 }
 
+// The number of shared memory files that a session tracks before it stops
+// tracking those that the client has already deleted.
+constexpr size_t kMaxTrackedSharedMemoryFiles = 1024;
+
+// Write a payload to a new memory-mapped file in the working directory and
+// reference it from the observation.
+Status writeSharedMemoryBuffer(const fs::path& workingDirectory, const std::string& data,
+                               Observation* reply) {
+  const auto path = fs::unique_path(workingDirectory / "observation-%%%%%%%%.bin");
+  const int fd = open(path.c_str(), O_RDWR | O_CREAT | O_EXCL, 0600);
+  if (fd < 0) {
+    return Status(StatusCode::INTERNAL,
+                  fmt::format("Failed to create shared memory file: {}", path.string()));
+  }
+
+  if (!data.empty()) {
+    void* region = MAP_FAILED;
+    if (!ftruncate(fd, data.size())) {
+      region = mmap(nullptr, data.size(), PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+    }
+    if (region == MAP_FAILED) {
+      close(fd);
+      fs::remove(path);
+      return Status(StatusCode::RESOURCE_EXHAUSTED,
+                    fmt::format("Failed to map shared memory file: {}", path.string()));
+    }
+    std::memcpy(region, data.data(), data.size());
+    munmap(region, data.size());
+  }
+  close(fd);
+
+  auto buffer = reply->mutable_shared_memory_buffer();
+  buffer->set_path(path.string());
+  buffer->set_offset(0);
+  buffer->set_length(data.size());
+  return Status::OK;
+}
+
 }  // anonymous namespace
 
 LlvmSession::LlvmSession(std::unique_ptr<Benchmark> benchmark, LlvmActionSpace actionSpace,
@@ -124,7 +169,13 @@ LlvmSession::LlvmSession(std::unique_ptr<Benchmark> benchmark, LlvmActionSpace a
       benchmark_(std::move(benchmark)),
       actionSpace_(actionSpace),
       tlii_(getTargetLibraryInfo(benchmark_->module())),
-      actionCount_(0) {
+      actionCount_(0),
+      useSharedMemory_(false),
+      moduleGeneration_(0),
+      verifiedGeneration_(0),
+      observationCacheGeneration_(0),
+      snapshotGeneration_(0),
+      nextSnapshotId_(0) {
   // Initialize LLVM.
   initLlvm();
 
@@ -144,22 +195,147 @@ LlvmSession::LlvmSession(std::unique_ptr<Benchmark> benchmark, LlvmActionSpace a
   CHECK(verifyModuleStatus(benchmark_->module()).ok());
 }
 
+LlvmSession::~LlvmSession() {
+  for (const auto& path : sharedMemoryFiles_) {
+    boost::system::error_code error;
+    fs::remove(path, error);
+  }
+}
+
+LlvmSession::LlvmSession(const LlvmSession& parent, std::unique_ptr<Benchmark> benchmark)
+    : workingDirectory_(parent.workingDirectory()),
+      benchmark_(std::move(benchmark)),
+      actionSpace_(parent.actionSpace()),
+      tlii_(parent.tlii()),
+      actionCount_(0),
+      useSharedMemory_(parent.useSharedMemory()),
+      moduleGeneration_(0),
+      // The module has already been stripped and verified by the parent, so
+      // only re-verify it if the parent had not verified its current module.
+      verifiedGeneration_(parent.verifiedGeneration_ == parent.moduleGeneration()
+                              ? 0
+                              : std::numeric_limits<uint64_t>::max()),
+      observationCacheGeneration_(0),
+      snapshotGeneration_(0),
+      nextSnapshotId_(0) {
+  // The cached observations are shared with the parent, not copied.
+  if (parent.observationCacheGeneration_ == parent.moduleGeneration()) {
+    observationCache_ = parent.observationCache_;
+  }
+  rewards_ = parent.rewards_;
+  transpositionTable_ = parent.transpositionTable_;
+}
+
+std::shared_ptr<const Bitcode> LlvmSession::bitcodeSnapshot() {
+  if (!snapshot_ || snapshotGeneration_ != moduleGeneration()) {
+    if (benchmark().materialized()) {
+      // Compute the hash while serializing the module, as it costs little
+      // extra.
+      BenchmarkHash hash;
+      snapshot_ = std::make_shared<const Bitcode>(getModuleBitcode(benchmark().module(), &hash));
+      snapshotHash_ = hash;
+    } else {
+      snapshot_ = benchmark().snapshot();
+      snapshotHash_.reset();
+    }
+    snapshotGeneration_ = moduleGeneration();
+  }
+  return snapshot_;
+}
+
+BenchmarkHash LlvmSession::moduleHash() {
+  bitcodeSnapshot();
+  if (!snapshotHash_.has_value()) {
+    // The benchmark has not been parsed from its snapshot, so the hash of the
+    // benchmark is the hash of the current module.
+    snapshotHash_ = benchmark().hash();
+  }
+  return *snapshotHash_;
+}
+
+void LlvmSession::restoreModule(std::shared_ptr<const Bitcode> bitcode,
+                                std::optional<BenchmarkHash> hash, bool verified) {
+  benchmark_ = benchmark().clone(bitcode, workingDirectory());
+  markModuleChanged();
+  if (verified) {
+    verifiedGeneration_ = moduleGeneration();
+  }
+  snapshot_ = bitcode;
+  snapshotHash_ = hash;
+  snapshotGeneration_ = moduleGeneration();
+}
+
+std::unique_ptr<LlvmSession> LlvmSession::fork() {
+  // Use new rather than std::make_unique() to call the protected constructor.
+  return std::unique_ptr<LlvmSession>(
+      new LlvmSession(*this, benchmark().clone(bitcodeSnapshot(), workingDirectory())));
+}
+
+uint64_t LlvmSession::snapshot() {
+  const uint64_t id = nextSnapshotId_++;
+  snapshots_.push_front(
+      {id, bitcodeSnapshot(), verifiedGeneration_ == moduleGeneration(), rewards_});
+  if (snapshots_.size() > kMaxSnapshots) {
+    snapshots_.pop_back();
+  }
+  return id;
+}
+
+Status LlvmSession::restore(uint64_t snapshotId) {
+  auto it = std::find_if(snapshots_.begin(), snapshots_.end(),
+                         [snapshotId](const Snapshot& s) { return s.id == snapshotId; });
+  if (it == snapshots_.end()) {
+    return Status(StatusCode::INVALID_ARGUMENT, fmt::format("Snapshot not found: {}", snapshotId));
+  }
+  // Mark the snapshot as most recently used.
+  snapshots_.splice(snapshots_.begin(), snapshots_, it);
+  const Snapshot& snapshot = snapshots_.front();
+  restoreModule(snapshot.bitcode, std::nullopt, snapshot.verified);
+  rewards_ = snapshot.rewards;
+  return Status::OK;
+}
+
 Status LlvmSession::step(const StepRequest& request, StepReply* reply) {
   // Apply the requested actions.
+  const uint64_t initialGeneration = moduleGeneration();
   actionCount_ += request.action_size();
+  pendingTransitions_.clear();
   switch (actionSpace()) {
     case LlvmActionSpace::PASSES_ALL:
-      for (int i = 0; i < request.action_size(); ++i) {
-        LlvmAction action;
-        RETURN_IF_ERROR(util::intToEnum(request.action(i), &action));
-        RETURN_IF_ERROR(runAction(action, reply));
+      if (request.pipeline()) {
+        std::vector<LlvmAction> actions(request.action_size());
+        for (int i = 0; i < request.action_size(); ++i) {
+          RETURN_IF_ERROR(util::intToEnum(request.action(i), &actions[i]));
+        }
+        RETURN_IF_ERROR(runActionPipeline(actions));
+      } else {
+        for (int i = 0; i < request.action_size(); ++i) {
+          LlvmAction action;
+          RETURN_IF_ERROR(util::intToEnum(request.action(i), &action));
+          RETURN_IF_ERROR(runAction(action, reply));
+        }
       }
   }
+  // An action sequence has an effect if any of its actions changed the module.
+  reply->set_action_had_no_effect(moduleGeneration() == initialGeneration);
+
+  // Fail now if we have broken something. A module that has not changed since
+  // it was last verified does not need to be verified again.
+  if (moduleGeneration() != verifiedGeneration_) {
+    RETURN_IF_ERROR(verifyModuleStatus(benchmark().module()));
+    verifiedGeneration_ = moduleGeneration();
+  }
 
-  // Fail now if we have broken something.
-  RETURN_IF_ERROR(verifyModuleStatus(benchmark().module()));
+  // Now that the module is known to be valid, the transitions that produced
+  // it can be shared with other sessions.
+  for (const auto& [hash, action, result] : pendingTransitions_) {
+    transpositionTable_->addTransition(hash, action, result);
+  }
+  pendingTransitions_.clear();
 
-  // Compute the requested observations.
+  // Compute the requested observations. Observations that are requested more
+  // than once, e.g. by both the observation and reward spaces, are served from
+  // the observation cache.
   for (int i = 0; i < request.observation_space_size(); ++i) {
     LlvmObservationSpace observationSpace;
     RETURN_IF_ERROR(util::intToEnum(request.observation_space(i), &observationSpace));
@@ -167,39 +343,103 @@ Status LlvmSession::step(const StepRequest& request, StepReply* reply) {
     RETURN_IF_ERROR(getObservation(observationSpace, observation));
   }
 
+  // Compute the requested reward. The cost is served from the observation
+  // cache if it was also requested as an observation.
+  if (!request.reward_space().empty()) {
+    LlvmReward* stepReward;
+    RETURN_IF_ERROR(getReward(request.reward_space(), &stepReward));
+    Observation cost;
+    RETURN_IF_ERROR(getObservation(stepReward->costObservationSpace(), &cost));
+    reply->set_reward(stepReward->update(cost.scalar_int64()));
+  }
+
+  return Status::OK;
+}
+
+Status LlvmSession::initReward(const std::string& rewardSpace) {
+  LlvmReward* unused;
+  return getReward(rewardSpace, &unused);
+}
+
+Status LlvmSession::getReward(const std::string& rewardSpace, LlvmReward** reward) {
+  LlvmRewardSpace space;
+  RETURN_IF_ERROR(getLlvmRewardSpace(rewardSpace, &space));
+  auto it = rewards_.find(space);
+  if (it == rewards_.end()) {
+    it = rewards_.emplace(space, LlvmReward(space, benchmark().baselineCosts())).first;
+  }
+  *reward = &it->second;
   return Status::OK;
 }
 
 Status LlvmSession::runAction(LlvmAction action, StepReply* reply) {
+  const uint64_t initialGeneration = moduleGeneration();
+
+  if (!transpositionTable_) {
+    RETURN_IF_ERROR(runActionUncached(action));
+    reply->set_action_had_no_effect(moduleGeneration() == initialGeneration);
+    return Status::OK;
+  }
+
+  // Skip running the action if its result is already known.
+  const BenchmarkHash initialHash = moduleHash();
+  if (const auto transition = transpositionTable_->getTransition(initialHash, action)) {
+    if (transition->hash != initialHash) {
+      // Transitions are only recorded for modules that have been verified.
+      restoreModule(transition->bitcode, transition->hash, /*verified=*/true);
+    } else if (transition->changed) {
+      // The action reported a change that produced an identical module. Mark
+      // the module as changed so that the action is reported to have had an
+      // effect, as when the action is run.
+      markModuleChanged();
+      // The module is identical, so its snapshot and hash remain valid.
+      snapshotGeneration_ = moduleGeneration();
+    }
+    reply->set_action_had_no_effect(moduleGeneration() == initialGeneration);
+    return Status::OK;
+  }
+
+  RETURN_IF_ERROR(runActionUncached(action));
+  const bool changed = moduleGeneration() != initialGeneration;
+  reply->set_action_had_no_effect(!changed);
+  pendingTransitions_.emplace_back(
+      initialHash, action,
+      TranspositionTable::Transition{moduleHash(), bitcodeSnapshot(), changed});
+  return Status::OK;
+}
+
+Status LlvmSession::runActionUncached(LlvmAction action) {
 #ifdef EXPERIMENTAL_UNSTABLE_GVN_SINK_PASS
   // NOTE(https://github.com/facebookresearch/CompilerGym/issues/46): The
   // -gvn-sink pass has been found to have nondeterministic behavior so has
-  // been disabled in compiler_gym/envs/llvm/service/pass/config.py. Invoking
-  // the command line was found to produce more stable results.
+  // been disabled in compiler_gym/envs/llvm/service/pass/config.py. It used
+  // to be run in a separate `opt` invocation, which was found to produce more
+  // stable results. It now runs in-process in its own pass pipeline, so that
+  // rationale no longer holds, and the pass must be re-evaluated before it is
+  // enabled.
   if (action == LlvmAction::GVNSINK_PASS) {
-    RETURN_IF_ERROR(runOptWithArgs({"-gvn-sink"}));
-    reply->set_action_had_no_effect(true);
-    return Status::OK;
+    return runPassPipeline("gvn-sink");
   }
 #endif
 
 // Use the generated HANDLE_PASS() switch statement to dispatch to runPass().
-#define HANDLE_PASS(pass) runPass(pass, reply);
+#define HANDLE_PASS(pass) runPass(pass);
   HANDLE_ACTION(action, HANDLE_PASS)
 #undef HANDLE_PASS
 
   return Status::OK;
 }
 
-void LlvmSession::runPass(llvm::Pass* pass, StepReply* reply) {
+void LlvmSession::runPass(llvm::Pass* pass) {
   llvm::legacy::PassManager passManager;
   setupPassManager(&passManager, pass);
 
-  const bool changed = passManager.run(benchmark().module());
-  reply->set_action_had_no_effect(!changed);
+  if (passManager.run(benchmark().module())) {
+    markModuleChanged();
+  }
 }
 
-void LlvmSession::runPass(llvm::FunctionPass* pass, StepReply* reply) {
+void LlvmSession::runPass(llvm::FunctionPass* pass) {
   llvm::legacy::FunctionPassManager passManager(&benchmark().module());
   setupPassManager(&passManager, pass);
 
@@ -208,66 +448,155 @@ void LlvmSession::runPass(llvm::FunctionPass* pass, StepReply* reply) {
     changed |= (passManager.run(function) ? 1 : 0);
   }
   changed |= (passManager.doFinalization() ? 1 : 0);
-  reply->set_action_had_no_effect(!changed);
+  if (changed) {
+    markModuleChanged();
+  }
 }
 
-Status LlvmSession::runOptWithArgs(const std::vector<std::string>& optArgs) {
-  // Create temporary files for `opt` to read from and write to.
-  const auto before_path = fs::unique_path(workingDirectory_ / "module-%%%%%%%%.bc");
-  const auto after_path = fs::unique_path(workingDirectory_ / "module-%%%%%%%%.bc");
-  RETURN_IF_ERROR(writeBitcodeToFile(benchmark().module(), before_path));
-
-  // Build a command line invocation: `opt input.bc -o output.bc <optArgs...>`.
-  const auto optPath = util::getSiteDataPath("llvm-v0/bin/opt");
-  if (!fs::exists(optPath)) {
-    return Status(StatusCode::INTERNAL, fmt::format("File not found: {}", optPath.string()));
-  }
-  std::vector<std::string> optCmd{optPath.string(), before_path.string(), "-o",
-                                  after_path.string()};
-  optCmd.insert(optCmd.end(), optArgs.begin(), optArgs.end());
-
-  // Run the opt command line.
-  auto opt = subprocess::Popen(optCmd, subprocess::output{subprocess::PIPE},
-                               subprocess::error{subprocess::PIPE});
-  const auto optOutput = opt.communicate();
-  fs::remove(before_path);
-
-  if (opt.retcode()) {
-    if (fs::exists(after_path)) {
-      fs::remove(after_path);
+Status LlvmSession::runActionPipeline(const std::vector<LlvmAction>& actions) {
+#ifdef EXPERIMENTAL_UNSTABLE_GVN_SINK_PASS
+  // The -gvn-sink pass cannot be scheduled in a legacy pass manager, so fall
+  // back to running the actions one at a time.
+  if (std::find(actions.begin(), actions.end(), LlvmAction::GVNSINK_PASS) != actions.end()) {
+    for (const auto action : actions) {
+      RETURN_IF_ERROR(runActionUncached(action));
     }
-    const std::string error(optOutput.second.buf.begin(), optOutput.second.buf.end());
-    return Status(StatusCode::INTERNAL, error);
+    return Status::OK;
+  }
+#endif
+
+  // A pipeline is run as a single unit, so the intermediate states are not
+  // recorded in the transposition table.
+  llvm::legacy::PassManager passManager;
+  addDependentPasses(&passManager);
+
+// Use the generated HANDLE_PASS() switch statement to add each pass to the
+// pass manager.
+#define HANDLE_PASS(pass) passManager.add(pass);
+  for (const auto action : actions) {
+    HANDLE_ACTION(action, HANDLE_PASS)
   }
+#undef HANDLE_PASS
+
+  if (passManager.run(benchmark().module())) {
+    markModuleChanged();
+  }
+  return Status::OK;
+}
 
-  if (!fs::exists(after_path)) {
-    return Status(StatusCode::INTERNAL, "Failed to generate output file");
+Status LlvmSession::runPassPipeline(const std::string& pipeline) {
+  llvm::PassBuilder passBuilder;
+  llvm::LoopAnalysisManager loopAnalysisManager;
+  llvm::FunctionAnalysisManager functionAnalysisManager;
+  llvm::CGSCCAnalysisManager cgsccAnalysisManager;
+  llvm::ModuleAnalysisManager moduleAnalysisManager;
+
+  // Register the session's target library info before the default analyses
+  // so that it is used in place of the default.
+  functionAnalysisManager.registerPass([&] { return llvm::TargetLibraryAnalysis(tlii()); });
+  passBuilder.registerModuleAnalyses(moduleAnalysisManager);
+  passBuilder.registerCGSCCAnalyses(cgsccAnalysisManager);
+  passBuilder.registerFunctionAnalyses(functionAnalysisManager);
+  passBuilder.registerLoopAnalyses(loopAnalysisManager);
+  passBuilder.crossRegisterProxies(loopAnalysisManager, functionAnalysisManager,
+                                   cgsccAnalysisManager, moduleAnalysisManager);
+
+  llvm::ModulePassManager passManager;
+  if (auto error = passBuilder.parsePassPipeline(passManager, pipeline)) {
+    return Status(StatusCode::INVALID_ARGUMENT,
+                  fmt::format("Failed to parse pass pipeline \"{}\": {}", pipeline,
+                              llvm::toString(std::move(error))));
   }
 
-  // Read the bitcode file generated by `opt`.
-  Bitcode bitcode;
-  auto status = readBitcodeFile(after_path, &bitcode);
-  fs::remove(after_path);
-  if (!status.ok()) {
-    return status;
+  if (!passManager.run(benchmark().module(), moduleAnalysisManager).areAllPreserved()) {
+    markModuleChanged();
   }
+  return Status::OK;
+}
 
-  // Replace the benchmark's module with the one generated by `opt`.
-  auto module = makeModule(benchmark().context(), bitcode, benchmark().name(), &status);
-  RETURN_IF_ERROR(status);
-  benchmark().replaceModule(std::move(module));
+Status LlvmSession::setStringObservation(const std::string& value, Observation* reply) {
+  if (useSharedMemory()) {
+    return setSharedMemoryObservation(value, reply);
+  }
+  reply->set_string_value(value);
+  return Status::OK;
+}
 
+Status LlvmSession::setBinaryObservation(const std::string& value, Observation* reply) {
+  if (useSharedMemory()) {
+    return setSharedMemoryObservation(value, reply);
+  }
+  reply->set_binary_value(value);
+  return Status::OK;
+}
+
+Status LlvmSession::setSharedMemoryObservation(const std::string& value, Observation* reply) {
+  RETURN_IF_ERROR(writeSharedMemoryBuffer(workingDirectory(), value, reply));
+
+  // Stop tracking the files that the client has deleted so that the list does
+  // not grow over a long episode.
+  if (sharedMemoryFiles_.size() >= kMaxTrackedSharedMemoryFiles) {
+    sharedMemoryFiles_.erase(std::remove_if(sharedMemoryFiles_.begin(), sharedMemoryFiles_.end(),
+                                            [](const fs::path& path) {
+                                              boost::system::error_code error;
+                                              return !fs::exists(path, error);
+                                            }),
+                             sharedMemoryFiles_.end());
+  }
+  sharedMemoryFiles_.push_back(reply->shared_memory_buffer().path());
   return Status::OK;
 }
 
 Status LlvmSession::getObservation(LlvmObservationSpace space, Observation* reply) {
+  if (observationCacheGeneration_ != moduleGeneration()) {
+    observationCache_.clear();
+    observationCacheGeneration_ = moduleGeneration();
+  }
+
+  const auto cached = observationCache_.find(space);
+  if (cached != observationCache_.end()) {
+    *reply = *cached->second;
+    return Status::OK;
+  }
+
+  // Only consult the transposition table if the module hash is already known,
+  // as computing the hash may cost more than computing the observation. The
+  // table is keyed by module hash, so it only holds observations that depend
+  // on nothing but the module.
+  std::optional<BenchmarkHash> hash;
+  if (transpositionTable_ && isModuleObservationSpace(space) && snapshotHash_.has_value() &&
+      snapshotGeneration_ == moduleGeneration()) {
+    hash = snapshotHash_;
+    if (auto observation = transpositionTable_->getObservation(*hash, space)) {
+      *reply = *observation;
+      observationCache_[space] = std::move(observation);
+      return Status::OK;
+    }
+  }
+
+  RETURN_IF_ERROR(computeObservation(space, reply));
+
+  // Bitcode files are written fresh on every request as the client owns the
+  // file, and shared memory buffers are deleted by the client once read.
+  if (space != LlvmObservationSpace::BITCODE_FILE && !reply->has_shared_memory_buffer()) {
+    auto observation = std::make_shared<const Observation>(*reply);
+    observationCache_[space] = observation;
+    if (hash.has_value()) {
+      transpositionTable_->addObservation(*hash, space, std::move(observation));
+    }
+  }
+  return Status::OK;
+}
+
+Status LlvmSession::computeObservation(LlvmObservationSpace space, Observation* reply) {
   switch (space) {
     case LlvmObservationSpace::IR: {
       // Serialize the LLVM module to an IR string.
       std::string ir;
       llvm::raw_string_ostream rso(ir);
       benchmark().module().print(rso, /*AAW=*/nullptr);
-      reply->set_string_value(ir);
+      rso.flush();
+      RETURN_IF_ERROR(setStringObservation(ir, reply));
       break;
     }
     case LlvmObservationSpace::BITCODE_FILE: {
@@ -302,7 +631,7 @@ Status LlvmSession::getObservation(LlvmObservationSpace space, Observation* repl
       if (!status.ok()) {
         return Status(StatusCode::INTERNAL, status.error_message());
       }
-      *reply->mutable_string_value() = nodeLinkGraph.dump();
+      RETURN_IF_ERROR(setStringObservation(nodeLinkGraph.dump(), reply));
       break;
     }
     case LlvmObservationSpace::CPU_INFO: {
@@ -337,20 +666,20 @@ Status LlvmSession::getObservation(LlvmObservationSpace space, Observation* repl
       break;
     }
     case LlvmObservationSpace::IR_INSTRUCTION_COUNT_O0: {
-      const auto cost = getBaselineCost(benchmark().baselineCosts(), LlvmBaselinePolicy::O0,
-                                        LlvmCostFunction::IR_INSTRUCTION_COUNT);
+      const auto cost = benchmark().baselineCosts().get(LlvmBaselinePolicy::O0,
+                                                        LlvmCostFunction::IR_INSTRUCTION_COUNT);
       reply->set_scalar_int64(static_cast<int64_t>(cost));
       break;
     }
     case LlvmObservationSpace::IR_INSTRUCTION_COUNT_O3: {
-      const auto cost = getBaselineCost(benchmark().baselineCosts(), LlvmBaselinePolicy::O3,
-                                        LlvmCostFunction::IR_INSTRUCTION_COUNT);
+      const auto cost = benchmark().baselineCosts().get(LlvmBaselinePolicy::O3,
+                                                        LlvmCostFunction::IR_INSTRUCTION_COUNT);
       reply->set_scalar_int64(static_cast<int64_t>(cost));
       break;
     }
     case LlvmObservationSpace::IR_INSTRUCTION_COUNT_OZ: {
-      const auto cost = getBaselineCost(benchmark().baselineCosts(), LlvmBaselinePolicy::Oz,
-                                        LlvmCostFunction::IR_INSTRUCTION_COUNT);
+      const auto cost = benchmark().baselineCosts().get(LlvmBaselinePolicy::Oz,
+                                                        LlvmCostFunction::IR_INSTRUCTION_COUNT);
       reply->set_scalar_int64(static_cast<int64_t>(cost));
       break;
     }
@@ -361,23 +690,37 @@ Status LlvmSession::getObservation(LlvmObservationSpace space, Observation* repl
       break;
     }
     case LlvmObservationSpace::OBJECT_TEXT_SIZE_O0: {
-      const auto cost = getBaselineCost(benchmark().baselineCosts(), LlvmBaselinePolicy::O0,
-                                        LlvmCostFunction::OBJECT_TEXT_SIZE_BYTES);
+      const auto cost = benchmark().baselineCosts().get(LlvmBaselinePolicy::O0,
+                                                        LlvmCostFunction::OBJECT_TEXT_SIZE_BYTES);
       reply->set_scalar_int64(static_cast<int64_t>(cost));
       break;
     }
     case LlvmObservationSpace::OBJECT_TEXT_SIZE_O3: {
-      const auto cost = getBaselineCost(benchmark().baselineCosts(), LlvmBaselinePolicy::O3,
-                                        LlvmCostFunction::OBJECT_TEXT_SIZE_BYTES);
+      const auto cost = benchmark().baselineCosts().get(LlvmBaselinePolicy::O3,
+                                                        LlvmCostFunction::OBJECT_TEXT_SIZE_BYTES);
       reply->set_scalar_int64(static_cast<int64_t>(cost));
       break;
     }
     case LlvmObservationSpace::OBJECT_TEXT_SIZE_OZ: {
-      const auto cost = getBaselineCost(benchmark().baselineCosts(), LlvmBaselinePolicy::Oz,
-                                        LlvmCostFunction::OBJECT_TEXT_SIZE_BYTES);
+      const auto cost = benchmark().baselineCosts().get(LlvmBaselinePolicy::Oz,
+                                                        LlvmCostFunction::OBJECT_TEXT_SIZE_BYTES);
       reply->set_scalar_int64(static_cast<int64_t>(cost));
       break;
     }
+    case LlvmObservationSpace::MODULE_HASH: {
+      *reply->mutable_string_value() = benchmarkHashToString(moduleHash());
+      break;
+    }
+    case LlvmObservationSpace::PROGRAML_BINARY: {
+      programl::ProgramGraph graph;
+      auto status =
+          programl::ir::llvm::BuildProgramGraph(benchmark().module(), &graph, programlOptions_);
+      if (!status.ok()) {
+        return Status(StatusCode::INTERNAL, status.error_message());
+      }
+      RETURN_IF_ERROR(setBinaryObservation(programGraphToBinary(graph), reply));
+      break;
+    }
 #ifdef COMPILER_GYM_EXPERIMENTAL_TEXT_SIZE_COST
     case LlvmObservationSpace::TEXT_SIZE_BYTES: {
       const auto cost =
@@ -386,20 +729,20 @@ Status LlvmSession::getObservation(LlvmObservationSpace space, Observation* repl
       break;
     }
     case LlvmObservationSpace::TEXT_SIZE_O0: {
-      const auto cost = getBaselineCost(benchmark().baselineCosts(), LlvmBaselinePolicy::O0,
-                                        LlvmCostFunction::TEXT_SIZE_BYTES);
+      const auto cost = benchmark().baselineCosts().get(LlvmBaselinePolicy::O0,
+                                                        LlvmCostFunction::TEXT_SIZE_BYTES);
       reply->set_scalar_int64(static_cast<int64_t>(cost));
       break;
     }
     case LlvmObservationSpace::TEXT_SIZE_O3: {
-      const auto cost = getBaselineCost(benchmark().baselineCosts(), LlvmBaselinePolicy::O3,
-                                        LlvmCostFunction::TEXT_SIZE_BYTES);
+      const auto cost = benchmark().baselineCosts().get(LlvmBaselinePolicy::O3,
+                                                        LlvmCostFunction::TEXT_SIZE_BYTES);
       reply->set_scalar_int64(static_cast<int64_t>(cost));
       break;
     }
     case LlvmObservationSpace::TEXT_SIZE_OZ: {
-      const auto cost = getBaselineCost(benchmark().baselineCosts(), LlvmBaselinePolicy::Oz,
-                                        LlvmCostFunction::TEXT_SIZE_BYTES);
+      const auto cost = benchmark().baselineCosts().get(LlvmBaselinePolicy::Oz,
+                                                        LlvmCostFunction::TEXT_SIZE_BYTES);
       reply->set_scalar_int64(static_cast<int64_t>(cost));
       break;
     }
@@ -6,14 +6,21 @@
 
 #include <grpcpp/grpcpp.h>
 
+#include <list>
 #include <magic_enum.hpp>
 #include <memory>
+#include <mutex>
 #include <optional>
+#include <tuple>
+#include <unordered_map>
+#include <vector>
 
 #include "compiler_gym/envs/llvm/service/ActionSpace.h"
 #include "compiler_gym/envs/llvm/service/Benchmark.h"
 #include "compiler_gym/envs/llvm/service/Cost.h"
 #include "compiler_gym/envs/llvm/service/ObservationSpaces.h"
+#include "compiler_gym/envs/llvm/service/RewardSpaces.h"
+#include "compiler_gym/envs/llvm/service/TranspositionTable.h"
 #include "compiler_gym/service/proto/compiler_gym_service.grpc.pb.h"
 #include "llvm/Analysis/ProfileSummaryInfo.h"
 #include "llvm/Analysis/TargetLibraryInfo.h"
@@ -37,6 +44,10 @@ class LlvmSession {
   LlvmSession(std::unique_ptr<Benchmark> benchmark, LlvmActionSpace actionSpace,
               const boost::filesystem::path& workingDirectory);
 
+  // Deletes the shared memory files of observations that the client has not
+  // claimed, e.g. because a reply was abandoned.
+  ~LlvmSession();
+
   inline const Benchmark& benchmark() const { return *benchmark_; }
   inline Benchmark& benchmark() { return *benchmark_; }
 
@@ -44,6 +55,46 @@ class LlvmSession {
 
   inline const boost::filesystem::path& workingDirectory() const { return workingDirectory_; }
 
+  // Create a copy of this session. The copy shares an immutable bitcode
+  // snapshot of the module with this session, and only parses it into a
+  // private module when the module is first accessed, such as on the first
+  // step that runs an action. Observations of the current module that this
+  // session has already computed are shared with the fork, without copying.
+  std::unique_ptr<LlvmSession> fork();
+
+  // Save the current state of the module and return an ID that can be passed
+  // to restore(). Only the kMaxSnapshots most recently used snapshots are
+  // kept, older snapshots are discarded.
+  uint64_t snapshot();
+
+  // Restore the module to the state saved by snapshot(). Returns
+  // INVALID_ARGUMENT if the snapshot does not exist or has been discarded.
+  [[nodiscard]] grpc::Status restore(uint64_t snapshotId);
+
+  // The maximum number of snapshots that a session keeps.
+  static constexpr size_t kMaxSnapshots = 64;
+
+  // If set, large string observations (Ir and Programl) are written to a
+  // memory-mapped file in the working directory and returned as a
+  // SharedMemoryBuffer, rather than being serialized in the reply. The client
+  // deletes each file once it has read the reply. Files that have not been
+  // deleted when the session ends are deleted by the session.
+  inline bool useSharedMemory() const { return useSharedMemory_; }
+  inline void setUseSharedMemory(bool useSharedMemory) { useSharedMemory_ = useSharedMemory; }
+
+  // If set, the results of actions and the observations of modules are
+  // recorded in, and looked up from, the given transposition table, which may
+  // be shared by multiple sessions. An action whose result is already in the
+  // table is not run.
+  inline void setTranspositionTable(std::shared_ptr<TranspositionTable> transpositionTable) {
+    transpositionTable_ = std::move(transpositionTable);
+  }
+
+  // The mutex that guards this session. Callers that may access a session
+  // from multiple threads must hold this lock while calling step(),
+  // getObservation(), or reading the benchmark.
+  inline std::mutex& mutex() const { return mutex_; }
+
   // Run the requested action(s) then compute the requested observation(s).
   [[nodiscard]] grpc::Status step(const StepRequest& request, StepReply* reply);
 
@@ -51,40 +102,156 @@ class LlvmSession {
   // since the start of the session. This is just for logging and has no effect.
   inline int actionCount() const { return actionCount_; }
 
+  // Returns a counter that is incremented every time the module is modified.
+  // Work that depends only on the module, such as verification and
+  // observations, can be cached against this generation.
+  inline uint64_t moduleGeneration() const { return moduleGeneration_; }
+
   // Run the requested action.
   [[nodiscard]] grpc::Status runAction(LlvmAction action, StepReply* reply);
 
-  // Compute the requested observation.
+  // Run a textual pass pipeline on the current LLVM module using the new pass
+  // manager, e.g. "function(sroa,instcombine),globaldce". The pipeline syntax
+  // is the same as that of the `opt -passes=<pipeline>` argument. Returns
+  // INVALID_ARGUMENT if the pipeline cannot be parsed. Unlike step(), the
+  // resulting module is not verified.
+  [[nodiscard]] grpc::Status runPassPipeline(const std::string& pipeline);
+
+  // Compute the requested observation. Deterministic observations are
+  // memoized against the module generation, so repeated requests for the
+  // same observation of an unchanged module are not recomputed.
   [[nodiscard]] grpc::Status getObservation(LlvmObservationSpace space, Observation* reply);
 
+  // Start tracking the named reward space, if it is not already tracked. The
+  // reward for the first step is relative to the cost of the unoptimized
+  // module. Returns INVALID_ARGUMENT if the reward space is not recognized.
+  [[nodiscard]] grpc::Status initReward(const std::string& rewardSpace);
+
  protected:
+  // Construct a fork of a parent session from a clone of its benchmark.
+  LlvmSession(const LlvmSession& parent, std::unique_ptr<Benchmark> benchmark);
+
   // Run the given pass, possibly modifying the underlying LLVM module.
-  void runPass(llvm::Pass* pass, StepReply* reply);
-  void runPass(llvm::FunctionPass* pass, StepReply* reply);
+  void runPass(llvm::Pass* pass);
+  void runPass(llvm::FunctionPass* pass);
 
-  // Run the commandline `opt` tool on the current LLVM module with the given
-  // arguments, replacing the environment state with the generated output.
-  [[nodiscard]] grpc::Status runOptWithArgs(const std::vector<std::string>& optArgs);
+  // Run a sequence of actions as a single pass pipeline, possibly modifying
+  // the underlying LLVM module. All of the passes are scheduled into a single
+  // pass manager so that analyses are shared between them, as when the
+  // equivalent `opt` commandline is run.
+  [[nodiscard]] grpc::Status runActionPipeline(const std::vector<LlvmAction>& actions);
 
   inline const llvm::TargetLibraryInfoImpl& tlii() const { return tlii_; }
 
+  // Set a string observation value, either inline or as a SharedMemoryBuffer
+  // if useSharedMemory() is set.
+  [[nodiscard]] grpc::Status setStringObservation(const std::string& value, Observation* reply);
+
+  // Set a binary observation value, either inline or as a SharedMemoryBuffer
+  // if useSharedMemory() is set.
+  [[nodiscard]] grpc::Status setBinaryObservation(const std::string& value, Observation* reply);
+
+  // Advance the module generation. This must be called whenever the module is
+  // modified.
+  inline void markModuleChanged() { ++moduleGeneration_; }
+
  private:
-  // Setup pass manager with depdendent passes and the specified pass.
-  template <typename PassManager, typename Pass>
-  inline void setupPassManager(PassManager* passManager, Pass* pass) {
+  // Compute the requested observation, bypassing the observation cache.
+  [[nodiscard]] grpc::Status computeObservation(LlvmObservationSpace space, Observation* reply);
+
+  // Write a payload to a new shared memory file and reference it from the
+  // observation.
+  [[nodiscard]] grpc::Status setSharedMemoryObservation(const std::string& value,
+                                                        Observation* reply);
+
+  // Return the state of the named reward space, initializing it if required.
+  [[nodiscard]] grpc::Status getReward(const std::string& rewardSpace, LlvmReward** reward);
+
+  // Run the requested action, bypassing the transposition table.
+  [[nodiscard]] grpc::Status runActionUncached(LlvmAction action);
+
+  // Return a bitcode snapshot of the current module, reusing the last
+  // snapshot if the module has not changed since.
+  std::shared_ptr<const Bitcode> bitcodeSnapshot();
+
+  // Return the hash of the current module. The hash is computed along with
+  // the bitcode snapshot and reused until the module changes.
+  BenchmarkHash moduleHash();
+
+  // Replace the module with one parsed lazily from the given bitcode. If the
+  // hash of the bitcode is known it is used by moduleHash(). If verified is
+  // true, the module is not verified again by step().
+  void restoreModule(std::shared_ptr<const Bitcode> bitcode, std::optional<BenchmarkHash> hash,
+                     bool verified);
+
+  // A module state saved by snapshot().
+  struct Snapshot {
+    uint64_t id;
+    std::shared_ptr<const Bitcode> bitcode;
+    // Whether the module had been verified.
+    bool verified;
+    // The state of the tracked reward spaces.
+    std::unordered_map<LlvmRewardSpace, LlvmReward> rewards;
+  };
+
+  // Add the dependent passes that are required by every action.
+  template <typename PassManager>
+  inline void addDependentPasses(PassManager* passManager) {
     passManager->add(new llvm::ProfileSummaryInfoWrapperPass());
     passManager->add(new llvm::TargetLibraryInfoWrapperPass(tlii()));
     passManager->add(createTargetTransformInfoWrapperPass(llvm::TargetIRAnalysis()));
+  }
+
+  // Setup pass manager with depdendent passes and the specified pass.
+  template <typename PassManager, typename Pass>
+  inline void setupPassManager(PassManager* passManager, Pass* pass) {
+    addDependentPasses(passManager);
     passManager->add(pass);
   }
 
   const boost::filesystem::path workingDirectory_;
-  const std::unique_ptr<Benchmark> benchmark_;
+  std::unique_ptr<Benchmark> benchmark_;
   const LlvmActionSpace actionSpace_;
   const llvm::TargetLibraryInfoImpl tlii_;
   const programl::ProgramGraphOptions programlOptions_;
 
   int actionCount_;
+  bool useSharedMemory_;
+  // The shared memory files that have been returned to the client, which may
+  // not have been deleted yet.
+  std::vector<boost::filesystem::path> sharedMemoryFiles_;
+
+  uint64_t moduleGeneration_;
+  // The module generation that was last verified.
+  uint64_t verifiedGeneration_;
+
+  // Observations of the module at observationCacheGeneration_, keyed by
+  // observation space. Observations are immutable so that they can be shared
+  // with forks and with the transposition table, as they may be large.
+  std::unordered_map<LlvmObservationSpace, std::shared_ptr<const Observation>> observationCache_;
+  uint64_t observationCacheGeneration_;
+
+  // A bitcode snapshot of the module at snapshotGeneration_, shared by forks
+  // of this session so that repeated forks do not re-serialize the module.
+  std::shared_ptr<const Bitcode> snapshot_;
+  uint64_t snapshotGeneration_;
+  // The hash of snapshot_, if it has been computed.
+  std::optional<BenchmarkHash> snapshotHash_;
+
+  // The state of the reward spaces that have been requested in this session.
+  std::unordered_map<LlvmRewardSpace, LlvmReward> rewards_;
+
+  std::shared_ptr<TranspositionTable> transpositionTable_;
+  // Transitions that are recorded in the transposition table once the module
+  // that they produce has been verified.
+  std::vector<std::tuple<BenchmarkHash, LlvmAction, TranspositionTable::Transition>>
+      pendingTransitions_;
+
+  // Saved module states, ordered from most to least recently used.
+  std::list<Snapshot> snapshots_;
+  uint64_t nextSnapshotId_;
+
+  mutable std::mutex mutex_;
 };
 
 }  // namespace compiler_gym::llvm_service
@@ -8,6 +8,7 @@
 
 #include <magic_enum.hpp>
 
+#include "compiler_gym/envs/llvm/service/ProgramlBinary.h"
 #include "compiler_gym/third_party/llvm/InstCount.h"
 #include "compiler_gym/util/EnumUtil.h"
 #include "nlohmann/json.hpp"
@@ -22,6 +23,8 @@ namespace compiler_gym::llvm_service {
 static constexpr size_t kAutophaseFeatureDim = 56;
 // 4096 is the maximum path length for most filesystems.
 static constexpr size_t kMaximumPathLength = 4096;
+// The length of a hex-formatted 160 bit module hash.
+static constexpr size_t kModuleHashLength = 40;
 
 std::vector<ObservationSpace> getLlvmObservationSpaceList() {
   std::vector<ObservationSpace> spaces;
@@ -126,6 +129,25 @@ std::vector<ObservationSpace> getLlvmObservationSpaceList() {
         space.mutable_default_value()->set_scalar_int64(0);
         break;
       }
+      case LlvmObservationSpace::MODULE_HASH: {
+        // A SHA1 digest formatted as hexadecimal.
+        space.mutable_string_size_range()->mutable_min()->set_value(kModuleHashLength);
+        space.mutable_string_size_range()->mutable_max()->set_value(kModuleHashLength);
+        space.set_deterministic(true);
+        space.set_platform_dependent(false);
+        break;
+      }
+      case LlvmObservationSpace::PROGRAML_BINARY: {
+        ScalarRange encodedSize;
+        encodedSize.mutable_min()->set_value(0);
+        space.set_opaque_data_format("programl://binary");
+        *space.mutable_binary_size_range() = encodedSize;
+        space.set_deterministic(true);
+        space.set_platform_dependent(false);
+        *space.mutable_default_value()->mutable_binary_value() =
+            programGraphToBinary(programl::ProgramGraph());
+        break;
+      }
 #ifdef COMPILER_GYM_EXPERIMENTAL_TEXT_SIZE_COST
       case LlvmObservationSpace::TEXT_SIZE_BYTES:
       case LlvmObservationSpace::TEXT_SIZE_O0:
@@ -145,4 +167,23 @@ std::vector<ObservationSpace> getLlvmObservationSpaceList() {
   return spaces;
 }
 
+bool isModuleObservationSpace(LlvmObservationSpace space) {
+  switch (space) {
+    case LlvmObservationSpace::IR:
+    case LlvmObservationSpace::INST_COUNT:
+    case LlvmObservationSpace::AUTOPHASE:
+    case LlvmObservationSpace::PROGRAML:
+    case LlvmObservationSpace::IR_INSTRUCTION_COUNT:
+    case LlvmObservationSpace::OBJECT_TEXT_SIZE_BYTES:
+    case LlvmObservationSpace::MODULE_HASH:
+    case LlvmObservationSpace::PROGRAML_BINARY:
+#ifdef COMPILER_GYM_EXPERIMENTAL_TEXT_SIZE_COST
+    case LlvmObservationSpace::TEXT_SIZE_BYTES:
+#endif
+      return true;
+    default:
+      return false;
+  }
+}
+
 }  // namespace compiler_gym::llvm_service
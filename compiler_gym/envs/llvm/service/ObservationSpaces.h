@@ -16,7 +16,7 @@ namespace compiler_gym::llvm_service {
 //   1. Add a new entry to this LlvmObservationSpace enum.
 //   2. Add a new switch case to getLlvmObservationSpaceList() to return the
 //      ObserverationSpace.
-//   3. Add a new switch case to LlvmSession::getObservation() to compute
+//   3. Add a new switch case to LlvmSession::computeObservation() to compute
 //      the actual observation.
 //   4. Run `bazel test //compiler_gym/...` and update the newly failing tests.
 enum class LlvmObservationSpace {
@@ -52,6 +52,13 @@ enum class LlvmObservationSpace {
   OBJECT_TEXT_SIZE_O0,
   OBJECT_TEXT_SIZE_O3,
   OBJECT_TEXT_SIZE_OZ,
+  // A hash of the current module, as a string of 40 hexadecimal digits.
+  // Modules with equal hashes are identical, so this can be used to detect
+  // equivalent states without retrieving the module.
+  MODULE_HASH,
+  // The ProGraML graph of the program, serialized to a flat binary format
+  // that can be decoded without parsing. See programGraphToBinary().
+  PROGRAML_BINARY,
 #ifdef COMPILER_GYM_EXPERIMENTAL_TEXT_SIZE_COST
   // The size of the .text section of the compiled binary. Platform dependent.
   TEXT_SIZE_BYTES,
@@ -64,4 +71,10 @@ enum class LlvmObservationSpace {
 // Return the list of available observation spaces.
 std::vector<ObservationSpace> getLlvmObservationSpaceList();
 
+// Returns whether an observation depends only on the current module, so that
+// it is the same for every module with the same hash. Observations that also
+// depend on the benchmark, such as the baseline costs, or on the host, such as
+// CpuInfo, return false.
+bool isModuleObservationSpace(LlvmObservationSpace space);
+
 }  // namespace compiler_gym::llvm_service
@@ -0,0 +1,105 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+//
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+#include "compiler_gym/envs/llvm/service/ProgramlBinary.h"
+
+#include <cstdint>
+#include <unordered_map>
+#include <vector>
+
+namespace compiler_gym::llvm_service {
+
+namespace {
+
+static_assert(__BYTE_ORDER__ == __ORDER_LITTLE_ENDIAN__,
+              "The ProGraML binary format assumes a little-endian host");
+
+// A table of unique strings, numbered in order of insertion.
+class StringTable {
+ public:
+  int32_t add(const std::string& value) {
+    const auto [it, inserted] = ids_.emplace(value, static_cast<int32_t>(offsets_.size() - 1));
+    if (inserted) {
+      data_ += value;
+      offsets_.push_back(static_cast<int32_t>(data_.size()));
+    }
+    return it->second;
+  }
+
+  const std::vector<int32_t>& offsets() const { return offsets_; }
+  const std::string& data() const { return data_; }
+
+ private:
+  std::unordered_map<std::string, int32_t> ids_;
+  std::vector<int32_t> offsets_{0};
+  std::string data_;
+};
+
+template <typename T>
+void append(std::string* out, const std::vector<T>& values) {
+  out->append(reinterpret_cast<const char*>(values.data()), values.size() * sizeof(T));
+}
+
+}  // anonymous namespace
+
+std::string programGraphToBinary(const programl::ProgramGraph& graph) {
+  const int nodeCount = graph.node_size();
+  const int edgeCount = graph.edge_size();
+  const int functionCount = graph.function_size();
+
+  StringTable strings;
+  std::vector<int32_t> nodeType(nodeCount);
+  std::vector<int32_t> nodeText(nodeCount);
+  std::vector<int32_t> nodeFunction(nodeCount);
+  std::vector<int32_t> nodeBlock(nodeCount);
+  for (int i = 0; i < nodeCount; ++i) {
+    const auto& node = graph.node(i);
+    nodeType[i] = node.type();
+    nodeText[i] = strings.add(node.text());
+    nodeFunction[i] = node.function();
+    nodeBlock[i] = node.block();
+  }
+
+  std::vector<int32_t> edgeFlow(edgeCount);
+  std::vector<int32_t> edgePosition(edgeCount);
+  std::vector<int32_t> edgeSource(edgeCount);
+  std::vector<int32_t> edgeTarget(edgeCount);
+  for (int i = 0; i < edgeCount; ++i) {
+    const auto& edge = graph.edge(i);
+    edgeFlow[i] = edge.flow();
+    edgePosition[i] = edge.position();
+    edgeSource[i] = edge.source();
+    edgeTarget[i] = edge.target();
+  }
+
+  std::vector<int32_t> functionName(functionCount);
+  for (int i = 0; i < functionCount; ++i) {
+    functionName[i] = strings.add(graph.function(i).name());
+  }
+
+  const std::vector<int64_t> header{nodeCount, edgeCount, functionCount,
+                                    static_cast<int64_t>(strings.offsets().size() - 1),
+                                    static_cast<int64_t>(strings.data().size())};
+
+  std::string out;
+  out.reserve(header.size() * sizeof(int64_t) +
+              (4 * nodeCount + 4 * edgeCount + functionCount + strings.offsets().size()) *
+                  sizeof(int32_t) +
+              strings.data().size());
+  append(&out, header);
+  append(&out, nodeType);
+  append(&out, nodeText);
+  append(&out, nodeFunction);
+  append(&out, nodeBlock);
+  append(&out, edgeFlow);
+  append(&out, edgePosition);
+  append(&out, edgeSource);
+  append(&out, edgeTarget);
+  append(&out, functionName);
+  append(&out, strings.offsets());
+  out += strings.data();
+  return out;
+}
+
+}  // namespace compiler_gym::llvm_service
@@ -0,0 +1,36 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+//
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+#pragma once
+
+#include <string>
+
+#include "programl/proto/program_graph.pb.h"
+
+namespace compiler_gym::llvm_service {
+
+// Serialize a ProGraML graph to a flat binary format that can be decoded
+// without parsing, e.g. using numpy.frombuffer(). The node and edge features
+// that are needed to train graph neural networks are stored as arrays. Node
+// text and function names are stored once in a string table and referenced
+// by index. All values are little-endian, in the following order:
+//
+//   int64 header[5]: node count N, edge count E, function count F, string
+//                    count S, and string table size in bytes B.
+//   int32 nodeType[N]
+//   int32 nodeText[N]       // Index into the string table.
+//   int32 nodeFunction[N]   // Index into the function list.
+//   int32 nodeBlock[N]
+//   int32 edgeFlow[E]
+//   int32 edgePosition[E]
+//   int32 edgeSource[E]
+//   int32 edgeTarget[E]
+//   int32 functionName[F]   // Index into the string table.
+//   int32 stringOffset[S+1] // Byte offsets into the string table.
+//   char stringTable[B]     // UTF-8 encoded strings.
+//
+// Graph, node, and edge features are not serialized.
+std::string programGraphToBinary(const programl::ProgramGraph& graph);
+
+}  // namespace compiler_gym::llvm_service
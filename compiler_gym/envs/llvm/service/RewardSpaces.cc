@@ -0,0 +1,113 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+//
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+#include "compiler_gym/envs/llvm/service/RewardSpaces.h"
+
+#include <fmt/format.h>
+
+#include <algorithm>
+#include <magic_enum.hpp>
+#include <optional>
+
+#include "compiler_gym/util/EnumUtil.h"
+
+using grpc::Status;
+using grpc::StatusCode;
+
+namespace compiler_gym::llvm_service {
+
+namespace {
+
+// Baseline costs are returned to the client as integers, so truncate them in
+// the same way to compute identical rewards.
+int64_t getBaselineCost(const BaselineCosts& baselineCosts, LlvmBaselinePolicy policy,
+                        LlvmCostFunction cost) {
+  return static_cast<int64_t>(baselineCosts.get(policy, cost));
+}
+
+}  // anonymous namespace
+
+std::vector<std::string> getLlvmRewardSpaceNameList() {
+  std::vector<std::string> names;
+  names.reserve(magic_enum::enum_count<LlvmRewardSpace>());
+  for (const auto& value : magic_enum::enum_values<LlvmRewardSpace>()) {
+    names.push_back(util::enumNameToPascalCase<LlvmRewardSpace>(value));
+  }
+  return names;
+}
+
+Status getLlvmRewardSpace(const std::string& name, LlvmRewardSpace* space) {
+  for (const auto& value : magic_enum::enum_values<LlvmRewardSpace>()) {
+    if (util::enumNameToPascalCase<LlvmRewardSpace>(value) == name) {
+      *space = value;
+      return Status::OK;
+    }
+  }
+  return Status(StatusCode::INVALID_ARGUMENT, fmt::format("Unknown reward space: {}", name));
+}
+
+LlvmReward::LlvmReward(LlvmRewardSpace space, const BaselineCosts& baselineCosts) {
+  LlvmCostFunction costFunction;
+  std::optional<LlvmBaselinePolicy> baselinePolicy;
+  bool normalize = false;
+  switch (space) {
+    case LlvmRewardSpace::IR_INSTRUCTION_COUNT:
+      costFunction = LlvmCostFunction::IR_INSTRUCTION_COUNT;
+      break;
+    case LlvmRewardSpace::IR_INSTRUCTION_COUNT_NORM:
+      costFunction = LlvmCostFunction::IR_INSTRUCTION_COUNT;
+      normalize = true;
+      break;
+    case LlvmRewardSpace::IR_INSTRUCTION_COUNT_O3:
+      costFunction = LlvmCostFunction::IR_INSTRUCTION_COUNT;
+      baselinePolicy = LlvmBaselinePolicy::O3;
+      break;
+    case LlvmRewardSpace::IR_INSTRUCTION_COUNT_OZ:
+      costFunction = LlvmCostFunction::IR_INSTRUCTION_COUNT;
+      baselinePolicy = LlvmBaselinePolicy::Oz;
+      break;
+    case LlvmRewardSpace::OBJECT_TEXT_SIZE_BYTES:
+      costFunction = LlvmCostFunction::OBJECT_TEXT_SIZE_BYTES;
+      break;
+    case LlvmRewardSpace::OBJECT_TEXT_SIZE_NORM:
+      costFunction = LlvmCostFunction::OBJECT_TEXT_SIZE_BYTES;
+      normalize = true;
+      break;
+    case LlvmRewardSpace::OBJECT_TEXT_SIZE_O3:
+      costFunction = LlvmCostFunction::OBJECT_TEXT_SIZE_BYTES;
+      baselinePolicy = LlvmBaselinePolicy::O3;
+      break;
+    case LlvmRewardSpace::OBJECT_TEXT_SIZE_OZ:
+      costFunction = LlvmCostFunction::OBJECT_TEXT_SIZE_BYTES;
+      baselinePolicy = LlvmBaselinePolicy::Oz;
+      break;
+  }
+
+  costObservationSpace_ = costFunction == LlvmCostFunction::IR_INSTRUCTION_COUNT
+                              ? LlvmObservationSpace::IR_INSTRUCTION_COUNT
+                              : LlvmObservationSpace::OBJECT_TEXT_SIZE_BYTES;
+  previousCost_ = getBaselineCost(baselineCosts, LlvmBaselinePolicy::O0, costFunction);
+
+  // The normalization values must be identical to those computed by the Python
+  // reward classes in compiler_gym/envs/llvm/llvm_rewards.py. A baseline
+  // improvement norm is max(init_cost - baseline_cost, 1), as computed by
+  // BaselineImprovementNormalizedReward.get_cost_norm(), so a baseline that
+  // makes no improvement, or makes the cost worse, has a norm of one.
+  if (baselinePolicy.has_value()) {
+    const int64_t baselineCost = getBaselineCost(baselineCosts, *baselinePolicy, costFunction);
+    norm_ = static_cast<double>(std::max<int64_t>(previousCost_ - baselineCost, 1));
+  } else if (normalize) {
+    norm_ = static_cast<double>(previousCost_);
+  } else {
+    norm_ = 1;
+  }
+}
+
+double LlvmReward::update(int64_t cost) {
+  const double reward = static_cast<double>(previousCost_ - cost) / norm_;
+  previousCost_ = cost;
+  return reward;
+}
+
+}  // namespace compiler_gym::llvm_service
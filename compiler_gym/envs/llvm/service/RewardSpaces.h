@@ -0,0 +1,76 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+//
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+#pragma once
+
+#include <grpcpp/grpcpp.h>
+
+#include <cstdint>
+#include <string>
+#include <vector>
+
+#include "compiler_gym/envs/llvm/service/Cost.h"
+#include "compiler_gym/envs/llvm/service/ObservationSpaces.h"
+
+namespace compiler_gym::llvm_service {
+
+// The reward spaces that can be computed by the LLVM service. These mirror the
+// reward spaces that are defined in Python by LlvmEnv, and compute the same
+// values.
+//
+// NOTE: To add a new reward space:
+//   1. Add a new entry to this LlvmRewardSpace enum.
+//   2. Add new switch cases to the LlvmReward constructor.
+//   3. Add a corresponding reward space to LlvmEnv.
+enum class LlvmRewardSpace {
+  // The reduction in the number of LLVM-IR instructions.
+  IR_INSTRUCTION_COUNT,
+  // The reduction in the number of LLVM-IR instructions, normalized to the
+  // number of instructions in the unoptimized module.
+  IR_INSTRUCTION_COUNT_NORM,
+  // The reduction in the number of LLVM-IR instructions, normalized to the
+  // reduction achieved by -O3 / -Oz.
+  IR_INSTRUCTION_COUNT_O3,
+  IR_INSTRUCTION_COUNT_OZ,
+  // The reduction in the size of the .text section of the lowered module.
+  OBJECT_TEXT_SIZE_BYTES,
+  // The reduction in the size of the .text section of the lowered module,
+  // normalized to the size of the unoptimized module.
+  OBJECT_TEXT_SIZE_NORM,
+  // The reduction in the size of the .text section of the lowered module,
+  // normalized to the reduction achieved by -O3 / -Oz.
+  OBJECT_TEXT_SIZE_O3,
+  OBJECT_TEXT_SIZE_OZ,
+};
+
+// Return the names of the available reward spaces.
+std::vector<std::string> getLlvmRewardSpaceNameList();
+
+// Look up a reward space by name. Returns INVALID_ARGUMENT if the name is not
+// recognized.
+[[nodiscard]] grpc::Status getLlvmRewardSpace(const std::string& name, LlvmRewardSpace* space);
+
+// The incremental state of a reward space for a session. The reward for a step
+// is the reduction in cost since the previous step, divided by a
+// normalization value. The cost before the first step is the cost of the
+// unoptimized module.
+class LlvmReward {
+ public:
+  // Initialize the reward for a benchmark with the given baseline costs.
+  LlvmReward(LlvmRewardSpace space, const BaselineCosts& baselineCosts);
+
+  // The observation space that produces the cost of the current module.
+  inline LlvmObservationSpace costObservationSpace() const { return costObservationSpace_; }
+
+  // Return the reward for a new cost, and record the new cost for the next
+  // call.
+  double update(int64_t cost);
+
+ private:
+  LlvmObservationSpace costObservationSpace_;
+  int64_t previousCost_;
+  double norm_;
+};
+
+}  // namespace compiler_gym::llvm_service
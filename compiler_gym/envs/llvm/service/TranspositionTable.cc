@@ -0,0 +1,100 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+//
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+#include "compiler_gym/envs/llvm/service/TranspositionTable.h"
+
+#include <glog/logging.h>
+
+namespace compiler_gym::llvm_service {
+
+TranspositionTable::TranspositionTable(size_t capacity) : capacity_(capacity) {
+  CHECK(capacity) << "Transposition table capacity must be at least 1";
+}
+
+size_t TranspositionTable::HashHasher::operator()(const BenchmarkHash& hash) const {
+  // The hash is a SHA1 digest, so any of its words is well distributed.
+  return (static_cast<size_t>(hash[0]) << 32) | hash[1];
+}
+
+TranspositionTable::Entry* TranspositionTable::find(const BenchmarkHash& hash) {
+  auto it = index_.find(hash);
+  if (it == index_.end()) {
+    return nullptr;
+  }
+  entries_.splice(entries_.begin(), entries_, it->second);
+  return &entries_.front();
+}
+
+TranspositionTable::Entry& TranspositionTable::findOrInsert(const BenchmarkHash& hash) {
+  Entry* entry = find(hash);
+  if (entry) {
+    return *entry;
+  }
+
+  if (entries_.size() >= capacity_) {
+    index_.erase(entries_.back().hash);
+    entries_.pop_back();
+  }
+  entries_.push_front({hash, nullptr, {}, {}});
+  index_[hash] = entries_.begin();
+  return entries_.front();
+}
+
+std::optional<TranspositionTable::Transition> TranspositionTable::getTransition(
+    const BenchmarkHash& hash, LlvmAction action) {
+  const std::lock_guard<std::mutex> lock(mutex_);
+  const Entry* entry = find(hash);
+  if (!entry) {
+    return std::nullopt;
+  }
+  const auto transition = entry->transitions.find(action);
+  if (transition == entry->transitions.end()) {
+    return std::nullopt;
+  }
+  const auto& [resultHash, changed] = transition->second;
+  // An action that had no effect transitions to the same module, whose
+  // bitcode is not required.
+  if (resultHash == hash) {
+    return Transition{hash, nullptr, changed};
+  }
+  const Entry* result = find(resultHash);
+  if (!result || !result->bitcode) {
+    return std::nullopt;
+  }
+  return Transition{result->hash, result->bitcode, changed};
+}
+
+void TranspositionTable::addTransition(const BenchmarkHash& hash, LlvmAction action,
+                                       const Transition& result) {
+  const std::lock_guard<std::mutex> lock(mutex_);
+  if (result.hash != hash) {
+    Entry& resultEntry = findOrInsert(result.hash);
+    if (!resultEntry.bitcode) {
+      resultEntry.bitcode = result.bitcode;
+    }
+  }
+  findOrInsert(hash).transitions[action] = {result.hash, result.changed};
+}
+
+std::shared_ptr<const Observation> TranspositionTable::getObservation(const BenchmarkHash& hash,
+                                                                      LlvmObservationSpace space) {
+  const std::lock_guard<std::mutex> lock(mutex_);
+  const Entry* entry = find(hash);
+  if (!entry) {
+    return nullptr;
+  }
+  const auto observation = entry->observations.find(space);
+  if (observation == entry->observations.end()) {
+    return nullptr;
+  }
+  return observation->second;
+}
+
+void TranspositionTable::addObservation(const BenchmarkHash& hash, LlvmObservationSpace space,
+                                        std::shared_ptr<const Observation> observation) {
+  const std::lock_guard<std::mutex> lock(mutex_);
+  findOrInsert(hash).observations[space] = std::move(observation);
+}
+
+}  // namespace compiler_gym::llvm_service
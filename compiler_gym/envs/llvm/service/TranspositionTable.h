@@ -0,0 +1,101 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+//
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+#pragma once
+
+#include <list>
+#include <memory>
+#include <mutex>
+#include <optional>
+#include <unordered_map>
+#include <utility>
+
+#include "compiler_gym/envs/llvm/service/ActionSpace.h"
+#include "compiler_gym/envs/llvm/service/Benchmark.h"
+#include "compiler_gym/envs/llvm/service/ObservationSpaces.h"
+#include "compiler_gym/service/proto/compiler_gym_service.pb.h"
+
+namespace compiler_gym::llvm_service {
+
+// A transposition table records the results of actions on modules, keyed by
+// module hash. It is shared by all sessions of a service so that a search that
+// reaches a module that has already been seen, in any session, can skip
+// recomputing the transitions and observations of that module.
+//
+// For each module hash the table stores the module's bitcode, the hashes of
+// the modules that result from applying actions to it, and its deterministic
+// observations. The table holds at most a fixed number of modules, discarding
+// the least recently used.
+//
+// This class is thread safe.
+class TranspositionTable {
+ public:
+  explicit TranspositionTable(size_t capacity);
+
+  // The result of applying an action to a module.
+  struct Transition {
+    // The hash of the resulting module.
+    BenchmarkHash hash;
+    // The bitcode of the resulting module.
+    std::shared_ptr<const Bitcode> bitcode;
+    // Whether the action reported that it changed the module. An action may
+    // report a change that produces an identical module.
+    bool changed;
+  };
+
+  // Look up the result of applying an action to the module with the given
+  // hash. Returns nullopt if the transition has not been recorded, or if the
+  // resulting module has been discarded.
+  std::optional<Transition> getTransition(const BenchmarkHash& hash, LlvmAction action);
+
+  // Record the result of applying an action to the module with the given hash.
+  void addTransition(const BenchmarkHash& hash, LlvmAction action, const Transition& result);
+
+  // Look up an observation of the module with the given hash. Returns nullptr
+  // if the observation has not been recorded.
+  std::shared_ptr<const Observation> getObservation(const BenchmarkHash& hash,
+                                                    LlvmObservationSpace space);
+
+  // Record an observation of the module with the given hash. The observation
+  // must be deterministic and depend only on the module, see
+  // isModuleObservationSpace().
+  void addObservation(const BenchmarkHash& hash, LlvmObservationSpace space,
+                      std::shared_ptr<const Observation> observation);
+
+  inline size_t capacity() const { return capacity_; }
+
+ private:
+  struct HashHasher {
+    size_t operator()(const BenchmarkHash& hash) const;
+  };
+
+  // A module in the table.
+  struct Entry {
+    BenchmarkHash hash;
+    // The bitcode of the module. Null if the module has only been observed
+    // and not reached by a recorded transition.
+    std::shared_ptr<const Bitcode> bitcode;
+    // The hash of the module that results from each action, and whether the
+    // action reported a change.
+    std::unordered_map<LlvmAction, std::pair<BenchmarkHash, bool>> transitions;
+    std::unordered_map<LlvmObservationSpace, std::shared_ptr<const Observation>> observations;
+  };
+
+  // Return the entry for a module, or nullptr if the module is not in the
+  // table. The entry is marked as most recently used. Must be called while
+  // holding mutex_.
+  Entry* find(const BenchmarkHash& hash);
+
+  // Return the entry for a module, adding an empty entry if the module is not
+  // in the table. Must be called while holding mutex_.
+  Entry& findOrInsert(const BenchmarkHash& hash);
+
+  const size_t capacity_;
+  // Entries, ordered from most to least recently used.
+  std::list<Entry> entries_;
+  std::unordered_map<BenchmarkHash, std::list<Entry>::iterator, HashHasher> index_;
+  std::mutex mutex_;
+};
+
+}  // namespace compiler_gym::llvm_service
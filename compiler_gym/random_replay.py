@@ -20,10 +20,15 @@ def replay_actions(env: CompilerEnv, action_names: List[str], outdir: Path):
     if isinstance(env, LlvmEnv):
         env.write_bitcode(outdir / "unoptimized.bc")
 
+    # Submit all of the steps up front so that they run back to back.
+    futures = [
+        env.step_async(env.action_space.names.index(action)) for action in action_names
+    ]
+
     with open(str(logs_path), "w") as f:
         ep_reward = 0
-        for i, action in enumerate(action_names, start=1):
-            _, reward, done, _ = env.step(env.action_space.names.index(action))
+        for i, (action, future) in enumerate(zip(action_names, futures), start=1):
+            _, reward, done, _ = future.result()
             assert not done
             ep_reward += reward
             print(
@@ -12,6 +12,7 @@ from compiler_gym.service.connection import (
     ServiceTransportError,
 )
 from compiler_gym.service.proto2py import observation_t, scalar_range2tuple
+from compiler_gym.service.service_pool import ServicePool
 
 __all__ = [
     "ServiceError",
@@ -21,6 +22,7 @@ __all__ = [
     "ServiceOSError",
     "CompilerGymServiceConnection",
     "ConnectionOpts",
+    "ServicePool",
     "scalar_range2tuple",
     "observation_t",
 ]
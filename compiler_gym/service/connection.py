@@ -3,17 +3,21 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 """This module contains the logic for connecting to services."""
+import asyncio
 import logging
 import os
 import random
+import select
 import shutil
 import subprocess
 import sys
+from collections import deque
 from datetime import datetime
 from pathlib import Path
+from queue import Queue
 from signal import Signals
 from time import sleep, time
-from typing import Iterable, List, NamedTuple, Optional, TypeVar, Union
+from typing import Deque, Iterable, List, NamedTuple, Optional, TypeVar, Union
 
 import grpc
 
@@ -23,6 +27,8 @@ from compiler_gym.service.proto import (
     GetSpacesReply,
     GetSpacesRequest,
     ObservationSpace,
+    StepReply,
+    StepRequest,
 )
 from compiler_gym.util.debug_util import get_debug_level
 from compiler_gym.util.runfiles_path import (
@@ -33,6 +39,10 @@ from compiler_gym.util.runfiles_path import (
 from compiler_gym.util.shell_format import plural
 from compiler_gym.util.truncate import truncate_lines
 
+# The maximum length of a unix domain socket path. The limit is 108 bytes on
+# Linux and 104 bytes on macOS, including the null terminator.
+UNIX_SOCKET_PATH_MAX_LENGTH = 103
+
 GRPC_CHANNEL_OPTIONS = [
     # Raise the default inbound message filter from 4MB.
     ("grpc.max_receive_message_length", 512 * 1024 * 1024),
@@ -78,9 +88,45 @@ class ConnectionOpts(NamedTuple):
     local_service_exit_max_seconds: float = 30
     """The maximum number of seconds to wait for a local service to terminate on close."""
 
+    local_service_ready_pipe: bool = False
+    """If true, a local service is passed the write end of a pipe using the
+    :code:`--ready_fd` flag, and the client blocks on the pipe until the service
+    reports that it is listening, rather than polling for a port.txt file. The
+    service binary must support the :code:`--ready_fd` flag. Services built
+    using :code:`compiler_gym::util::runService()` do."""
+
+    local_service_unix_socket: bool = False
+    """If true, a local service is started with the :code:`--unix_socket` flag
+    and listens on a unix domain socket in its working directory rather than on
+    a TCP port. This avoids the overhead of the TCP loopback stack for large
+    messages. The service binary must support the :code:`--unix_socket` flag.
+    Services built using :code:`compiler_gym::util::runService()` do."""
+
     rpc_init_max_seconds: float = 3
     """The maximum number of seconds to wait for an RPC connection to establish."""
 
+    shared_memory_observations: bool = False
+    """If true, request that the service return large observations through
+    memory-mapped files in its working directory rather than serializing them
+    in RPC replies. This requires that the client and service share a
+    filesystem, so it should only be used with local services. Services that do
+    not support shared memory ignore this option."""
+
+    step_stream: bool = False
+    """If true, environments send their steps to the service over a single
+    long-lived bidirectional :code:`StepStream` RPC rather than making a unary
+    :code:`Step` call per step. This removes the per-call overhead of unary
+    RPCs for episodes with many cheap steps. If the service does not implement
+    :code:`StepStream`, environments fall back to unary calls."""
+
+    service_side_rewards: bool = False
+    """If true, environments ask the service to compute the reward for each
+    step, rather than requesting the observations that the reward depends on
+    and computing the reward in Python. This is used only for reward spaces
+    that the service lists as supported. The service tracks the reward state
+    itself, so rewards that are computed directly by :code:`env.reward[...]`
+    do not affect the rewards returned by :code:`env.step()`."""
+
 
 class ServiceError(Exception):
     """Error raised from the service."""
@@ -129,6 +175,84 @@ else:
     StubMethod = Callable[[Request], Reply]
 
 
+def rpc_error_to_exception(
+    error: grpc.RpcError, request: Request, timeout: float
+) -> Exception:
+    """Convert an error returned by an RPC call to the equivalent builtin
+    exception type.
+
+    This is used by both the synchronous and asyncio connections. Retryable
+    UNAVAILABLE errors should be handled by the caller.
+
+    :param error: The error returned by the gRPC call.
+    :param request: The request message that was sent.
+    :param timeout: The timeout of the call, in seconds.
+    :return: An exception instance.
+    """
+    # pylint: disable=no-member
+    #
+    # House keeping note: if you modify the exceptions that this method
+    # raises, please update the CompilerGymServiceConnection.__call__()
+    # docstring.
+    if error.code() == grpc.StatusCode.INVALID_ARGUMENT:
+        return ValueError(error.details())
+    elif error.code() == grpc.StatusCode.UNIMPLEMENTED:
+        return NotImplementedError(error.details())
+    elif error.code() == grpc.StatusCode.NOT_FOUND:
+        return FileNotFoundError(error.details())
+    elif error.code() == grpc.StatusCode.RESOURCE_EXHAUSTED:
+        return ServiceOSError(error.details())
+    elif error.code() == grpc.StatusCode.FAILED_PRECONDITION:
+        return TypeError(str(error.details()))
+    elif (
+        error.code() == grpc.StatusCode.INTERNAL
+        and error.details() == "Exception serializing request!"
+    ):
+        return TypeError(f"{error.details()} Request type: {type(request).__name__}")
+    elif error.code() == grpc.StatusCode.DEADLINE_EXCEEDED:
+        return TimeoutError(f"{error.details()} ({timeout:.1f} seconds)")
+    elif error.code() == grpc.StatusCode.DATA_LOSS:
+        return ServiceError(error.details())
+    elif error.code() == grpc.StatusCode.UNKNOWN:
+        # By default, GRPC provides no context if an exception is raised in an
+        # RPC handler as this could lead to an information leak. Unfortunately
+        # for us this makes debugging a little more difficult, so be verbose
+        # about the possible causes of this error.
+        return ServiceError(
+            "Service returned an unknown error. Possibly an "
+            "unhandled exception in a C++ RPC handler, see "
+            "<https://github.com/grpc/grpc/issues/13706>."
+        )
+    return ServiceError(
+        f"RPC call returned status code {error.code()} and error `{error.details()}`"
+    )
+
+
+def log_rpc_retry(
+    url: str,
+    logger: logging.Logger,
+    error: grpc.RpcError,
+    attempt: int,
+    max_retries: int,
+) -> None:
+    """Log a failed attempt to communicate with a service.
+
+    :raises ServiceTransportError: If there are no retries remaining.
+    """
+    if attempt > max_retries:
+        raise ServiceTransportError(
+            f"{url} {error.details()} ({max_retries} retries)"
+        ) from None
+    remaining = max_retries - attempt
+    logger.warning(
+        "%s %s (%d %s remaining)",
+        url,
+        error.details(),
+        remaining,
+        plural(remaining, "attempt", "attempts"),
+    )
+
+
 class Connection(object):
     """Base class for service connections."""
 
@@ -174,66 +298,18 @@ class Connection(object):
                     ) from None
                 raise e
             except grpc.RpcError as e:
-                # We raise "from None" to discard the gRPC stack trace, with the
-                # remaining stack trace correctly pointing to the CompilerGym
-                # calling code.
-                if e.code() == grpc.StatusCode.INVALID_ARGUMENT:
-                    raise ValueError(e.details()) from None
-                elif e.code() == grpc.StatusCode.UNIMPLEMENTED:
-                    raise NotImplementedError(e.details()) from None
-                elif e.code() == grpc.StatusCode.NOT_FOUND:
-                    raise FileNotFoundError(e.details()) from None
-                elif e.code() == grpc.StatusCode.RESOURCE_EXHAUSTED:
-                    raise ServiceOSError(e.details()) from None
-                elif e.code() == grpc.StatusCode.FAILED_PRECONDITION:
-                    raise TypeError(str(e.details())) from None
-                elif e.code() == grpc.StatusCode.UNAVAILABLE:
-                    # For "unavailable" errors we retry with exponential
-                    # backoff. This is because this error can be caused by an
-                    # overloaded service, a flaky connection, etc.
-                    attempt += 1
-                    if attempt > max_retries:
-                        raise ServiceTransportError(
-                            f"{self.url} {e.details()} ({max_retries} retries)"
-                        ) from None
-                    remaining = max_retries - attempt
-                    self.logger.warning(
-                        "%s %s (%d %s remaining)",
-                        self.url,
-                        e.details(),
-                        remaining,
-                        plural(remaining, "attempt", "attempts"),
-                    )
-                    sleep(retry_wait_seconds)
-                    retry_wait_seconds *= retry_wait_backoff_exponent
-                elif (
-                    e.code() == grpc.StatusCode.INTERNAL
-                    and e.details() == "Exception serializing request!"
-                ):
-                    raise TypeError(
-                        f"{e.details()} Request type: {type(request).__name__}"
-                    ) from None
-                elif e.code() == grpc.StatusCode.DEADLINE_EXCEEDED:
-                    raise TimeoutError(
-                        f"{e.details()} ({timeout:.1f} seconds)"
-                    ) from None
-                elif e.code() == grpc.StatusCode.DATA_LOSS:
-                    raise ServiceError(e.details()) from None
-                elif e.code() == grpc.StatusCode.UNKNOWN:
-                    # By default, GRPC provides no context if an exception is
-                    # raised in an RPC handler as this could lead to an
-                    # information leak. Unfortunately for us this makes
-                    # debugging a little more difficult, so be verbose about the
-                    # possible causes of this error.
-                    raise ServiceError(
-                        "Service returned an unknown error. Possibly an "
-                        "unhandled exception in a C++ RPC handler, see "
-                        "<https://github.com/grpc/grpc/issues/13706>."
-                    ) from None
-                else:
-                    raise ServiceError(
-                        f"RPC call returned status code {e.code()} and error `{e.details()}`"
-                    ) from None
+                if e.code() != grpc.StatusCode.UNAVAILABLE:
+                    # We raise "from None" to discard the gRPC stack trace, with
+                    # the remaining stack trace correctly pointing to the
+                    # CompilerGym calling code.
+                    raise rpc_error_to_exception(e, request, timeout) from None
+                # For "unavailable" errors we retry with exponential backoff.
+                # This is because this error can be caused by an overloaded
+                # service, a flaky connection, etc.
+                attempt += 1
+                log_rpc_retry(self.url, self.logger, e, attempt, max_retries)
+                sleep(retry_wait_seconds)
+                retry_wait_seconds *= retry_wait_backoff_exponent
 
     def loglines(self) -> Iterable[str]:
         """Fetch any available log lines from the service backend.
@@ -264,10 +340,16 @@ class ManagedConnection(Connection):
         rpc_init_max_seconds: float,
         process_exit_max_seconds: float,
         logger: logging.Logger,
+        use_ready_pipe: bool = False,
+        use_unix_socket: bool = False,
     ):
         """Constructor.
 
         :param local_service_binary: The path of the service binary.
+        :param use_ready_pipe: If true, wait for the service to write its port
+            to an inherited pipe, rather than polling for a port.txt file.
+        :param use_unix_socket: If true, connect to the service over a unix
+            domain socket in its working directory rather than a TCP port.
         :raises TimeoutError: If fails to establish connection within a specified time limit.
         """
         self.process_exit_max_seconds = process_exit_max_seconds
@@ -312,56 +394,50 @@ class ManagedConnection(Connection):
             if not os.environ.get("GRPC_VERBOSITY"):
                 os.environ["GRPC_VERBOSITY"] = "NONE"
 
-        logger.debug("Exec %s", cmd)
-        self.process = subprocess.Popen(
-            cmd,
-            env=env,
-            cwd=local_service_binary.parent,
-        )
+        unix_socket = self.working_dir / "service.sock" if use_unix_socket else None
+        if unix_socket and len(str(unix_socket)) > UNIX_SOCKET_PATH_MAX_LENGTH:
+            logger.warning(
+                "Unix socket path is too long, falling back to TCP: %s", unix_socket
+            )
+            unix_socket = None
+        if unix_socket:
+            cmd.append(f"--unix_socket={unix_socket}")
 
-        # Read the port from a file generated by the service.
-        wait_secs = 0.1
-        port_path = self.working_dir / "port.txt"
-        end_time = time() + port_init_max_seconds
-        while time() < end_time:
-            returncode = self.process.poll()
-            if returncode is not None:
-                try:
-                    # Try and decode the name of a signal. Signal returncodes
-                    # are negative.
-                    returncode = f"{returncode} ({Signals(abs(returncode)).name})"
-                except ValueError:
-                    pass
-                msg = f"Service terminated with returncode: {returncode}"
-                # Attach any logs from the service if available.
-                logs = truncate_lines(
-                    self.loglines(), max_line_len=100, max_lines=25, tail=True
+        # Optionally create a pipe that the service writes its port to once it
+        # is ready. The write end is inherited by the service process.
+        ready_read_fd, ready_write_fd = os.pipe() if use_ready_pipe else (None, None)
+        if use_ready_pipe:
+            cmd.append(f"--ready_fd={ready_write_fd}")
+
+        logger.debug("Exec %s", cmd)
+        try:
+            self.process = subprocess.Popen(
+                cmd,
+                env=env,
+                cwd=local_service_binary.parent,
+                pass_fds=(ready_write_fd,) if use_ready_pipe else (),
+            )
+        except OSError:
+            if use_ready_pipe:
+                os.close(ready_read_fd)
+                os.close(ready_write_fd)
+            shutil.rmtree(self.working_dir, ignore_errors=True)
+            raise
+
+        if use_ready_pipe:
+            # Close our copy of the write end so that the read end reaches EOF
+            # if the service terminates.
+            os.close(ready_write_fd)
+            try:
+                self.port = self._wait_for_ready_pipe(
+                    ready_read_fd, port_init_max_seconds, logger
                 )
-                if logs:
-                    msg = f"{msg}\nService logs:\n{logs}"
-                shutil.rmtree(self.working_dir, ignore_errors=True)
-                raise ServiceError(msg)
-            if port_path.is_file():
-                try:
-                    with open(port_path) as f:
-                        self.port = int(f.read().rstrip())
-                    break
-                except ValueError:
-                    # ValueError is raised by int(...) on invalid input. In that
-                    # case, wait for longer.
-                    pass
-            sleep(wait_secs)
-            wait_secs *= 1.2
+            finally:
+                os.close(ready_read_fd)
         else:
-            self.process.kill()
-            self.process.communicate(timeout=rpc_init_max_seconds)
-            shutil.rmtree(self.working_dir)
-            raise TimeoutError(
-                "Service failed to produce port file after "
-                f"{port_init_max_seconds:.1f} seconds"
-            )
+            self.port = self._wait_for_port_file(port_init_max_seconds)
 
-        url = f"localhost:{self.port}"
+        url = f"unix:{unix_socket}" if unix_socket else f"localhost:{self.port}"
 
         wait_secs = 0.1
         attempts = 0
@@ -400,6 +476,97 @@ class ManagedConnection(Connection):
 
         super().__init__(channel, url, logger)
 
+    def _wait_for_port_file(self, port_init_max_seconds: float) -> int:
+        """Read the port from a file generated by the service."""
+        wait_secs = 0.1
+        port_path = self.working_dir / "port.txt"
+        end_time = time() + port_init_max_seconds
+        while time() < end_time:
+            if self.process.poll() is not None:
+                self._raise_service_terminated()
+            if port_path.is_file():
+                try:
+                    with open(port_path) as f:
+                        return int(f.read().rstrip())
+                except ValueError:
+                    # ValueError is raised by int(...) on invalid input. In that
+                    # case, wait for longer.
+                    pass
+            sleep(wait_secs)
+            wait_secs *= 1.2
+
+        self._kill_during_startup()
+        raise TimeoutError(
+            "Service failed to produce port file after "
+            f"{port_init_max_seconds:.1f} seconds"
+        )
+
+    def _wait_for_ready_pipe(
+        self, fd: int, port_init_max_seconds: float, logger: logging.Logger
+    ) -> int:
+        """Block until the service writes "<port> <pid>" to the pipe."""
+        buf = b""
+        end_time = time() + port_init_max_seconds
+        while b"\n" not in buf:
+            remaining = end_time - time()
+            if remaining <= 0:
+                self._kill_during_startup()
+                raise TimeoutError(
+                    "Service failed to report its port after "
+                    f"{port_init_max_seconds:.1f} seconds"
+                )
+            readable, _, _ = select.select([fd], [], [], remaining)
+            if not readable:
+                continue
+            chunk = os.read(fd, 64)
+            if not chunk:
+                # EOF: the service closed the pipe without writing a port. It
+                # has either crashed or does not support --ready_fd.
+                try:
+                    self.process.wait(timeout=self.process_exit_max_seconds)
+                except subprocess.TimeoutExpired:
+                    self._kill_during_startup()
+                    raise ServiceError(
+                        "Service closed the ready pipe without reporting a port"
+                    )
+                self._raise_service_terminated()
+            buf += chunk
+
+        try:
+            port, pid = (int(x) for x in buf.decode("utf-8").split())
+        except ValueError as e:
+            self._kill_during_startup()
+            raise ServiceError(f"Invalid service ready message: {buf!r}") from e
+        logger.debug("Service PID=%d listening on port %d", pid, port)
+        return port
+
+    def _raise_service_terminated(self) -> None:
+        """Raise an error for a service that terminated during startup."""
+        returncode = self.process.poll()
+        try:
+            # Try and decode the name of a signal. Signal returncodes are
+            # negative.
+            returncode = f"{returncode} ({Signals(abs(returncode)).name})"
+        except ValueError:
+            pass
+        msg = f"Service terminated with returncode: {returncode}"
+        # Attach any logs from the service if available.
+        logs = truncate_lines(
+            self.loglines(), max_line_len=100, max_lines=25, tail=True
+        )
+        if logs:
+            msg = f"{msg}\nService logs:\n{logs}"
+        shutil.rmtree(self.working_dir, ignore_errors=True)
+        raise ServiceError(msg)
+
+    def _kill_during_startup(self) -> None:
+        """Kill a service that failed to start and remove its working directory."""
+        try:
+            self.process.kill()
+            self.process.communicate(timeout=self.process_exit_max_seconds)
+        finally:
+            shutil.rmtree(self.working_dir, ignore_errors=True)
+
     def loglines(self) -> Iterable[str]:
         """Fetch any available log lines from the service backend.
 
@@ -519,6 +686,8 @@ class CompilerGymServiceConnection(object):
     :ivar action_spaces: A list of action spaces provided by the service.
     :ivar observation_spaces: A list of observation spaces provided by the
         service.
+    :ivar reward_spaces: The names of the reward spaces that the service can
+        compute itself.
     """
 
     def __init__(
@@ -550,6 +719,7 @@ class CompilerGymServiceConnection(object):
         self.observation_spaces: List[ObservationSpace] = list(
             self.connection.spaces.observation_space_list
         )
+        self.reward_spaces: List[str] = list(self.connection.spaces.reward_space_list)
 
     def _establish_connection(self) -> None:
         """Create and establish a connection."""
@@ -594,6 +764,8 @@ class CompilerGymServiceConnection(object):
                         rpc_init_max_seconds=opts.rpc_init_max_seconds,
                         port_init_max_seconds=opts.local_service_port_init_max_seconds,
                         logger=logger,
+                        use_ready_pipe=opts.local_service_ready_pipe,
+                        use_unix_socket=opts.local_service_unix_socket,
                     )
                 else:
                     endpoint_name = endpoint
@@ -722,3 +894,181 @@ class CompilerGymServiceConnection(object):
                 retry_wait_backoff_exponent or self.opts.retry_wait_backoff_exponent
             ),
         )
+
+
+class StepStream(object):
+    """A long-lived bidirectional :code:`StepStream` call to a service.
+
+    Each call sends a single step request on the stream and blocks until its
+    reply is received. Replies are returned in the order that requests are
+    sent. Requests can be pipelined by calling :meth:`send()` several times
+    before calling :meth:`receive()` for each request. Unlike :meth:`CompilerGymServiceConnection.__call__()
+    <compiler_gym.service.CompilerGymServiceConnection.__call__>`, calls are
+    not retried and have no deadline. If a call fails, the stream is closed and
+    a new stream must be opened to continue. The service stops reading
+    requests from a stream when a step fails, so requests that were sent after
+    the failed request were not run.
+
+    Example usage:
+
+    .. code-block:: python
+
+        stream = StepStream(connection)
+        for action in actions:
+            reply = stream(StepRequest(session_id=session_id, action=[action]))
+        stream.close()
+
+    One thread may call :meth:`send()` while another calls :meth:`receive()`,
+    but a stream is otherwise not thread safe.
+    """
+
+    def __init__(self, service: CompilerGymServiceConnection):
+        """Constructor.
+
+        :param service: The connection to open the stream on.
+        """
+        self.service = service
+        # Requests are consumed by a background gRPC thread. A None value
+        # terminates the stream.
+        self._requests: "Queue[Optional[StepRequest]]" = Queue()
+        # The requests that have been sent but not yet received, in order.
+        self._in_flight: Deque[StepRequest] = deque()
+        self._replies = service.stub.StepStream(iter(self._requests.get, None))
+        self.closed = False
+
+    def __repr__(self):
+        return f"StepStream({self.service.connection.url})"
+
+    def __call__(self, request: StepRequest) -> StepReply:
+        """Send a step request and wait for its reply.
+
+        :param request: A step request.
+        :raises: The same exceptions as :meth:`receive()`.
+        :return: A step reply.
+        """
+        self.send(request)
+        return self.receive()
+
+    def send(self, request: StepRequest) -> None:
+        """Send a step request without waiting for its reply.
+
+        :param request: A step request.
+        """
+        self._in_flight.append(request)
+        self._requests.put(request)
+
+    def receive(self) -> StepReply:
+        """Wait for the reply to the oldest request that has been sent.
+
+        :raises ServiceIsClosed: If the stream was closed before the reply was
+            received. The request was not run.
+        :raises: The same exceptions as
+            :meth:`CompilerGymServiceConnection.__call__()
+            <compiler_gym.service.CompilerGymServiceConnection.__call__>`.
+        :return: A step reply.
+        """
+        request = self._in_flight.popleft()
+        if self.closed:
+            raise ServiceIsClosed(f"{self} is closed")
+        try:
+            return next(self._replies)
+        except StopIteration:
+            self.close()
+            raise ServiceTransportError(f"{self} was closed by the service") from None
+        except grpc.RpcError as e:
+            self.close()
+            if e.code() == grpc.StatusCode.UNAVAILABLE:
+                raise ServiceTransportError(f"{self} {e.details()}") from None
+            raise rpc_error_to_exception(
+                e, request, self.service.opts.rpc_call_max_seconds
+            ) from None
+
+    def close(self) -> None:
+        """Close the stream. This is idempotent."""
+        if self.closed:
+            return
+        self.closed = True
+        self._requests.put(None)
+        self._replies.cancel()
+
+
+class AsyncServiceConnection(object):
+    """An asyncio connection to a running service.
+
+    This provides the same calling convention as
+    :class:`CompilerGymServiceConnection`, except that calls are coroutines
+    backed by a :code:`grpc.aio` channel. It does not manage the lifetime of
+    the service. An instance must be created from within a running event loop.
+
+    Example usage:
+
+    .. code-block:: python
+
+        connection = AsyncServiceConnection("localhost:8080")
+        reply = await connection(connection.stub.GetSpaces, GetSpacesRequest())
+        await connection.close()
+    """
+
+    def __init__(
+        self,
+        url: str,
+        opts: ConnectionOpts = None,
+        logger: Optional[logging.Logger] = None,
+    ):
+        """Constructor.
+
+        :param url: The URL of the service, e.g. "localhost:8080".
+        :param opts: The connection options.
+        :param logger: The logger to use.
+        """
+        self.url = url
+        self.opts = opts or ConnectionOpts()
+        self.logger = logger or logging.getLogger("")
+        self.channel = grpc.aio.insecure_channel(url, options=GRPC_CHANNEL_OPTIONS)
+        self.stub = CompilerGymServiceStub(self.channel)
+
+    def __repr__(self):
+        return f"AsyncServiceConnection({self.url})"
+
+    async def close(self) -> None:
+        """Close the channel."""
+        await self.channel.close()
+
+    async def __call__(
+        self,
+        stub_method: StubMethod,
+        request: Request,
+        timeout: Optional[float] = None,
+    ) -> Reply:
+        """Invoke an RPC method on the service and await its response.
+
+        :param stub_method: An RPC method attribute on
+            :code:`AsyncServiceConnection.stub`.
+        :param request: A request message.
+        :param timeout: The maximum number of seconds to await a reply. If not
+            provided, the default value is
+            :code:`ConnectionOpts.rpc_call_max_seconds`.
+        :raises: The same exceptions as
+            :meth:`CompilerGymServiceConnection.__call__()
+            <compiler_gym.service.CompilerGymServiceConnection.__call__>`.
+        :return: A reply message.
+        """
+        timeout = timeout or self.opts.rpc_call_max_seconds
+        retry_wait_seconds = self.opts.retry_wait_seconds
+        attempt = 0
+        while True:
+            try:
+                return await stub_method(request, timeout=timeout)
+            except grpc.aio.UsageError as e:
+                raise ServiceIsClosed(
+                    f"RPC communication failed with message: {e}"
+                ) from None
+            except grpc.RpcError as e:
+                if e.code() != grpc.StatusCode.UNAVAILABLE:
+                    raise rpc_error_to_exception(e, request, timeout) from None
+                attempt += 1
+                log_rpc_retry(
+                    self.url, self.logger, e, attempt, self.opts.rpc_max_retries
+                )
+                await asyncio.sleep(retry_wait_seconds)
+                retry_wait_seconds *= self.opts.retry_wait_backoff_exponent
@@ -6,6 +6,8 @@ from compiler_gym.service.proto.compiler_gym_service_pb2 import (
     ActionSpace,
     AddBenchmarkReply,
     AddBenchmarkRequest,
+    BatchStepReply,
+    BatchStepRequest,
     Benchmark,
     DoubleList,
     EndSessionReply,
@@ -22,9 +24,14 @@ from compiler_gym.service.proto.compiler_gym_service_pb2 import (
     Int64List,
     Observation,
     ObservationSpace,
+    RestoreSessionReply,
+    RestoreSessionRequest,
     ScalarLimit,
     ScalarRange,
     ScalarRangeList,
+    SharedMemoryBuffer,
+    SnapshotSessionReply,
+    SnapshotSessionRequest,
     StartSessionReply,
     StartSessionRequest,
     StepReply,
@@ -39,6 +46,8 @@ __all__ = [
     "ActionSpace",
     "AddBenchmarkReply",
     "AddBenchmarkRequest",
+    "BatchStepReply",
+    "BatchStepRequest",
     "Benchmark",
     "CompilerGymServiceConnection",
     "CompilerGymServiceStub",
@@ -59,6 +68,8 @@ __all__ = [
     "Int64List",
     "Observation",
     "ObservationSpace",
+    "RestoreSessionReply",
+    "RestoreSessionRequest",
     "ScalarLimit",
     "ScalarRange",
     "ScalarRangeList",
@@ -66,6 +77,9 @@ __all__ = [
     "ServiceInitError",
     "ServiceIsClosed",
     "ServiceTransportError",
+    "SharedMemoryBuffer",
+    "SnapshotSessionReply",
+    "SnapshotSessionRequest",
     "StartSessionReply",
     "StartSessionRequest",
     "StepReply",
@@ -0,0 +1,257 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""This module defines a pool of pre-started service connections."""
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Lock
+from typing import Deque, Dict, List, Optional, Set, Union
+
+from compiler_gym.service.connection import (
+    CompilerGymServiceConnection,
+    ConnectionOpts,
+    ServiceIsClosed,
+)
+
+
+def _is_alive(connection: CompilerGymServiceConnection) -> bool:
+    """Return whether a connection is open and, if the service is a local
+    subprocess, whether that process is still running.
+    """
+    if connection.closed:
+        return False
+    process = getattr(connection.connection, "process", None)
+    return process is None or process.poll() is None
+
+
+class ServicePool(object):
+    """A pool of idle, already-connected service connections.
+
+    Starting a service is expensive: a subprocess must be launched and the
+    client must wait for the service to come online before it can be used. A
+    service pool amortizes this cost by starting services in the background so
+    that when an environment is created, a warm connection can be leased from
+    the pool without waiting.
+
+    Example usage:
+
+    .. code-block:: python
+
+        from compiler_gym.envs.llvm import LLVM_SERVICE_BINARY
+
+        with ServicePool(LLVM_SERVICE_BINARY, size=4) as pool:
+            env = gym.make("llvm-v0", service_pool=pool)
+            env.reset()
+            ...
+            # Return the service connection to the pool.
+            env.close()
+
+    When an environment that was created with a service pool is closed, its
+    connection is returned to the pool to be reused by a later environment.
+    Connections that are returned to a pool that already holds :code:`size`
+    idle connections with the same options are closed. Connections whose
+    service state was modified by their lessee, such as by adding custom
+    benchmarks, are closed rather than reused.
+
+    Idle connections are keyed by the :class:`ConnectionOpts` that they were
+    created with, and a connection is only leased to a caller that requests the
+    same options. Only connections with the pool's own options are started in
+    the background.
+
+    A pool is thread safe. Services are started on background threads, so
+    services that fail to start are logged and do not raise an error until a
+    connection is requested while the pool is empty.
+    """
+
+    def __init__(
+        self,
+        endpoint: Union[str, Path],
+        size: int = 1,
+        opts: Optional[ConnectionOpts] = None,
+        logger: Optional[logging.Logger] = None,
+    ):
+        """Constructor.
+
+        :param endpoint: The connection endpoint. Either the URL of a service,
+            e.g. "localhost:8080", or the path of a local service binary.
+        :param size: The number of idle connections to keep warm.
+        :param opts: The options used to establish the connections that are
+            started in the background.
+        :param logger: The logger to use.
+        :raises ValueError: If :code:`size` is less than one.
+        """
+        if size < 1:
+            raise ValueError(f"ServicePool size must be at least 1, received: {size}")
+        self.endpoint = endpoint
+        self.size = size
+        self.opts = opts or ConnectionOpts()
+        self.logger = logger or logging.getLogger("")
+
+        self._lock = Lock()
+        self._idle: Dict[ConnectionOpts, Deque[CompilerGymServiceConnection]] = {}
+        # Leased connections that must not be returned to the pool.
+        self._modified: Set[CompilerGymServiceConnection] = set()
+        # The number of connections that are being started in the background.
+        self._pending = 0
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=size)
+
+        self._refill()
+
+    def __repr__(self):
+        return f"ServicePool({self.endpoint}, size={self.size})"
+
+    @property
+    def closed(self) -> bool:
+        """Whether the pool is closed."""
+        return self._closed
+
+    @property
+    def idle_count(self) -> int:
+        """The number of idle connections that are ready to be acquired."""
+        with self._lock:
+            return sum(len(idle) for idle in self._idle.values())
+
+    def acquire(
+        self, opts: Optional[ConnectionOpts] = None
+    ) -> CompilerGymServiceConnection:
+        """Lease a connection from the pool.
+
+        If the pool has an idle connection with the requested options, it is
+        returned immediately and a replacement is started in the background.
+        Else a new connection is started in the calling thread.
+
+        :param opts: The options of the connection. If not provided, the
+            pool's options are used.
+        :return: A service connection. Return it to the pool using
+            :meth:`release() <compiler_gym.service.ServicePool.release>`.
+        :raises ServiceIsClosed: If the pool is closed.
+        :raises TimeoutError: If a new connection is required and the service
+            fails to start.
+        """
+        opts = opts or self.opts
+        connection: Optional[CompilerGymServiceConnection] = None
+        with self._lock:
+            if self._closed:
+                raise ServiceIsClosed(f"{self} is closed")
+            idle = self._idle.get(opts, deque())
+            while idle and connection is None:
+                connection = idle.popleft()
+                if not _is_alive(connection):
+                    connection.close()
+                    connection = None
+
+        self._refill()
+
+        if connection is None:
+            self.logger.debug("%s has no idle connections", self)
+            connection = self._new_connection(opts)
+        return connection
+
+    def mark_modified(self, connection: CompilerGymServiceConnection) -> None:
+        """Record that the state of a leased service has been modified, such as
+        by adding custom benchmarks, so that the connection is closed rather
+        than reused when it is released.
+
+        :param connection: A connection that was returned by
+            :meth:`acquire() <compiler_gym.service.ServicePool.acquire>`.
+        """
+        with self._lock:
+            self._modified.add(connection)
+
+    def release(self, connection: CompilerGymServiceConnection) -> None:
+        """Return a connection to the pool.
+
+        The connection must not have any active sessions. If the pool is full
+        or closed, the service has terminated, or the connection was marked as
+        modified, the connection is closed. The pool starts a replacement for
+        each leased connection when it is acquired, so closing a connection
+        does not deplete the pool.
+
+        :param connection: A connection that was returned by
+            :meth:`acquire() <compiler_gym.service.ServicePool.acquire>`.
+        """
+        with self._lock:
+            modified = connection in self._modified
+            self._modified.discard(connection)
+            idle = self._idle.setdefault(connection.opts, deque())
+            if not (
+                self._closed
+                or modified
+                or not _is_alive(connection)
+                or len(idle) >= self.size
+            ):
+                idle.append(connection)
+                return
+        connection.close()
+
+    def close(self) -> None:
+        """Close the pool and all of its idle connections.
+
+        Connections that are leased from the pool are not affected, and are
+        closed when they are released.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            idle: List[CompilerGymServiceConnection] = [
+                connection
+                for connections in self._idle.values()
+                for connection in connections
+            ]
+            self._idle.clear()
+            self._modified.clear()
+
+        # Wait for any background starts to complete. They see that the pool is
+        # closed and close their own connections.
+        self._executor.shutdown(wait=True)
+        for connection in idle:
+            connection.close()
+
+    def __enter__(self) -> "ServicePool":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __del__(self):
+        # Don't let the idle services be orphaned if the user forgot to
+        # close().
+        if hasattr(self, "_executor"):
+            self.close()
+
+    def _new_connection(self, opts: ConnectionOpts) -> CompilerGymServiceConnection:
+        return CompilerGymServiceConnection(
+            endpoint=self.endpoint, opts=opts, logger=self.logger
+        )
+
+    def _refill(self) -> None:
+        """Start enough background connections to fill the pool."""
+        with self._lock:
+            if self._closed:
+                return
+            deficit = self.size - len(self._idle.get(self.opts, ())) - self._pending
+            for _ in range(deficit):
+                self._pending += 1
+                self._executor.submit(self._start_connection)
+
+    def _start_connection(self) -> None:
+        try:
+            connection = self._new_connection(self.opts)
+        except Exception as e:  # pylint: disable=broad-except
+            self.logger.warning("%s failed to start a service: %s", self, e)
+            with self._lock:
+                self._pending -= 1
+            return
+
+        with self._lock:
+            self._pending -= 1
+            idle = self._idle.setdefault(self.opts, deque())
+            if not self._closed and len(idle) < self.size:
+                idle.append(connection)
+                return
+        connection.close()
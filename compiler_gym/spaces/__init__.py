@@ -4,6 +4,7 @@
 # LICENSE file in the root directory of this source tree.
 from compiler_gym.spaces.commandline import Commandline, CommandlineFlag
 from compiler_gym.spaces.named_discrete import NamedDiscrete
+from compiler_gym.spaces.programl_graph import ProgramlGraph
 from compiler_gym.spaces.reward import Reward
 from compiler_gym.spaces.scalar import Scalar
 from compiler_gym.spaces.sequence import Sequence
@@ -14,5 +15,6 @@ __all__ = [
     "NamedDiscrete",
     "Commandline",
     "CommandlineFlag",
+    "ProgramlGraph",
     "Reward",
 ]
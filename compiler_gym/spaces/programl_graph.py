@@ -0,0 +1,277 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import networkx as nx
+import numpy as np
+
+
+class ProgramlGraph(object):
+    """A compact, columnar representation of a ProGraML graph.
+
+    Nodes and edges are stored as numpy arrays rather than as a Python object
+    per node and edge, so that large numbers of graphs can be held in memory.
+    Graphs that are decoded from a :code:`ProgramlBinary` observation are views
+    of the observation payload and are not copied.
+
+    Node text and function names are stored once in a string table. Use
+    :meth:`text() <compiler_gym.spaces.ProgramlGraph.text>` to look up the
+    text of a node.
+
+    :ivar node_type: An array of node types, one per node.
+    :vartype node_type: np.ndarray
+
+    :ivar node_text: An array of indices into the string table, one per node.
+    :vartype node_text: np.ndarray
+
+    :ivar node_function: An array of function indices, one per node.
+    :vartype node_function: np.ndarray
+
+    :ivar node_block: An array of basic block indices, one per node.
+    :vartype node_block: np.ndarray
+
+    :ivar edge_index: A :code:`(2, num_edges)` array of the source and target
+        node of each edge.
+    :vartype edge_index: np.ndarray
+
+    :ivar edge_flow: An array of edge flow types, one per edge.
+    :vartype edge_flow: np.ndarray
+
+    :ivar edge_position: An array of edge positions, one per edge.
+    :vartype edge_position: np.ndarray
+
+    :ivar function_name: An array of indices into the string table, one per
+        function.
+    :vartype function_name: np.ndarray
+
+    :ivar strings: The string table.
+    :vartype strings: List[str]
+    """
+
+    __slots__ = [
+        "node_type",
+        "node_text",
+        "node_function",
+        "node_block",
+        "edge_index",
+        "edge_flow",
+        "edge_position",
+        "function_name",
+        "strings",
+        "_adjacency",
+    ]
+
+    def __init__(
+        self,
+        node_type: np.ndarray,
+        node_text: np.ndarray,
+        node_function: np.ndarray,
+        node_block: np.ndarray,
+        edge_index: np.ndarray,
+        edge_flow: np.ndarray,
+        edge_position: np.ndarray,
+        function_name: np.ndarray,
+        strings: List[str],
+    ):
+        """Constructor.
+
+        :param node_type: An array of node types.
+        :param node_text: An array of indices into :code:`strings`.
+        :param node_function: An array of function indices.
+        :param node_block: An array of basic block indices.
+        :param edge_index: A :code:`(2, num_edges)` array of source and target
+            node indices.
+        :param edge_flow: An array of edge flow types.
+        :param edge_position: An array of edge positions.
+        :param function_name: An array of indices into :code:`strings`.
+        :param strings: The string table.
+        """
+        self.node_type = node_type
+        self.node_text = node_text
+        self.node_function = node_function
+        self.node_block = node_block
+        self.edge_index = edge_index
+        self.edge_flow = edge_flow
+        self.edge_position = edge_position
+        self.function_name = function_name
+        self.strings = strings
+        self._adjacency: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+
+    @classmethod
+    def from_bytes(cls, data: Union[bytes, memoryview]) -> "ProgramlGraph":
+        """Decode a graph from the flat binary format of the
+        :code:`ProgramlBinary` observation space.
+
+        The arrays of the returned graph are views of :code:`data`.
+
+        :param data: The encoded graph.
+        :return: A graph.
+        """
+        num_nodes, num_edges, num_functions, num_strings, strings_size = (
+            int(x) for x in np.frombuffer(data, dtype="<i8", count=5)
+        )
+        offset = 5 * 8
+
+        def take(count: int) -> np.ndarray:
+            nonlocal offset
+            array = np.frombuffer(data, dtype="<i4", count=count, offset=offset)
+            offset += count * 4
+            return array
+
+        node_arrays = take(4 * num_nodes).reshape(4, num_nodes)
+        edge_arrays = take(4 * num_edges).reshape(4, num_edges)
+        function_name = take(num_functions)
+        string_offsets = take(num_strings + 1)
+        string_table = bytes(data[offset : offset + strings_size])
+
+        return cls(
+            node_type=node_arrays[0],
+            node_text=node_arrays[1],
+            node_function=node_arrays[2],
+            node_block=node_arrays[3],
+            edge_flow=edge_arrays[0],
+            edge_position=edge_arrays[1],
+            edge_index=edge_arrays[2:],
+            function_name=function_name,
+            strings=[
+                string_table[start:end].decode("utf-8")
+                for start, end in zip(string_offsets[:-1], string_offsets[1:])
+            ],
+        )
+
+    @property
+    def num_nodes(self) -> int:
+        """The number of nodes in the graph."""
+        return len(self.node_type)
+
+    @property
+    def num_edges(self) -> int:
+        """The number of edges in the graph."""
+        return len(self.edge_flow)
+
+    def text(self, node: int) -> str:
+        """Return the text of a node.
+
+        :param node: The index of a node.
+        :return: The node text.
+        """
+        return self.strings[self.node_text[node]]
+
+    def adjacency(self, flow: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the adjacency of the graph in compressed sparse row format.
+
+        The successors of node :code:`n` are
+        :code:`indices[indptr[n]:indptr[n + 1]]`. The result is computed on
+        first use and cached.
+
+        :param flow: If set, include only the edges of this flow type.
+        :return: A tuple of :code:`indptr` and :code:`indices` arrays.
+        """
+        key = -1 if flow is None else flow
+        if key not in self._adjacency:
+            sources, targets = self.edge_index
+            if flow is not None:
+                mask = self.edge_flow == flow
+                sources, targets = sources[mask], targets[mask]
+            order = np.argsort(sources, kind="stable")
+            indptr = np.zeros(self.num_nodes + 1, dtype=np.int64)
+            np.cumsum(np.bincount(sources, minlength=self.num_nodes), out=indptr[1:])
+            self._adjacency[key] = (indptr, targets[order])
+        return self._adjacency[key]
+
+    def to_networkx(self) -> nx.MultiDiGraph:
+        """Convert the graph to a networkx graph.
+
+        The node and edge attributes are the same as those of the
+        :code:`Programl` observation space, except that features are not
+        included.
+
+        :return: A networkx graph.
+        """
+        graph = nx.MultiDiGraph()
+        graph.add_nodes_from(
+            (node, {"block": block, "function": function, "text": text, "type": type_})
+            for node, (type_, text, function, block) in enumerate(
+                zip(
+                    self.node_type.tolist(),
+                    [self.strings[t] for t in self.node_text.tolist()],
+                    self.node_function.tolist(),
+                    self.node_block.tolist(),
+                )
+            )
+        )
+        graph.add_edges_from(
+            (source, target, {"flow": flow, "position": position})
+            for source, target, flow, position in zip(
+                *self.edge_index.tolist(),
+                self.edge_flow.tolist(),
+                self.edge_position.tolist(),
+            )
+        )
+        return graph
+
+    @classmethod
+    def concatenate(cls, graphs: Iterable["ProgramlGraph"]) -> "ProgramlGraph":
+        """Concatenate graphs into a single disjoint graph, e.g. for batching.
+
+        The nodes of each graph are numbered after the nodes of the graphs
+        that precede it. String tables are merged.
+
+        :param graphs: The graphs to concatenate.
+        :return: A new graph.
+        :raises ValueError: If no graphs are provided.
+        """
+        graphs = list(graphs)
+        if not graphs:
+            raise ValueError("No graphs to concatenate")
+
+        strings: Dict[str, int] = {}
+        node_text, node_function, edge_index, function_name = [], [], [], []
+        node_offset, function_offset = 0, 0
+        for graph in graphs:
+            string_ids = np.array(
+                [strings.setdefault(s, len(strings)) for s in graph.strings],
+                dtype=np.int32,
+            )
+            node_text.append(string_ids[graph.node_text])
+            node_function.append(graph.node_function + function_offset)
+            edge_index.append(graph.edge_index + node_offset)
+            function_name.append(string_ids[graph.function_name])
+            node_offset += graph.num_nodes
+            function_offset += len(graph.function_name)
+
+        return cls(
+            node_type=np.concatenate([graph.node_type for graph in graphs]),
+            node_text=np.concatenate(node_text),
+            node_function=np.concatenate(node_function),
+            node_block=np.concatenate([graph.node_block for graph in graphs]),
+            edge_index=np.concatenate(edge_index, axis=1),
+            edge_flow=np.concatenate([graph.edge_flow for graph in graphs]),
+            edge_position=np.concatenate([graph.edge_position for graph in graphs]),
+            function_name=np.concatenate(function_name),
+            strings=list(strings),
+        )
+
+    def __len__(self) -> int:
+        return self.num_nodes
+
+    def __repr__(self) -> str:
+        return f"ProgramlGraph(num_nodes={self.num_nodes}, num_edges={self.num_edges})"
+
+    def __eq__(self, rhs) -> bool:
+        if not isinstance(rhs, ProgramlGraph):
+            return False
+        return (
+            self.num_nodes == rhs.num_nodes
+            and self.num_edges == rhs.num_edges
+            and np.array_equal(self.node_type, rhs.node_type)
+            and [self.text(i) for i in range(self.num_nodes)]
+            == [rhs.text(i) for i in range(rhs.num_nodes)]
+            and np.array_equal(self.node_function, rhs.node_function)
+            and np.array_equal(self.node_block, rhs.node_block)
+            and np.array_equal(self.edge_index, rhs.edge_index)
+            and np.array_equal(self.edge_flow, rhs.edge_flow)
+            and np.array_equal(self.edge_position, rhs.edge_position)
+        )
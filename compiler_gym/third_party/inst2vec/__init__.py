@@ -1,5 +1,7 @@
 """This module defines an API for processing LLVM-IR with inst2vec."""
+import functools
 import pickle
+import re
 from typing import List
 
 import numpy as np
@@ -15,6 +17,21 @@ _PICKLED_EMBEDDINGS = runfiles_path(
 )
 
 
+@functools.lru_cache(maxsize=1 << 16)
+def _preprocess_line(line: str) -> str:
+    """Pre-process a single line of IR, returning an empty string if the line
+    does not contain a statement.
+
+    Lines are pre-processed independently of each other, so the result depends
+    only on the line and is memoized.
+    """
+    preprocessed_lines, _ = inst2vec_preprocess.preprocess([[line]])
+    preprocessed_line = preprocessed_lines[0]
+    if not preprocessed_line:
+        return ""
+    return inst2vec_preprocess.PreprocessStatement(preprocessed_line[0])
+
+
 class Inst2vecEncoder(object):
     """An LLVM encoder for inst2vec."""
 
@@ -23,26 +40,26 @@ class Inst2vecEncoder(object):
             self.vocab = pickle.load(f)
 
         with open(str(_PICKLED_EMBEDDINGS), "rb") as f:
-            self.embeddings = pickle.load(f)
+            self.embeddings = np.asarray(pickle.load(f))
 
         self.unknown_vocab_element = self.vocab["!UNK"]
 
     def preprocess(self, ir: str) -> List[str]:
         """Produce a list of pre-processed statements from an IR."""
-        lines = [[x] for x in ir.split("\n")]
         try:
             structs = inst2vec_preprocess.GetStructTypes(ir)
-            for line in lines:
-                for struct, definition in structs.items():
-                    line[0] = line[0].replace(struct, definition)
         except ValueError:
-            pass
+            structs = {}
 
-        preprocessed_lines, _ = inst2vec_preprocess.preprocess(lines)
-        preprocessed_texts = [
-            inst2vec_preprocess.PreprocessStatement(x[0]) if len(x) else ""
-            for x in preprocessed_lines
-        ]
+        # Inline the struct definitions in a single pass. Struct definitions
+        # do not reference other structs, and names are matched in the order
+        # of the dictionary, so this is equivalent to replacing each struct
+        # name in turn.
+        if structs:
+            struct_names = re.compile("|".join(re.escape(s) for s in structs))
+            ir = struct_names.sub(lambda match: structs[match.group(0)], ir)
+
+        preprocessed_texts = [_preprocess_line(line) for line in ir.split("\n")]
         return [x for x in preprocessed_texts if x]
 
     def encode(self, preprocessed: List[str]) -> List[int]:
@@ -54,4 +71,4 @@ class Inst2vecEncoder(object):
 
     def embed(self, encoded: List[int]) -> np.ndarray:
         """Produce a matrix of embeddings from a list of encoded statements."""
-        return np.vstack([self.embeddings[index] for index in encoded])
+        return self.embeddings[np.asarray(encoded, dtype=np.int64)]
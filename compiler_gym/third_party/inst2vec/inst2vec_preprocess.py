@@ -3204,18 +3204,37 @@ def abstract_statements_from_identifiers(G):
     return G
 
 
+# Regular expressions used by PreprocessStatement(), compiled once.
+_LOCAL_ID_RE = re.compile(rgx.local_id)
+_GLOBAL_ID_RE = re.compile(rgx.global_id)
+_LABEL_COMMENT_RE = re.compile(r"; <label>:\d+:?(\s+; preds = )?")
+_LABEL_COMMENT_ID_RE = re.compile(r":\d+")
+_LABEL_RE = re.compile(rgx.local_id_no_perc + r":(\s+; preds = )?")
+_LABEL_ID_RE = re.compile(rgx.local_id_no_perc + ":")
+_ID_TOKEN_RE = re.compile("<%ID>")
+_FLOAT_HEXA_RE = re.compile(rgx.immediate_value_float_hexa)
+_FLOAT_SCI_RE = re.compile(rgx.immediate_value_float_sci)
+_AGGREGATE_ACCESS_RE = re.compile(
+    "<%ID> = (?:extractelement|extractvalue|insertelement|insertvalue)"
+)
+_VECTOR_ACCESS_RE = re.compile("<%ID> = (?:extractelement|insertelement)")
+_INT_RE = re.compile(r"(?<!align)(?<!\[) " + rgx.immediate_value_int)
+_STRING_RE = re.compile(rgx.immediate_value_string)
+_INDEX_TYPE_RE = re.compile(r"i\d+ ")
+
+
 def PreprocessStatement(stmt: str) -> str:
     # Remove local identifiers
-    stmt = re.sub(rgx.local_id, "<%ID>", stmt)
+    stmt = _LOCAL_ID_RE.sub("<%ID>", stmt)
     # Global identifiers
-    stmt = re.sub(rgx.global_id, "<@ID>", stmt)
+    stmt = _GLOBAL_ID_RE.sub("<@ID>", stmt)
     # Remove labels
-    if re.match(r"; <label>:\d+:?(\s+; preds = )?", stmt):
-        stmt = re.sub(r":\d+", ":<LABEL>", stmt)
-        stmt = re.sub("<%ID>", "<LABEL>", stmt)
-    elif re.match(rgx.local_id_no_perc + r":(\s+; preds = )?", stmt):
-        stmt = re.sub(rgx.local_id_no_perc + ":", "<LABEL>:", stmt)
-        stmt = re.sub("<%ID>", "<LABEL>", stmt)
+    if _LABEL_COMMENT_RE.match(stmt):
+        stmt = _LABEL_COMMENT_ID_RE.sub(":<LABEL>", stmt)
+        stmt = _ID_TOKEN_RE.sub("<LABEL>", stmt)
+    elif _LABEL_RE.match(stmt):
+        stmt = _LABEL_ID_RE.sub("<LABEL>:", stmt)
+        stmt = _ID_TOKEN_RE.sub("<LABEL>", stmt)
     if "; preds = " in stmt:
         s = stmt.split("  ")
         if s[-1][0] == " ":
@@ -3224,27 +3243,19 @@ def PreprocessStatement(stmt: str) -> str:
             stmt = s[0] + " " + s[-1]
 
     # Remove floating point values
-    stmt = re.sub(rgx.immediate_value_float_hexa, "<FLOAT>", stmt)
-    stmt = re.sub(rgx.immediate_value_float_sci, "<FLOAT>", stmt)
+    stmt = _FLOAT_HEXA_RE.sub("<FLOAT>", stmt)
+    stmt = _FLOAT_SCI_RE.sub("<FLOAT>", stmt)
 
     # Remove integer values
-    if (
-        re.match("<%ID> = extractelement", stmt) is None
-        and re.match("<%ID> = extractvalue", stmt) is None
-        and re.match("<%ID> = insertelement", stmt) is None
-        and re.match("<%ID> = insertvalue", stmt) is None
-    ):
-        stmt = re.sub(r"(?<!align)(?<!\[) " + rgx.immediate_value_int, " <INT>", stmt)
+    if _AGGREGATE_ACCESS_RE.match(stmt) is None:
+        stmt = _INT_RE.sub(" <INT>", stmt)
 
     # Remove string values
-    stmt = re.sub(rgx.immediate_value_string, " <STRING>", stmt)
+    stmt = _STRING_RE.sub(" <STRING>", stmt)
 
     # Remove index types
-    if (
-        re.match("<%ID> = extractelement", stmt) is not None
-        or re.match("<%ID> = insertelement", stmt) is not None
-    ):
-        stmt = re.sub(r"i\d+ ", "<TYP> ", stmt)
+    if _VECTOR_ACCESS_RE.match(stmt) is not None:
+        stmt = _INDEX_TYPE_RE.sub("<TYP> ", stmt)
 
     return stmt
 
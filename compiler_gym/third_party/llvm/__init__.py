@@ -97,6 +97,11 @@ def llvm_link_path() -> Path:
     return download_llvm_files() / "bin/llvm-link"
 
 
+def llvm_size_path() -> Path:
+    """Return the path of llvm-size."""
+    return download_llvm_files() / "bin/llvm-size"
+
+
 def llvm_stress_path() -> Path:
     """Return the path of llvm-stress."""
     return download_llvm_files() / "bin/llvm-stress"
@@ -10,3 +10,10 @@ DEFINE_string(
 DEFINE_string(port, "0",
               "The port to listen on. If 0, an unused port will be selected. The selected port is "
               "written to <working_dir>/port.txt.");
+DEFINE_int32(ready_fd, -1,
+             "If set, the service writes \"<port> <pid>\\n\" to this file descriptor once it is "
+             "ready to accept connections, then closes it.");
+DEFINE_string(
+    unix_socket, "",
+    "If set, listen on a unix domain socket at this path instead of a TCP port. The --port "
+    "flag is ignored.");
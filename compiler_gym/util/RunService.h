@@ -14,11 +14,13 @@
 
 DECLARE_string(port);
 DECLARE_string(working_dir);
+DECLARE_int32(ready_fd);
+DECLARE_string(unix_socket);
 
 namespace compiler_gym::util {
 
-// Create a service, configured using --port and --working_dir flags, and
-// run it. This function never returns.
+// Create a service, configured using --port, --working_dir, --ready_fd, and
+// --unix_socket flags, and run it. This function never returns.
 //
 // Service must be a subclass of CompilerGymService::Service that implements all
 // RPC endpoints and takes a single-argument working directory constructor:
@@ -44,7 +46,8 @@ int runService(int* argc, char*** argv, const char* usage) {
   FLAGS_log_dir = std::string(FLAGS_working_dir) + "/logs";
   google::InitGoogleLogging((*argv)[0]);
 
-  return createAndRunService<Service>(FLAGS_working_dir, FLAGS_port);
+  return createAndRunService<Service>(FLAGS_working_dir, FLAGS_port, FLAGS_ready_fd,
+                                      FLAGS_unix_socket);
 }
 
 }  // namespace compiler_gym::util
@@ -11,6 +11,7 @@
 #include <sys/types.h>
 #include <unistd.h>
 
+#include <cerrno>
 #include <fstream>
 #include <memory>
 #include <string>
@@ -19,10 +20,36 @@
 
 namespace compiler_gym::util {
 
-// Create a service and run it. This function never returns.
+// Write "<port> <pid>\n" to the given file descriptor and close it. This is
+// used to notify a parent process that the service is ready without it having
+// to poll the filesystem.
+inline void writeReadyMessage(int fd, int port) {
+  const std::string message = std::to_string(port) + " " + std::to_string(getpid()) + "\n";
+  const char* data = message.data();
+  size_t remaining = message.size();
+  while (remaining) {
+    const ssize_t written = write(fd, data, remaining);
+    if (written < 0) {
+      if (errno == EINTR) {
+        continue;
+      }
+      PLOG(ERROR) << "Failed to write to --ready_fd=" << fd;
+      break;
+    }
+    data += written;
+    remaining -= written;
+  }
+  close(fd);
+}
+
+// Create a service and run it. This function never returns. If readyFd is
+// non-negative, the port and process ID are written to it once the service is
+// listening. If unixSocket is non-empty, the service listens on a unix domain
+// socket at that path rather than on requestedPort.
 template <typename Service>
 int createAndRunService(const boost::filesystem::path& workingDirectory,
-                        const std::string& requestedPort) {
+                        const std::string& requestedPort, int readyFd = -1,
+                        const std::string& unixSocket = "") {
   CHECK(boost::filesystem::is_directory(workingDirectory))
       << "Directory not found: " << workingDirectory.string();
   Service service{workingDirectory};
@@ -34,15 +61,23 @@ int createAndRunService(const boost::filesystem::path& workingDirectory,
   // may be larger (e.g., in the case of IR strings).
   builder.SetMaxMessageSize(512 * 1024 * 1024);
 
-  // Start a channel on the port.
+  // Start a channel on the port, or on the unix socket if requested. Local
+  // clients can avoid the overhead of the TCP loopback stack by using a unix
+  // socket.
   int port;
-  std::string serverAddress = "0.0.0.0:" + requestedPort;
+  const std::string serverAddress =
+      unixSocket.empty() ? "0.0.0.0:" + requestedPort : "unix:" + unixSocket;
   builder.AddListeningPort(serverAddress, grpc::InsecureServerCredentials(), &port);
 
   // Start the server.
   std::unique_ptr<grpc::Server> server(builder.BuildAndStart());
   CHECK(server) << "Failed to build RPC service";
 
+  // Notify the parent process first, since it is blocked waiting for it.
+  if (readyFd >= 0) {
+    writeReadyMessage(readyFd, port);
+  }
+
   {
     // Write the port to a <working_dir>/port.txt file, which an external
     // process can read to determine how to get in touch. First write the port
@@ -64,7 +99,9 @@ int createAndRunService(const boost::filesystem::path& workingDirectory,
     out.close();
   }
 
-  LOG(INFO) << "Service " << workingDirectory << " listening on " << port << ", PID = " << getpid();
+  LOG(INFO) << "Service " << workingDirectory << " listening on "
+            << (unixSocket.empty() ? std::to_string(port) : serverAddress)
+            << ", PID = " << getpid();
 
   server->Wait();
   return 0;
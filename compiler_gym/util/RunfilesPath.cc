@@ -41,4 +41,21 @@ fs::path getSiteDataPath(const std::string& relPath) {
   }
 }
 
+fs::path getCachePath(const std::string& relPath) {
+  // This function has a matching implementation in the Python sources,
+  // compiler_gym.util.runfiles_path.cache_path(). Any change to behavior here
+  // must be reflected in the Python version.
+  const char* force = std::getenv("COMPILER_GYM_CACHE");
+  if (force) {
+    return fs::path(force) / relPath;
+  }
+
+  const char* home = std::getenv("HOME");
+  if (home) {
+    return fs::path(home) / ".cache/compiler_gym" / relPath;
+  } else {
+    return fs::path("/tmp/compiler_gym/cache") / relPath;
+  }
+}
+
 }  // namespace compiler_gym::util
@@ -18,4 +18,10 @@ boost::filesystem::path getRunfilesPath(const std::string& relPath);
 // benchmark datasets.
 boost::filesystem::path getSiteDataPath(const std::string& relPath);
 
+// Resolve the path to the cache path.
+//
+// The cache path is used for storing files that can be regenerated if lost,
+// such as precomputed benchmark properties.
+boost::filesystem::path getCachePath(const std::string& relPath);
+
 }  // namespace compiler_gym::util
@@ -89,6 +89,9 @@ def cache_path(relpath: str) -> Path:
 
     :return: An absolute path.
     """
+    # This function has a matching implementation in the C++ sources,
+    # compiler_gym::util::getCachePath(). Any change to behavior here must be
+    # reflected in the C++ version.
     forced = os.environ.get("COMPILER_GYM_CACHE")
     if forced:
         return Path(forced) / relpath
@@ -2,8 +2,13 @@
 #
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
-from compiler_gym.views.observation import ObservationView
+from compiler_gym.views.observation import AsyncObservationView, ObservationView
 from compiler_gym.views.observation_space_spec import ObservationSpaceSpec
 from compiler_gym.views.reward import RewardView
 
-__all__ = ["ObservationView", "ObservationSpaceSpec", "RewardView"]
+__all__ = [
+    "AsyncObservationView",
+    "ObservationView",
+    "ObservationSpaceSpec",
+    "RewardView",
+]
@@ -2,11 +2,16 @@
 #
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
-from typing import Callable, Dict, List
+from typing import Awaitable, Callable, Dict, Iterable, List, Tuple
+
+import numpy as np
 
 from compiler_gym.service import ServiceError, observation_t
 from compiler_gym.service.proto import ObservationSpace, StepReply, StepRequest
-from compiler_gym.views.observation_space_spec import ObservationSpaceSpec
+from compiler_gym.views.observation_space_spec import (
+    ObservationSpaceSpec,
+    release_shared_memory_buffers,
+)
 
 
 class ObservationView(object):
@@ -24,6 +29,13 @@ class ObservationView(object):
     [0, 1, ..., 2]
     >>> observation["Ir"]
     int main() {...}
+
+    Deterministic observations are cached until the environment state changes,
+    so requesting several observations that are derived from the same base
+    observation, such as :code:`InstCount` and :code:`InstCountDict`, fetches
+    the base observation from the service only once. Cached observations are
+    shared between calls, so cached numpy arrays are read-only. Copy an array
+    before modifying it in place.
     """
 
     def __init__(
@@ -34,6 +46,13 @@ class ObservationView(object):
         if not spaces:
             raise ValueError("No observation spaces")
         self.spaces: Dict[str, ObservationSpaceSpec] = {}
+        # A map from the ID of each derived space to the ID of its base space
+        # and the callback that computes the derived observation from it.
+        self._derived_spaces: Dict[
+            str, Tuple[str, Callable[[observation_t], observation_t]]
+        ] = {}
+        # Deterministic observations of the current environment state.
+        self._cache: Dict[str, observation_t] = {}
 
         self._get_observation = get_observation
         self.session_id = -1
@@ -48,17 +67,94 @@ class ObservationView(object):
         :return: An observation.
         :raises KeyError: If the requested observation space does not exist.
         """
-        space = self.spaces[observation_space]
-        request = StepRequest(
-            session_id=self.session_id,
-            observation_space=[space.index],
-        )
-        reply: StepReply = self._get_observation(request)
-        if len(reply.observation) != 1:
-            raise ServiceError(
-                f"Requested 1 observation but received {len(reply.observation)}"
+        return self.get_many([observation_space])[0]
+
+    def get_many(self, observation_spaces: Iterable[str]) -> List[observation_t]:
+        """Request observations from several spaces at once.
+
+        The observations that are not cached are fetched from the service
+        using a single request.
+
+        Example usage:
+
+        >>> autophase, instcount = env.observation.get_many(["Autophase", "InstCount"])
+
+        :param observation_spaces: The observation spaces to query.
+        :return: A list of observations, one for each requested space.
+        :raises KeyError: If a requested observation space does not exist.
+        """
+        observation_spaces = list(observation_spaces)
+        for observation_space in observation_spaces:
+            _ = self.spaces[observation_space]
+
+        # Find the spaces that must be fetched from the service. These are the
+        # spaces that are not derived from another space, and that are not
+        # cached.
+        base_spaces = []
+        for observation_space in observation_spaces:
+            while (
+                observation_space not in self._cache
+                and observation_space in self._derived_spaces
+            ):
+                observation_space = self._derived_spaces[observation_space][0]
+            if observation_space not in self._cache:
+                base_spaces.append(observation_space)
+        base_spaces = list(dict.fromkeys(base_spaces))
+
+        fetched: Dict[str, observation_t] = {}
+        if base_spaces:
+            request = StepRequest(
+                session_id=self.session_id,
+                observation_space=[self.spaces[s].index for s in base_spaces],
             )
-        return space.translate(reply.observation[0])
+            reply: StepReply = self._get_observation(request)
+            try:
+                if len(reply.observation) != len(base_spaces):
+                    raise ServiceError(
+                        f"Requested {len(base_spaces)} observations "
+                        f"but received {len(reply.observation)}"
+                    )
+                for base_space, observation in zip(base_spaces, reply.observation):
+                    fetched[base_space] = self.spaces[base_space].translate(observation)
+            finally:
+                # Delete the shared memory files of any observations that were
+                # not translated, e.g. because of an error.
+                release_shared_memory_buffers(reply.observation)
+
+        return [self._compute(s, fetched) for s in observation_spaces]
+
+    def _compute(
+        self, observation_space: str, fetched: Dict[str, observation_t]
+    ) -> observation_t:
+        """Compute an observation from the cache or from the fetched base
+        observations.
+        """
+        if observation_space in self._cache:
+            return self._cache[observation_space]
+        if observation_space in fetched:
+            observation = fetched[observation_space]
+        else:
+            base_id, translate = self._derived_spaces[observation_space]
+            observation = translate(self._compute(base_id, fetched))
+            # Compute each derived observation only once.
+            fetched[observation_space] = observation
+
+        if self.spaces[observation_space].deterministic:
+            # Prevent in-place modification of a cached array from changing
+            # later observations and the observations derived from it.
+            if isinstance(observation, np.ndarray):
+                observation.setflags(write=False)
+            self._cache[observation_space] = observation
+        return observation
+
+    def invalidate(self) -> None:
+        """Discard the cached observations.
+
+        This must be called whenever the environment state changes, e.g. on
+        :meth:`step() <compiler_gym.envs.CompilerEnv.step>` and :meth:`reset()
+        <compiler_gym.envs.CompilerEnv.reset>`.
+        """
+        self._cache = {}
 
     def _add_space(self, space: ObservationSpaceSpec):
         """Register a new space."""
@@ -98,6 +194,64 @@ class ObservationView(object):
         """
         base_space = self.spaces[base_id]
         self._add_space(base_space.make_derived_space(id=id, **kwargs))
+        self._derived_spaces[id] = (base_id, kwargs["translate"])
 
     def __repr__(self):
         return f"ObservationView[{', '.join(sorted(self.spaces.keys()))}]"
+
+
+class AsyncObservationView(object):
+    """An asyncio view into the available observation spaces of a service.
+
+    This shares the observation spaces of an :class:`ObservationView`, but
+    observations are computed using coroutines.
+
+    Example usage:
+
+    >>> env = AsyncCompilerEnv(gym.make("llvm-v0"))
+    >>> await env.reset()
+    >>> await env.observation["Autophase"]
+    [0, 1, ..., 2]
+    """
+
+    def __init__(
+        self,
+        view: ObservationView,
+        get_observation: Callable[[StepRequest], Awaitable[StepReply]],
+    ):
+        self._view = view
+        self._get_observation = get_observation
+
+    @property
+    def spaces(self) -> Dict[str, ObservationSpaceSpec]:
+        """The available observation spaces."""
+        return self._view.spaces
+
+    def __getitem__(self, observation_space: str) -> Awaitable[observation_t]:
+        """Request an observation from the given space.
+
+        :param observation_space: The observation space to query.
+        :return: An awaitable observation.
+        :raises KeyError: If the requested observation space does not exist.
+        """
+        # Look up the space now so that an invalid name raises immediately,
+        # rather than when the result is awaited.
+        return self._get(self.spaces[observation_space])
+
+    async def _get(self, space: ObservationSpaceSpec) -> observation_t:
+        request = StepRequest(
+            session_id=self._view.session_id,
+            observation_space=[space.index],
+        )
+        reply: StepReply = await self._get_observation(request)
+        try:
+            if len(reply.observation) != 1:
+                raise ServiceError(
+                    f"Requested 1 observation but received {len(reply.observation)}"
+                )
+            return space.translate(reply.observation[0])
+        finally:
+            release_shared_memory_buffers(reply.observation)
+
+    def __repr__(self):
+        return f"AsyncObservationView[{', '.join(sorted(self.spaces.keys()))}]"
@@ -3,20 +3,75 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 import json
-from typing import Callable, Optional, Union
+import mmap
+import os
+from typing import Callable, Iterable, Optional, Union
 
 import networkx as nx
 import numpy as np
 from gym.spaces import Box, Space
 
 from compiler_gym.service import observation_t, scalar_range2tuple
-from compiler_gym.service.proto import Observation, ObservationSpace
+from compiler_gym.service.proto import Observation, ObservationSpace, SharedMemoryBuffer
+from compiler_gym.spaces.programl_graph import ProgramlGraph
 from compiler_gym.spaces.scalar import Scalar
 from compiler_gym.spaces.sequence import Sequence
 
 
+def _read_shared_memory_buffer(buffer: SharedMemoryBuffer) -> memoryview:
+    """Map the payload of a shared memory buffer into memory.
+
+    The backing file is deleted once mapped. The mapping remains valid for as
+    long as the returned memoryview is referenced.
+    """
+    try:
+        if not buffer.length:
+            return memoryview(b"")
+        with open(buffer.path, "rb") as f:
+            mapped = mmap.mmap(
+                f.fileno(), buffer.offset + buffer.length, access=mmap.ACCESS_READ
+            )
+    finally:
+        os.unlink(buffer.path)
+    return memoryview(mapped)[buffer.offset : buffer.offset + buffer.length]
+
+
+def release_shared_memory_buffers(observations: Iterable[Observation]) -> None:
+    """Delete the backing files of the shared memory buffers in a list of
+    observations.
+
+    Translating an observation deletes its file, so this is only required for
+    observations that were not translated, such as when a reply is abandoned
+    because of an error. Files that have already been deleted are ignored.
+    """
+    for observation in observations:
+        if observation.WhichOneof("value") == "shared_memory_buffer":
+            try:
+                os.unlink(observation.shared_memory_buffer.path)
+            except FileNotFoundError:
+                pass
+
+
+def _string_value(observation: Observation) -> str:
+    """Return the string value of an observation, which may be in shared memory."""
+    if observation.WhichOneof("value") == "shared_memory_buffer":
+        return str(
+            _read_shared_memory_buffer(observation.shared_memory_buffer), "utf-8"
+        )
+    return observation.string_value
+
+
+def _binary_value(observation: Observation) -> Union[bytes, memoryview]:
+    """Return the binary value of an observation. If the value is in shared
+    memory, a memoryview of the mapped payload is returned without copying.
+    """
+    if observation.WhichOneof("value") == "shared_memory_buffer":
+        return _read_shared_memory_buffer(observation.shared_memory_buffer)
+    return observation.binary_value
+
+
 def _json2nx(observation):
-    json_data = json.loads(observation.string_value)
+    json_data = json.loads(_string_value(observation))
     return nx.readwrite.json_graph.node_link_graph(
         json_data, multigraph=True, directed=True
     )
@@ -123,7 +178,9 @@ class ObservationSpaceSpec(object):
 
             def translate(observation):
                 return nx.readwrite.json_graph.node_link_graph(
-                    json.loads(observation.string_value), multigraph=True, directed=True
+                    json.loads(_string_value(observation)),
+                    multigraph=True,
+                    directed=True,
                 )
 
             def to_string(observation):
@@ -131,11 +188,19 @@ class ObservationSpaceSpec(object):
                     nx.readwrite.json_graph.node_link_data(observation), indent=2
                 )
 
+        elif proto.opaque_data_format == "programl://binary":
+            space = make_seq(proto.binary_size_range, bytes, (0, None))
+
+            def translate(observation):
+                return ProgramlGraph.from_bytes(_binary_value(observation))
+
+            to_string = str
+
         elif proto.opaque_data_format == "json://":
             space = make_seq(proto.string_size_range, str, (0, None))
 
             def translate(observation):
-                return json.loads(observation.string_value)
+                return json.loads(_string_value(observation))
 
             def to_string(observation):
                 return json.dumps(observation, indent=2)
@@ -164,14 +229,14 @@ class ObservationSpaceSpec(object):
             space = make_seq(proto.string_size_range, str, (0, None))
 
             def translate(observation):
-                return observation.string_value
+                return _string_value(observation)
 
             to_string = str
         elif shape_type == "binary_size_range":
             space = make_seq(proto.binary_size_range, bytes, (0, None))
 
             def translate(observation):
-                return observation.binary_value
+                return _binary_value(observation)
 
             to_string = str
         elif shape_type == "scalar_int64_range":
@@ -3,7 +3,7 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 import warnings
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional, Set
 
 from compiler_gym.spaces.reward import Reward
 from compiler_gym.views.observation import ObservationView
@@ -23,6 +23,22 @@ class RewardView(object):
 
     :ivar spaces: Specifications of available reward spaces.
     :vartype spaces: Dict[str, Reward]
+
+    :ivar service_side_spaces: The reward spaces that have been computed by the
+        compiler service during the current episode. The service holds the
+        state of these spaces, so they are computed using
+        :code:`get_service_reward` for the rest of the episode.
+    :vartype service_side_spaces: Set[str]
+
+    :ivar client_side_spaces: The reward spaces that have been computed by this
+        view during the current episode. The state of these spaces in the
+        compiler service is out of date, so they must not be computed by the
+        service for the rest of the episode.
+    :vartype client_side_spaces: Set[str]
+
+    :ivar get_service_reward: A callback that returns the reward of a
+        service-side reward space for the current state.
+    :vartype get_service_reward: Optional[Callable[[str], float]]
     """
 
     def __init__(
@@ -32,6 +48,9 @@ class RewardView(object):
     ):
         self.spaces: Dict[str, Reward] = {}
         self.previous_action = None
+        self.service_side_spaces: Set[str] = set()
+        self.client_side_spaces: Set[str] = set()
+        self.get_service_reward: Optional[Callable[[str], float]] = None
         self._observation_view = observation_view
 
         for space in spaces:
@@ -50,7 +69,10 @@ class RewardView(object):
         if not self.spaces:
             raise ValueError("No reward spaces")
         space = self.spaces[reward_space]
-        observations = [self._observation_view[obs] for obs in space.observation_spaces]
+        if reward_space in self.service_side_spaces:
+            return self.get_service_reward(reward_space)
+        self.client_side_spaces.add(reward_space)
+        observations = self._observation_view.get_many(space.observation_spaces)
         return space.update(self.previous_action, observations, self._observation_view)
 
     def reset(self, benchmark: str) -> None:
@@ -61,6 +83,8 @@ class RewardView(object):
             episode.
         """
         self.previous_action = None
+        self.service_side_spaces.clear()
+        self.client_side_spaces.clear()
         for space in self.spaces.values():
             space.reset(benchmark=benchmark)
 
@@ -154,9 +154,11 @@ class BruteForceWorker(Thread):
     def run_one_episode(self, actions: List[int]) -> List[float]:
         """Evaluate the reward of every action in a list."""
         self.env.reset()
+        # Submit all of the steps up front so that they run back to back.
+        futures = [self.env.step_async(action) for action in actions]
         rewards = []
-        for action in actions:
-            _, reward, done, _ = self.env.step(action)
+        for future in futures:
+            _, reward, done, _ = future.result()
             rewards.append(reward)
             if done:
                 break
@@ -6,6 +6,7 @@
 # LICENSE file in the root directory of this source tree.
 """An example CompilerGym service in python."""
 import logging
+import os
 from concurrent import futures
 from multiprocessing import cpu_count
 from pathlib import Path
@@ -26,6 +27,17 @@ flags.DEFINE_string(
 flags.DEFINE_integer("port", 0, "The service listening port")
 flags.DEFINE_integer("nproc", cpu_count(), "The number of server worker threads")
 flags.DEFINE_integer("logbuflevel", 0, "Flag for compatability with C++ service.")
+flags.DEFINE_string(
+    "unix_socket",
+    "",
+    "If set, listen on a unix domain socket at this path instead of a TCP port.",
+)
+flags.DEFINE_integer(
+    "ready_fd",
+    -1,
+    "If set, write the port and PID to this file descriptor once the service "
+    "is ready.",
+)
 FLAGS = flags.FLAGS
 
 # For development / debugging, set environment variable COMPILER_GYM_DEBUG=3.
@@ -221,13 +233,21 @@ def main(argv):
     compiler_gym_service_pb2_grpc.add_CompilerGymServiceServicer_to_server(
         ExampleCompilerGymService(working_dir), server
     )
-    port = server.add_insecure_port("0.0.0.0:0")
+    if FLAGS.unix_socket:
+        port = server.add_insecure_port(f"unix:{FLAGS.unix_socket}")
+    else:
+        port = server.add_insecure_port("0.0.0.0:0")
     logging.info("Starting service on %s with working dir %s", port, working_dir)
 
     with open(working_dir / "port.txt", "w") as f:
         f.write(str(port))
 
     server.start()
+
+    if FLAGS.ready_fd >= 0:
+        with os.fdopen(FLAGS.ready_fd, "w") as f:
+            f.write(f"{port} {os.getpid()}\n")
+
     server.wait_for_termination()
 
 
@@ -16,7 +16,6 @@ Example usage:
 
 Use --help to list the configurable options.
 """
-import hashlib
 import math
 from enum import IntEnum
 from heapq import nlargest
@@ -90,6 +89,12 @@ class CustomEnv:
     def reset(self):
         self._env.reset()
 
+    def snapshot(self):
+        return self._env.snapshot()
+
+    def restore(self, snapshot):
+        self._env.restore(snapshot)
+
     def close(self):
         self._env.close()
 
@@ -185,30 +190,26 @@ class StateGraph:
 
 
 def env_to_fingerprint(env):
-    # TODO: There is some sort of state in the env that is not
-    # captured by this. Figure out what it is and fix it. Also
-    # consider adding a fingerprint observation to env.
-    if False:
-        # BitcodeFile is slower, so using Ir instead.
-        path = env.observation["BitcodeFile"]
-        with open(path, "rb") as f:
-            data = f.read()
-    else:
-        data = env.observation["Ir"].encode()
-
-    return hashlib.sha256(data).digest()
+    # The module hash is computed by the service, which is much cheaper than
+    # retrieving and hashing the full IR.
+    return env.observation["ModuleHash"]
 
 
 def compute_edges(env, sequence):
+    # Replay the sequence once, then snapshot the state so that each action
+    # can be tried from it without replaying the sequence again.
+    env.reset()
+    sequence_reward_sum = 0.0
+    for action in sequence:
+        _, reward, _, _ = env.step(action)
+        sequence_reward_sum += reward
+    snapshot = env.snapshot()
+
     edges = []
     for action in env.actions():
-        env.reset()
-        reward_sum = 0.0
-        for action in sequence + [action]:
-            _, reward, _, _ = env.step(action)
-            reward_sum += reward
-
-        edges.append((env_to_fingerprint(env), reward_sum))
+        env.restore(snapshot)
+        _, reward, _, _ = env.step(action)
+        edges.append((env_to_fingerprint(env), sequence_reward_sum + reward))
     return edges
 
 
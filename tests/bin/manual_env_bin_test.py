@@ -348,6 +348,17 @@ compilergym:cBench-v[0-9]+/adpcm>    Depth | Action   | Effect   | Done   |   Re
     )
 
 
+def test_hill_climb_without_snapshots(monkeypatch, cBench_dataset):
+    """Environments that do not support snapshots rerun the stack instead."""
+
+    def snapshot(self):
+        del self  # unused
+        raise NotImplementedError("SnapshotSession is not implemented")
+
+    monkeypatch.setattr("compiler_gym.envs.CompilerEnv.snapshot", snapshot)
+    test_hill_climb(monkeypatch, cBench_dataset)
+
+
 def test_greedy(cBench_dataset):
     del cBench_dataset  # unused
     io_check(
@@ -0,0 +1,112 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Tests for AsyncCompilerEnv."""
+import asyncio
+
+import gym
+import pytest
+
+from compiler_gym.envs import AsyncCompilerEnv, LlvmEnv
+from tests.test_main import main
+
+pytest_plugins = ["tests.pytest_plugins.llvm"]
+
+
+def run(coroutine):
+    """Run a coroutine to completion on a new event loop."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_async_step_matches_step(env: LlvmEnv):
+    env.observation_space = "IrInstructionCount"
+    env.reward_space = "IrInstructionCount"
+    env.reset("cBench-v1/crc32")
+    action = env.action_space.flags.index("-mem2reg")
+    expected_observation, expected_reward, _, _ = env.step(action)
+
+    async def test():
+        aenv = AsyncCompilerEnv(gym.make("llvm-v0"))
+        try:
+            aenv.env.observation_space = "IrInstructionCount"
+            aenv.env.reward_space = "IrInstructionCount"
+            await aenv.reset("cBench-v1/crc32")
+            observation, reward, done, info = await aenv.step(action)
+            assert not done, info
+            assert observation == expected_observation
+            assert reward == expected_reward
+            assert aenv.actions == [action]
+            assert await aenv.observation["IrInstructionCount"] == observation
+        finally:
+            await aenv.close()
+
+    run(test())
+
+
+def test_async_observation_invalid_space(env: LlvmEnv):
+    async def test():
+        aenv = AsyncCompilerEnv(env)
+        try:
+            await aenv.reset("cBench-v1/crc32")
+            with pytest.raises(KeyError):
+                aenv.observation["invalid"]
+        finally:
+            await aenv.close()
+
+    run(test())
+
+
+def test_async_fork(env: LlvmEnv):
+    async def test():
+        async with AsyncCompilerEnv(env) as aenv:
+            await aenv.reset("cBench-v1/crc32")
+            await aenv.step(0)
+
+            fkd = await aenv.fork()
+            try:
+                assert fkd.actions == [0]
+                assert (await fkd.observation["Ir"]) == (await aenv.observation["Ir"])
+                _, _, done, info = await fkd.step(1)
+                assert not done, info
+                assert aenv.actions == [0]
+            finally:
+                await fkd.close()
+
+            # Closing the fork leaves the parent's service running.
+            _, _, done, info = await aenv.step(1)
+            assert not done, info
+
+    run(test())
+
+
+def test_concurrent_episodes():
+    """Test running many episodes concurrently from a single event loop."""
+
+    async def run_episode(aenv: AsyncCompilerEnv):
+        await aenv.reset("cBench-v1/crc32")
+        for action in range(5):
+            _, _, done, info = await aenv.step(action)
+            assert not done, info
+        return await aenv.observation["IrInstructionCount"]
+
+    async def test():
+        root = AsyncCompilerEnv(gym.make("llvm-v0"))
+        await root.reset("cBench-v1/crc32")
+        aenvs = [await root.fork() for _ in range(4)]
+        try:
+            counts = await asyncio.gather(*[run_episode(e) for e in aenvs])
+            assert len(set(counts)) == 1
+        finally:
+            await asyncio.gather(*[e.close() for e in aenvs])
+            await root.close()
+
+    run(test())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Tests for the on-disk cache of LLVM baseline costs."""
+from pathlib import Path
+
+import gym
+import numpy as np
+import pytest
+
+from compiler_gym.envs import LlvmEnv
+from compiler_gym.util.runfiles_path import cache_path
+from tests.test_main import main
+
+BASELINE_SPACES = [
+    "IrInstructionCountO0",
+    "IrInstructionCountO3",
+    "IrInstructionCountOz",
+    "ObjectTextSizeO0",
+    "ObjectTextSizeO3",
+    "ObjectTextSizeOz",
+]
+
+
+@pytest.fixture(scope="function")
+def cache_dir(tmp_path: Path, monkeypatch) -> Path:
+    """Use a private cache directory for the client and for the services that
+    it starts, and return the baseline costs cache directory.
+    """
+    monkeypatch.setenv("COMPILER_GYM_CACHE", str(tmp_path))
+    return cache_path("llvm-v0/baseline-costs")
+
+
+@pytest.fixture(scope="function")
+def env(cache_dir: Path) -> LlvmEnv:
+    """An LLVM environment whose service uses the private cache directory."""
+    del cache_dir  # The environment must be created after the cache is set.
+    env = gym.make("llvm-v0")
+    try:
+        yield env
+    finally:
+        env.close()
+
+
+def get_baseline_costs(benchmark: str):
+    env = gym.make("llvm-v0")
+    try:
+        env.reset(benchmark)
+        return [env.observation[space] for space in BASELINE_SPACES]
+    finally:
+        env.close()
+
+
+def test_baseline_costs_are_written_to_cache(env: LlvmEnv, cache_dir: Path):
+    env.reset("cBench-v1/crc32")
+    expected = [env.observation[space] for space in BASELINE_SPACES]
+
+    entries = list(cache_dir.glob("*/*.bin"))
+    assert len(entries) == 1
+
+    # A new service reads the costs from the cache.
+    assert get_baseline_costs("cBench-v1/crc32") == expected
+
+
+def test_truncated_cache_entry_is_recomputed(env: LlvmEnv, cache_dir: Path):
+    env.reset("cBench-v1/crc32")
+    expected = [env.observation[space] for space in BASELINE_SPACES]
+    (entry,) = list(cache_dir.glob("*/*.bin"))
+    size = entry.stat().st_size
+    with open(entry, "r+b") as f:
+        f.truncate(3)
+
+    assert get_baseline_costs("cBench-v1/crc32") == expected
+    assert entry.stat().st_size == size
+
+
+def test_baseline_costs_are_computed_lazily(env: LlvmEnv, cache_dir: Path):
+    env.reset("cBench-v1/crc32")
+    assert not list(cache_dir.glob("*/*.bin"))
+
+    env.observation["IrInstructionCountOz"]
+    (entry,) = list(cache_dir.glob("*/*.bin"))
+    # Costs that have not been computed are stored as NaN.
+    costs = np.fromfile(entry, dtype=np.float64)
+    assert np.count_nonzero(~np.isnan(costs)) == 1
+
+
+if __name__ == "__main__":
+    main()
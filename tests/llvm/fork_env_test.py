@@ -267,5 +267,45 @@ def test_fork_previous_cost_lazy_reward_update(env: LlvmEnv):
         fkd.close()
 
 
+def test_fork_of_fork_observations_are_equal(env: LlvmEnv):
+    """Test that forks of an unmodified fork observe the same module."""
+    env.reset("cBench-v1/crc32")
+    env.step(env.action_space.flags.index("-mem2reg"))
+
+    a = env.fork()
+    try:
+        b = a.fork()
+        try:
+            assert a.observation["Ir"] == env.observation["Ir"]
+            assert b.observation["Ir"] == env.observation["Ir"]
+            assert (
+                b.observation["IrInstructionCount"]
+                == env.observation["IrInstructionCount"]
+            )
+        finally:
+            b.close()
+    finally:
+        a.close()
+
+
+def test_fork_is_independent_of_parent_steps(env: LlvmEnv):
+    """Test that stepping the parent after a fork does not modify the fork."""
+    env.reset("cBench-v1/crc32")
+    ir = env.ir
+
+    fkd = env.fork()
+    try:
+        env.step(env.action_space.flags.index("-mem2reg"))
+        assert env.ir != ir
+        assert fkd.ir == ir
+
+        _, _, done, info = fkd.step(fkd.action_space.flags.index("-mem2reg"))
+        assert not done
+        assert not info["action_had_no_effect"]
+        assert fkd.ir == env.ir
+    finally:
+        fkd.close()
+
+
 if __name__ == "__main__":
     main()
@@ -8,6 +8,7 @@ from pathlib import Path
 from typing import List
 
 import gym
+import numpy as np
 import pytest
 
 import compiler_gym
@@ -323,5 +324,79 @@ def test_step_multiple_actions_generator(env: LlvmEnv):
     ]
 
 
+def test_step_deduplicates_observation_spaces(env: LlvmEnv, monkeypatch):
+    """The observation space and reward space share an observation."""
+    env.observation_space = "IrInstructionCount"
+    env.reward_space = "IrInstructionCount"
+    env.reset(benchmark="cBench-v1/crc32")
+    # The first step of an episode also requests the initial cost.
+    previous_count, _, done, info = env.step(env.action_space.flags.index("-mem2reg"))
+    assert not done, info
+
+    # Record the requests made to the service.
+    requests = []
+    call = type(env.service).__call__
+
+    def record_call(service, stub_method, request, *args, **kwargs):
+        requests.append(request)
+        return call(service, stub_method, request, *args, **kwargs)
+
+    monkeypatch.setattr(type(env.service), "__call__", record_call)
+    observation, reward, done, info = env.step(
+        env.action_space.flags.index("-instcombine")
+    )
+    monkeypatch.undo()
+
+    assert not done, info
+    # A single step request is made, which requests the shared observation
+    # only once.
+    assert len(requests) == 1
+    assert list(requests[0].observation_space) == [
+        env.observation.spaces["IrInstructionCount"].index
+    ]
+    assert observation == env.observation["IrInstructionCount"]
+    assert reward == previous_count - observation
+
+
+def test_observation_is_recomputed_after_module_changes(env: LlvmEnv):
+    """Memoized observations are discarded when an action changes the module."""
+    env.reset(benchmark="cBench-v1/crc32")
+    before = env.observation["IrInstructionCount"]
+    assert env.observation["IrInstructionCount"] == before
+
+    _, _, done, info = env.step(env.action_space.flags.index("-mem2reg"))
+    assert not done, info
+    assert not info["action_had_no_effect"]
+    assert env.observation["IrInstructionCount"] < before
+
+
+def test_cached_array_observation_is_recomputed_after_step(env: LlvmEnv):
+    """A cached array is reused only until a step changes the module."""
+    env.reset(benchmark="cBench-v1/crc32")
+    before = env.observation["Autophase"]
+    assert env.observation["Autophase"] is before
+
+    _, _, done, info = env.step(env.action_space.flags.index("-mem2reg"))
+    assert not done, info
+    assert not info["action_had_no_effect"]
+    after = env.observation["Autophase"]
+    assert after is not before
+    assert not np.array_equal(after, before)
+    assert env.observation["Autophase"] is after
+
+
+def test_multiple_actions_had_effect_if_any_action_had_effect(env: LlvmEnv):
+    """The last action has no effect, but the first action does."""
+    env.reset(benchmark="cBench-v1/crc32")
+    mem2reg = env.action_space.flags.index("-mem2reg")
+    _, _, done, info = env.step([mem2reg, mem2reg])
+    assert not done, info
+    assert not info["action_had_no_effect"]
+
+    _, _, done, info = env.step(mem2reg)
+    assert not done, info
+    assert info["action_had_no_effect"]
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,68 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Regression tests for the ObjectTextSizeBytes observation space."""
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from compiler_gym.envs import LlvmEnv
+from tests.test_main import main
+
+pytest_plugins = ["tests.pytest_plugins.common", "tests.pytest_plugins.llvm"]
+
+
+def clang_object_text_size(ir: str, clang: Path, llvm_size: Path) -> int:
+    """Compute the .text size of an IR module using `clang -c` and
+    `llvm-size` in the current directory.
+    """
+    subprocess.run(
+        [str(clang), "-w", "-xir", "-", "-o", "module.o", "-c"],
+        input=ir,
+        universal_newlines=True,
+        check=True,
+        timeout=300,
+    )
+    output = subprocess.check_output(
+        [str(llvm_size), "module.o"], universal_newlines=True, timeout=60
+    )
+    # The output of llvm-size is in berkeley format, the first column of the
+    # second line is the text size:
+    #
+    #     text    data    bss     dec     hex filename
+    #     1183       8      0    1191     4a7 module.o
+    return int(output.split("\n")[1].split()[0])
+
+
+@pytest.mark.parametrize(
+    "benchmark_name",
+    [
+        "cBench-v1/crc32",
+        "cBench-v1/blowfish",
+        "cBench-v1/dijkstra",
+        "cBench-v1/qsort",
+    ],
+)
+def test_object_text_size_matches_clang(
+    env: LlvmEnv, benchmark_name: str, clang: Path, llvm_size: Path, tmpwd: Path
+):
+    """Test that the in-process .text size matches the size of an object file
+    compiled by clang, before and after optimization.
+    """
+    del tmpwd  # The object files are written to the working directory.
+    env.reset(benchmark_name)
+    assert env.observation["ObjectTextSizeBytes"] == clang_object_text_size(
+        env.observation["Ir"], clang, llvm_size
+    )
+
+    for flag in ["-mem2reg", "-instcombine", "-simplifycfg", "-inline"]:
+        env.step(env.action_space.flags.index(flag))
+    assert env.observation["ObjectTextSizeBytes"] == clang_object_text_size(
+        env.observation["Ir"], clang, llvm_size
+    )
+
+
+if __name__ == "__main__":
+    main()
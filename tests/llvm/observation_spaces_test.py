@@ -7,6 +7,7 @@ import os
 import sys
 from typing import Any, Dict, List
 
+import gym
 import networkx as nx
 import numpy as np
 import pytest
@@ -14,7 +15,9 @@ from gym.spaces import Box
 from gym.spaces import Dict as DictSpace
 
 from compiler_gym.envs.llvm.llvm_env import LlvmEnv
-from compiler_gym.spaces import Scalar, Sequence
+from compiler_gym.service import ConnectionOpts
+from compiler_gym.service.proto import StepRequest
+from compiler_gym.spaces import ProgramlGraph, Scalar, Sequence
 from tests.test_main import main
 
 pytest_plugins = ["tests.pytest_plugins.llvm"]
@@ -58,6 +61,8 @@ def test_observation_spaces(env: LlvmEnv):
         "ObjectTextSizeO0",
         "ObjectTextSizeO3",
         "ObjectTextSizeOz",
+        "ModuleHash",
+        "ProgramlBinary",
     }
 
 
@@ -362,6 +367,61 @@ def test_programl_observation_space(env: LlvmEnv):
     assert not space.platform_dependent
 
 
+def test_programl_binary_observation_space(env: LlvmEnv):
+    env.reset("cBench-v1/crc32")
+    key = "ProgramlBinary"
+    space = env.observation.spaces[key]
+    assert isinstance(space.space, Sequence)
+    assert space.deterministic
+    assert not space.platform_dependent
+
+    graph: ProgramlGraph = env.observation[key]
+    assert isinstance(graph, ProgramlGraph)
+    assert graph.num_nodes == 512
+    assert graph.num_edges == 907
+    assert graph.text(0) == "[external]"
+
+    # The binary graph matches the networkx graph, without features.
+    expected: nx.MultiDiGraph = env.observation["Programl"]
+    actual = graph.to_networkx()
+    for i in range(graph.num_nodes):
+        data = dict(expected.nodes[i])
+        data.pop("features", None)
+        assert actual.nodes[i] == data
+
+    def edge_set(g: nx.MultiDiGraph):
+        return sorted(
+            (u, v, d["flow"], d["position"]) for u, v, d in g.edges(data=True)
+        )
+
+    assert edge_set(actual) == edge_set(expected)
+
+
+def test_module_hash_observation_space(env: LlvmEnv):
+    env.reset("cBench-v1/crc32")
+    key = "ModuleHash"
+    space = env.observation.spaces[key]
+    assert isinstance(space.space, Sequence)
+    assert space.space.dtype == str
+    assert space.space.size_range == (40, 40)
+    assert space.deterministic
+    assert not space.platform_dependent
+
+    value: str = env.observation[key]
+    print(value)  # For debugging in case of error.
+    assert isinstance(value, str)
+    assert len(value) == 40
+    int(value, 16)  # Check that the value is hexadecimal.
+
+    # The hash changes when the module changes.
+    env.step(env.action_space.flags.index("-mem2reg"))
+    assert env.observation[key] != value
+
+    # Equal modules have equal hashes.
+    env.reset("cBench-v1/crc32")
+    assert env.observation[key] == value
+
+
 def test_cpuinfo_observation_space(env: LlvmEnv):
     env.reset("cBench-v1/crc32")
     key = "CpuInfo"
@@ -1131,5 +1191,58 @@ def test_object_text_size_observation_spaces(env: LlvmEnv):
     assert value == crc32_code_sizes[sys.platform][2]
 
 
+def test_shared_memory_observations(env: LlvmEnv):
+    """Test that observations returned through shared memory are identical to
+    those returned in RPC replies.
+    """
+    env.reset("cBench-v1/crc32")
+    shm_env = gym.make(
+        "llvm-v0", connection_settings=ConnectionOpts(shared_memory_observations=True)
+    )
+    try:
+        shm_env.reset("cBench-v1/crc32")
+        assert shm_env.observation["Ir"] == env.observation["Ir"]
+        assert nx.is_isomorphic(
+            shm_env.observation["Programl"], env.observation["Programl"]
+        )
+
+        # The client removes each shared memory file once it is mapped.
+        working_dir = shm_env.service.connection.working_dir
+        assert not list(working_dir.glob("observation-*.bin"))
+    finally:
+        shm_env.close()
+
+
+def test_unclaimed_shared_memory_observations_are_deleted():
+    """Test that the service deletes the shared memory files of replies that the
+    client never read when the session ends.
+    """
+    shm_env = gym.make(
+        "llvm-v0", connection_settings=ConnectionOpts(shared_memory_observations=True)
+    )
+    try:
+        shm_env.reset("cBench-v1/crc32")
+        working_dir = shm_env.service.connection.working_dir
+        fkd = shm_env.fork()
+        try:
+            # Request an observation and abandon the reply, as would happen if
+            # the client failed before translating it.
+            reply = fkd.service(
+                fkd.service.stub.Step,
+                StepRequest(
+                    session_id=fkd._session_id,
+                    observation_space=[fkd.observation.spaces["Ir"].index],
+                ),
+            )
+            assert reply.observation[0].WhichOneof("value") == "shared_memory_buffer"
+            assert list(working_dir.glob("observation-*.bin"))
+        finally:
+            fkd.close()
+
+        assert not list(working_dir.glob("observation-*.bin"))
+    finally:
+        shm_env.close()
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,69 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Tests for running a sequence of actions as a single pipeline."""
+from compiler_gym.envs import LlvmEnv
+from tests.test_main import main
+
+pytest_plugins = ["tests.pytest_plugins.llvm"]
+
+
+def test_pipeline_step_records_actions(env: LlvmEnv):
+    env.reset("cBench-v1/crc32")
+    actions = [env.action_space.flags.index(f) for f in ["-mem2reg", "-simplifycfg"]]
+
+    _, _, done, info = env.step(actions, pipeline=True)
+    assert not done
+    assert not info["action_had_no_effect"]
+    assert env.actions == actions
+
+
+def test_pipeline_step_single_action_matches_step(env: LlvmEnv):
+    env.reset("cBench-v1/crc32")
+    action = env.action_space.flags.index("-mem2reg")
+
+    fkd = env.fork()
+    try:
+        env.step(action)
+        fkd.step([action], pipeline=True)
+        assert env.ir == fkd.ir
+    finally:
+        fkd.close()
+
+
+def test_pipeline_step_module_passes_match_step(env: LlvmEnv):
+    """Module passes are not interleaved, so a pipeline of them produces the
+    same result as running them one at a time."""
+    env.reset("cBench-v1/crc32")
+    actions = [
+        env.action_space.flags.index(f)
+        for f in ["-globalopt", "-ipsccp", "-globaldce", "-constmerge"]
+    ]
+
+    fkd = env.fork()
+    try:
+        env.step(actions)
+        fkd.step(actions, pipeline=True)
+        assert env.ir == fkd.ir
+    finally:
+        fkd.close()
+
+
+def test_apply_pipeline(env: LlvmEnv):
+    env.reset("cBench-v1/crc32")
+    env.step([env.action_space.flags.index(f) for f in ["-mem2reg", "-gvn"]])
+    state = env.state
+
+    fkd = env.fork()
+    try:
+        fkd.reset()
+        fkd.apply(state, pipeline=True)
+        assert fkd.actions == env.actions
+        assert fkd.observation["IrInstructionCount"] > 0
+    finally:
+        fkd.close()
+
+
+if __name__ == "__main__":
+    main()
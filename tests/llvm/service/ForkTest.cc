@@ -0,0 +1,82 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+//
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+#include <gtest/gtest.h>
+
+#include <boost/filesystem.hpp>
+#include <memory>
+
+#include "compiler_gym/envs/llvm/service/Benchmark.h"
+#include "compiler_gym/envs/llvm/service/BenchmarkFactory.h"
+#include "compiler_gym/envs/llvm/service/LlvmSession.h"
+#include "compiler_gym/util/GrpcStatusMacros.h"
+#include "compiler_gym/util/RunfilesPath.h"
+#include "glog/logging.h"
+#include "tests/TestMacros.h"
+
+using namespace ::testing;
+
+namespace fs = boost::filesystem;
+
+namespace compiler_gym::llvm_service {
+namespace {
+
+class ForkTest : public ::testing::Test {
+ public:
+  void SetUp() {
+    workingDirectory_ = fs::temp_directory_path() / fs::unique_path();
+    fs::create_directory(workingDirectory_);
+
+    const auto blowfish =
+        util::getRunfilesPath("compiler_gym/third_party/cBench/cBench-v1/blowfish.bc");
+    BenchmarkFactory factory(workingDirectory_);
+    ASSERT_OK(factory.addBitcodeFile("benchmark://cBench-v1/blowfish", blowfish));
+    std::unique_ptr<Benchmark> benchmark;
+    ASSERT_OK(factory.getBenchmark("benchmark://cBench-v1/blowfish", &benchmark));
+    session_ = std::make_unique<LlvmSession>(std::move(benchmark), LlvmActionSpace::PASSES_ALL,
+                                             workingDirectory_);
+  }
+
+  void TearDown() {
+    session_.reset();
+    fs::remove_all(workingDirectory_);
+  }
+
+ protected:
+  fs::path workingDirectory_;
+  std::unique_ptr<LlvmSession> session_;
+};
+
+TEST_F(ForkTest, forkReusesCachedObservation) {
+  Observation expected;
+  ASSERT_OK(session_->getObservation(LlvmObservationSpace::IR, &expected));
+
+  const auto fkd = session_->fork();
+  Observation actual;
+  ASSERT_OK(fkd->getObservation(LlvmObservationSpace::IR, &actual));
+
+  EXPECT_EQ(actual.string_value(), expected.string_value());
+  // The fork parses its module only when it is needed, so the observation was
+  // served from the cache rather than recomputed.
+  EXPECT_FALSE(fkd->benchmark().materialized());
+}
+
+TEST_F(ForkTest, forkRecomputesObservationAfterModuleChanges) {
+  Observation before;
+  ASSERT_OK(session_->getObservation(LlvmObservationSpace::IR_INSTRUCTION_COUNT, &before));
+
+  const auto fkd = session_->fork();
+  ASSERT_OK(fkd->runPassPipeline("function(mem2reg)"));
+  Observation after;
+  ASSERT_OK(fkd->getObservation(LlvmObservationSpace::IR_INSTRUCTION_COUNT, &after));
+
+  EXPECT_LT(after.scalar_int64(), before.scalar_int64());
+  // The parent's cached observation is unchanged.
+  Observation parent;
+  ASSERT_OK(session_->getObservation(LlvmObservationSpace::IR_INSTRUCTION_COUNT, &parent));
+  EXPECT_EQ(parent.scalar_int64(), before.scalar_int64());
+}
+
+}  // anonymous namespace
+}  // namespace compiler_gym::llvm_service
@@ -0,0 +1,81 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+//
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+#include <gtest/gtest.h>
+
+#include <boost/filesystem.hpp>
+#include <memory>
+
+#include "compiler_gym/envs/llvm/service/Benchmark.h"
+#include "compiler_gym/envs/llvm/service/BenchmarkFactory.h"
+#include "compiler_gym/envs/llvm/service/LlvmSession.h"
+#include "compiler_gym/util/GrpcStatusMacros.h"
+#include "compiler_gym/util/RunfilesPath.h"
+#include "glog/logging.h"
+#include "llvm/IR/Verifier.h"
+#include "llvm/Support/raw_ostream.h"
+#include "tests/TestMacros.h"
+
+using namespace ::testing;
+
+namespace fs = boost::filesystem;
+
+namespace compiler_gym::llvm_service {
+namespace {
+
+class PassPipelineTest : public ::testing::Test {
+ public:
+  void SetUp() {
+    workingDirectory_ = fs::temp_directory_path() / fs::unique_path();
+    fs::create_directory(workingDirectory_);
+
+    const auto blowfish =
+        util::getRunfilesPath("compiler_gym/third_party/cBench/cBench-v1/blowfish.bc");
+    BenchmarkFactory factory(workingDirectory_);
+    ASSERT_OK(factory.addBitcodeFile("benchmark://cBench-v1/blowfish", blowfish));
+    std::unique_ptr<Benchmark> benchmark;
+    ASSERT_OK(factory.getBenchmark("benchmark://cBench-v1/blowfish", &benchmark));
+    session_ = std::make_unique<LlvmSession>(std::move(benchmark), LlvmActionSpace::PASSES_ALL,
+                                             workingDirectory_);
+  }
+
+  void TearDown() {
+    session_.reset();
+    fs::remove_all(workingDirectory_);
+  }
+
+  int64_t instructionCount() {
+    Observation observation;
+    CRASH_IF_ERROR(
+        session_->getObservation(LlvmObservationSpace::IR_INSTRUCTION_COUNT, &observation));
+    return observation.scalar_int64();
+  }
+
+ protected:
+  fs::path workingDirectory_;
+  std::unique_ptr<LlvmSession> session_;
+};
+
+TEST_F(PassPipelineTest, runPassPipelineChangesModule) {
+  const int64_t before = instructionCount();
+  const uint64_t generation = session_->moduleGeneration();
+
+  ASSERT_OK(session_->runPassPipeline("function(mem2reg,instcombine),globaldce"));
+
+  EXPECT_GT(session_->moduleGeneration(), generation);
+  EXPECT_LT(instructionCount(), before);
+  EXPECT_LLVM_MODULE_VALID(session_->benchmark().module());
+}
+
+TEST_F(PassPipelineTest, invalidPassPipeline) {
+  const uint64_t generation = session_->moduleGeneration();
+
+  const auto status = session_->runPassPipeline("not-a-pass");
+
+  EXPECT_EQ(status.error_code(), grpc::StatusCode::INVALID_ARGUMENT);
+  EXPECT_EQ(session_->moduleGeneration(), generation);
+}
+
+}  // anonymous namespace
+}  // namespace compiler_gym::llvm_service
@@ -0,0 +1,194 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Tests for computing LLVM rewards in the service."""
+import gym
+import pytest
+
+from compiler_gym.envs import LlvmEnv
+from compiler_gym.service import ConnectionOpts
+from tests.test_main import main
+
+pytest_plugins = ["tests.pytest_plugins.llvm"]
+
+ACTIONS = ["-mem2reg", "-simplifycfg", "-instcombine", "-dce", "-mem2reg"]
+
+REWARD_SPACES = [
+    "IrInstructionCount",
+    "IrInstructionCountNorm",
+    "IrInstructionCountO3",
+    "IrInstructionCountOz",
+    "ObjectTextSizeBytes",
+    "ObjectTextSizeNorm",
+    "ObjectTextSizeO3",
+    "ObjectTextSizeOz",
+]
+
+
+@pytest.fixture(scope="function")
+def service_env() -> LlvmEnv:
+    env = gym.make(
+        "llvm-v0", connection_settings=ConnectionOpts(service_side_rewards=True)
+    )
+    try:
+        yield env
+    finally:
+        env.close()
+
+
+def test_service_reward_spaces(service_env: LlvmEnv):
+    assert set(service_env.service.reward_spaces) == set(service_env.reward.spaces)
+
+
+@pytest.mark.parametrize("reward_space", REWARD_SPACES)
+def test_service_side_rewards_match_python_rewards(
+    env: LlvmEnv, service_env: LlvmEnv, reward_space: str
+):
+    for e in [env, service_env]:
+        e.reward_space = reward_space
+        e.reset("cBench-v1/crc32")
+
+    for flag in ACTIONS:
+        action = env.action_space.flags.index(flag)
+        _, expected, _, _ = env.step(action)
+        _, actual, _, _ = service_env.step(action)
+        assert actual == pytest.approx(expected)
+
+    assert service_env.episode_reward == pytest.approx(env.episode_reward)
+
+
+def test_service_side_rewards_match_python_rewards_when_switching_spaces(
+    env: LlvmEnv, service_env: LlvmEnv
+):
+    for e in [env, service_env]:
+        e.reset("cBench-v1/crc32")
+
+    # Change the reward space on every step so that each reward space resumes
+    # from the state that it reached several steps earlier.
+    for i, flag in enumerate(ACTIONS * 4):
+        reward_space = REWARD_SPACES[(i * 3) % len(REWARD_SPACES)]
+        for e in [env, service_env]:
+            e.reward_space = reward_space
+        action = env.action_space.flags.index(flag)
+        _, expected, _, _ = env.step(action)
+        _, actual, _, _ = service_env.step(action)
+        assert actual == pytest.approx(expected), (i, reward_space)
+
+
+@pytest.mark.parametrize("reward_space", REWARD_SPACES)
+def test_reward_view_matches_python_after_service_side_steps(
+    env: LlvmEnv, service_env: LlvmEnv, reward_space: str
+):
+    for e in [env, service_env]:
+        e.reward_space = reward_space
+        e.reset("cBench-v1/crc32")
+
+    for flag in ACTIONS[:2]:
+        action = env.action_space.flags.index(flag)
+        env.step(action)
+        service_env.step(action)
+
+    # Computing the reward on the client must resume from the state that the
+    # service reached.
+    assert service_env.reward[reward_space] == pytest.approx(env.reward[reward_space])
+
+    for flag in ACTIONS[2:]:
+        action = env.action_space.flags.index(flag)
+        _, expected, _, _ = env.step(action)
+        _, actual, _, _ = service_env.step(action)
+        assert actual == pytest.approx(expected)
+
+
+def test_reward_view_before_service_side_steps_matches_python(
+    env: LlvmEnv, service_env: LlvmEnv
+):
+    for e in [env, service_env]:
+        e.reward_space = "IrInstructionCountOz"
+        e.reset("cBench-v1/crc32")
+        e.step(env.action_space.flags.index("-mem2reg"))
+
+    # The reward space is computed on the client, so the service's state for
+    # it is out of date for the rest of the episode.
+    assert service_env.reward["IrInstructionCount"] == pytest.approx(
+        env.reward["IrInstructionCount"]
+    )
+    assert "IrInstructionCount" in service_env.reward.client_side_spaces
+
+    for e in [env, service_env]:
+        e.reward_space = "IrInstructionCount"
+    for flag in ACTIONS[1:]:
+        action = env.action_space.flags.index(flag)
+        _, expected, _, _ = env.step(action)
+        _, actual, _, _ = service_env.step(action)
+        assert actual == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("reward_space", REWARD_SPACES)
+def test_forked_rewards_match_python_rewards(
+    env: LlvmEnv, service_env: LlvmEnv, reward_space: str
+):
+    for e in [env, service_env]:
+        e.reward_space = "IrInstructionCount"
+        e.reset("cBench-v1/crc32")
+        e.step(env.action_space.flags.index("-mem2reg"))
+
+    fkd, service_fkd = env.fork(), service_env.fork()
+    try:
+        for e in [fkd, service_fkd]:
+            e.reward_space = reward_space
+        for flag in ACTIONS[1:]:
+            action = env.action_space.flags.index(flag)
+            _, expected, _, _ = fkd.step(action)
+            _, actual, _, _ = service_fkd.step(action)
+            assert actual == pytest.approx(expected)
+        assert service_fkd.reward["IrInstructionCount"] == pytest.approx(
+            fkd.reward["IrInstructionCount"]
+        )
+    finally:
+        fkd.close()
+        service_fkd.close()
+
+
+def test_service_side_reward_is_reset(service_env: LlvmEnv):
+    service_env.reward_space = "IrInstructionCount"
+    service_env.reset("cBench-v1/crc32")
+    _, first, _, _ = service_env.step(service_env.action_space.flags.index("-mem2reg"))
+
+    service_env.reset("cBench-v1/crc32")
+    assert service_env.episode_reward == 0
+    _, reward, _, _ = service_env.step(service_env.action_space.flags.index("-mem2reg"))
+    assert reward == first
+
+
+def test_service_side_reward_state_is_forked(service_env: LlvmEnv):
+    service_env.reward_space = "IrInstructionCount"
+    service_env.reset("cBench-v1/crc32")
+    service_env.step(service_env.action_space.flags.index("-mem2reg"))
+
+    fkd = service_env.fork()
+    try:
+        action = service_env.action_space.flags.index("-instcombine")
+        _, expected, _, _ = service_env.step(action)
+        _, actual, _, _ = fkd.step(action)
+        assert actual == expected
+        assert fkd.episode_reward == service_env.episode_reward
+    finally:
+        fkd.close()
+
+
+def test_service_side_reward_state_is_restored(service_env: LlvmEnv):
+    service_env.reward_space = "IrInstructionCount"
+    service_env.reset("cBench-v1/crc32")
+    service_env.step(service_env.action_space.flags.index("-mem2reg"))
+    snapshot = service_env.snapshot()
+
+    action = service_env.action_space.flags.index("-instcombine")
+    _, expected, _, _ = service_env.step(action)
+    service_env.restore(snapshot)
+    _, actual, _, _ = service_env.step(action)
+    assert actual == expected
+
+
+if __name__ == "__main__":
+    main()
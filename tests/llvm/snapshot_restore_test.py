@@ -0,0 +1,124 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Tests for CompilerEnv.snapshot() and CompilerEnv.restore()."""
+import pytest
+
+from compiler_gym.envs import LlvmEnv
+from tests.test_main import main
+
+pytest_plugins = ["tests.pytest_plugins.llvm"]
+
+
+def test_restore_returns_to_snapshot_state(env: LlvmEnv):
+    env.reset("cBench-v1/crc32")
+    env.step(env.action_space.flags.index("-mem2reg"))
+    ir = env.ir
+    actions = env.actions.copy()
+
+    snapshot = env.snapshot()
+    env.step(env.action_space.flags.index("-simplifycfg"))
+    env.step(env.action_space.flags.index("-instcombine"))
+    assert env.ir != ir
+
+    env.restore(snapshot)
+    assert env.ir == ir
+    assert env.actions == actions
+
+
+def test_restore_snapshot_multiple_times(env: LlvmEnv):
+    env.reset("cBench-v1/crc32")
+    snapshot = env.snapshot()
+
+    instcounts = []
+    for flag in ["-mem2reg", "-simplifycfg", "-mem2reg"]:
+        env.restore(snapshot)
+        _, _, done, info = env.step(env.action_space.flags.index(flag))
+        assert not done
+        assert not info["action_had_no_effect"]
+        instcounts.append(env.observation["IrInstructionCount"])
+
+    assert instcounts[0] == instcounts[2]
+
+
+def test_restore_matches_replay(env: LlvmEnv):
+    """Test that rewards after a restore match a replay of the episode."""
+    env.reward_space = "IrInstructionCount"
+    env.reset("cBench-v1/crc32")
+    prefix = [env.action_space.flags.index(f) for f in ["-mem2reg", "-gvn"]]
+    action = env.action_space.flags.index("-instcombine")
+
+    for a in prefix:
+        env.step(a)
+    snapshot = env.snapshot()
+    episode_reward = env.episode_reward
+    env.step(env.action_space.flags.index("-simplifycfg"))
+
+    env.restore(snapshot)
+    assert env.episode_reward == episode_reward
+    _, restored_reward, _, _ = env.step(action)
+
+    env.reset("cBench-v1/crc32")
+    for a in prefix:
+        env.step(a)
+    _, replayed_reward, _, _ = env.step(action)
+
+    assert restored_reward == replayed_reward
+
+
+def test_restore_unknown_snapshot(env: LlvmEnv):
+    env.reset("cBench-v1/crc32")
+    with pytest.raises(ValueError, match="Snapshot not found: 1234"):
+        env.restore(1234)
+
+
+def test_reset_discards_snapshots(env: LlvmEnv):
+    env.reset("cBench-v1/crc32")
+    snapshot = env.snapshot()
+    env.reset("cBench-v1/crc32")
+    with pytest.raises(ValueError, match="Snapshot not found"):
+        env.restore(snapshot)
+
+
+def test_least_recently_used_snapshot_is_discarded(env: LlvmEnv):
+    env.reset("cBench-v1/crc32")
+    first = env.snapshot()
+    second = env.snapshot()
+    # Use the first snapshot so that the second is least recently used.
+    env.restore(first)
+    # Fill the service's store of 64 snapshots.
+    for _ in range(62):
+        env.snapshot()
+    env.restore(first)
+    env.snapshot()
+
+    env.restore(first)
+    with pytest.raises(ValueError, match="Snapshot not found"):
+        env.restore(second)
+
+
+def test_client_snapshot_state_is_bounded(env: LlvmEnv):
+    # pylint: disable=protected-access
+    env.reset("cBench-v1/crc32")
+    first = env.snapshot()
+    for _ in range(100):
+        env.snapshot()
+    assert len(env._snapshots) == 64
+    with pytest.raises(ValueError, match="Snapshot not found"):
+        env.restore(first)
+
+
+def test_fork_does_not_share_snapshots(env: LlvmEnv):
+    env.reset("cBench-v1/crc32")
+    snapshot = env.snapshot()
+    fkd = env.fork()
+    try:
+        with pytest.raises(ValueError, match="Snapshot not found"):
+            fkd.restore(snapshot)
+    finally:
+        fkd.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Tests for CompilerEnv.step_async()."""
+import threading
+
+import gym
+import pytest
+
+from compiler_gym.envs import CompilerEnv, LlvmEnv
+from compiler_gym.service import ConnectionOpts, ServiceError
+from tests.test_main import main
+
+pytest_plugins = ["tests.pytest_plugins.llvm"]
+
+
+@pytest.fixture(scope="function", params=[False, True], ids=["unary", "stream"])
+def async_env(request) -> LlvmEnv:
+    env = gym.make(
+        "llvm-v0", connection_settings=ConnectionOpts(step_stream=request.param)
+    )
+    try:
+        yield env
+    finally:
+        env.close()
+
+
+FLAGS = ["-mem2reg", "-simplifycfg", "-instcombine", "-dce", "-mem2reg"]
+
+
+def test_step_async_matches_step(env: LlvmEnv, async_env: LlvmEnv):
+    for e in [env, async_env]:
+        e.observation_space = "IrInstructionCount"
+        e.reward_space = "IrInstructionCount"
+        e.reset("cBench-v1/crc32")
+
+    actions = [env.action_space.flags.index(flag) for flag in FLAGS]
+    futures = [async_env.step_async(action) for action in actions]
+    for action, future in zip(actions, futures):
+        assert future.result()[:3] == env.step(action)[:3]
+
+    assert async_env.actions == actions
+    assert async_env.episode_reward == env.episode_reward
+    assert async_env.ir == env.ir
+
+
+def test_step_waits_for_pending_steps(async_env: LlvmEnv):
+    async_env.reset("cBench-v1/crc32")
+    futures = [async_env.step_async(0) for _ in range(3)]
+    _, _, done, info = async_env.step(1)
+    assert not done, info
+    assert all(future.done() for future in futures)
+    assert async_env.actions == [0, 0, 0, 1]
+
+
+def test_step_many_waits_for_pending_steps(async_env: LlvmEnv):
+    async_env.reset("cBench-v1/crc32")
+    fkd = async_env.fork()
+    try:
+        futures = [async_env.step_async(0) for _ in range(3)]
+        results = CompilerEnv.step_many([async_env, fkd], [1, 1])
+        assert all(future.done() for future in futures)
+        for _, _, done, info in results:
+            assert not done, info
+        assert async_env.actions == [0, 0, 0, 1]
+        assert fkd.actions == [1]
+    finally:
+        fkd.close()
+
+
+def test_step_async_error_does_not_end_episode(async_env: LlvmEnv):
+    async_env.reset("cBench-v1/crc32")
+    bad = async_env.step_async(len(async_env.action_space.flags))
+    good = async_env.step_async(0)
+
+    with pytest.raises(ValueError):
+        bad.result()
+    _, _, done, info = good.result()
+    assert not done, info
+
+
+@pytest.mark.parametrize(
+    "wait_for_failure", [False, True], ids=["submit_first", "fail_first"]
+)
+def test_step_async_failure_ends_episode(
+    async_env: LlvmEnv, monkeypatch, wait_for_failure: bool
+):
+    """Test that the steps after a failed step are not run, whether they are
+    submitted before or after the failure is processed.
+    """
+    async_env.reward_space = "IrInstructionCount"
+    async_env.reset("cBench-v1/crc32")
+    actions = [async_env.action_space.flags.index(flag) for flag in FLAGS]
+
+    # Fail the second step. Unless waiting for the failure, hold the failing
+    # step until all of the steps have been submitted.
+    submitted = threading.Event()
+    receive_step_reply = async_env._receive_step_reply
+    call_count = 0
+
+    def fail_second_step(request, stream):
+        nonlocal call_count
+        call_count += 1
+        if call_count == 2:
+            submitted.wait(timeout=60)
+            raise ServiceError("Injected failure")
+        return receive_step_reply(request, stream)
+
+    monkeypatch.setattr(async_env, "_receive_step_reply", fail_second_step)
+
+    futures = [async_env.step_async(action) for action in actions[:2]]
+    if wait_for_failure:
+        futures[1].result()
+    futures += [async_env.step_async(action) for action in actions[2:]]
+    submitted.set()
+    results = [future.result() for future in futures]
+
+    _, _, done, info = results[0]
+    assert not done, info
+    _, _, done, info = results[1]
+    assert done
+    assert info["error_details"] == "Injected failure"
+    for _, _, done, info in results[2:]:
+        assert done
+        assert info["error_details"] == "Environment was closed by an earlier step"
+
+    assert call_count == 2
+    assert not async_env.in_episode
+    assert async_env.actions == actions[:2]
+
+
+def test_fork_waits_for_pending_steps(async_env: LlvmEnv):
+    async_env.reset("cBench-v1/crc32")
+    for flag in FLAGS:
+        async_env.step_async(async_env.action_space.flags.index(flag))
+
+    fkd = async_env.fork()
+    try:
+        assert fkd.actions == async_env.actions
+        assert fkd.ir == async_env.ir
+    finally:
+        fkd.close()
+
+
+if __name__ == "__main__":
+    main()
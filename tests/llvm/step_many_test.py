@@ -0,0 +1,102 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Tests for CompilerEnv.step_many()."""
+import pytest
+
+from compiler_gym.envs import CompilerEnv, LlvmEnv
+from tests.test_main import main
+
+pytest_plugins = ["tests.pytest_plugins.llvm"]
+
+
+def test_step_many_forked_envs(env: LlvmEnv):
+    env.observation_space = "IrInstructionCount"
+    env.reward_space = "IrInstructionCount"
+    env.reset("cBench-v1/crc32")
+
+    envs = [env] + [env.fork() for _ in range(3)]
+    try:
+        actions = [
+            env.action_space.flags.index(flag)
+            for flag in ["-mem2reg", "-simplifycfg", "-globaldce", "-mem2reg"]
+        ]
+        results = CompilerEnv.step_many(envs, actions)
+        assert len(results) == len(envs)
+
+        for e, action, (observation, reward, done, info) in zip(envs, actions, results):
+            assert not done, info
+            assert e.actions == [action]
+            assert observation == e.observation["IrInstructionCount"]
+            assert e.episode_reward == reward
+
+        # The first and last environments ran the same action.
+        assert results[0][0] == results[3][0]
+        assert results[0][1] == results[3][1]
+    finally:
+        for e in envs[1:]:
+            e.close()
+
+
+def test_step_many_matches_step(env: LlvmEnv):
+    env.observation_space = "Autophase"
+    env.reset("cBench-v1/crc32")
+    a, b = env.fork(), env.fork()
+    try:
+        action = env.action_space.flags.index("-mem2reg")
+        expected, _, _, _ = env.step(action)
+        (observation, _, _, _), _ = CompilerEnv.step_many([a, b], [action, [0, 1]])
+        assert b.actions == [0, 1]
+        assert (observation == expected).all()
+    finally:
+        a.close()
+        b.close()
+
+
+def test_step_many_duplicate_env(env: LlvmEnv):
+    env.reset("cBench-v1/crc32")
+    with pytest.raises(ValueError) as ctx:
+        CompilerEnv.step_many([env, env], [0, 0])
+    assert str(ctx.value) == "Cannot step the same environment twice in a batch"
+
+
+def test_step_many_mismatched_lengths(env: LlvmEnv):
+    env.reset("cBench-v1/crc32")
+    with pytest.raises(ValueError) as ctx:
+        CompilerEnv.step_many([env], [0, 0])
+    assert str(ctx.value) == "Received 1 environments but 2 actions"
+
+
+def test_step_many_invalid_action(env: LlvmEnv):
+    env.observation_space = "IrInstructionCount"
+    env.reward_space = "IrInstructionCount"
+    env.reset("cBench-v1/crc32")
+    envs = [env] + [env.fork() for _ in range(2)]
+    try:
+        invalid_action = env.action_space.n
+        with pytest.raises(ValueError) as ctx:
+            CompilerEnv.step_many(envs, [0, [1, invalid_action], 2])
+        assert str(ctx.value) == f"Action not in action space: {invalid_action}"
+
+        # No environment was stepped, so the environments can still be used
+        # and are in the same state as the service.
+        for e in envs:
+            assert e.in_episode
+            assert e.actions == []
+            assert e.episode_reward == 0
+
+        action = env.action_space.flags.index("-mem2reg")
+        results = CompilerEnv.step_many(envs, [action] * len(envs))
+        for e, (observation, reward, done, info) in zip(envs, results):
+            assert not done, info
+            assert e.actions == [action]
+            assert observation == e.observation["IrInstructionCount"]
+            assert e.episode_reward == reward == results[0][1]
+    finally:
+        for e in envs[1:]:
+            e.close()
+
+
+if __name__ == "__main__":
+    main()
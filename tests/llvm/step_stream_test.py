@@ -0,0 +1,81 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Tests for stepping LLVM environments over a step stream."""
+import gym
+import pytest
+
+from compiler_gym.envs import LlvmEnv
+from compiler_gym.service import ConnectionOpts
+from tests.test_main import main
+
+pytest_plugins = ["tests.pytest_plugins.llvm"]
+
+
+@pytest.fixture(scope="function")
+def stream_env() -> LlvmEnv:
+    env = gym.make("llvm-v0", connection_settings=ConnectionOpts(step_stream=True))
+    try:
+        yield env
+    finally:
+        env.close()
+
+
+def test_step_stream_matches_unary_step(env: LlvmEnv, stream_env: LlvmEnv):
+    for e in [env, stream_env]:
+        e.observation_space = "IrInstructionCount"
+        e.reward_space = "IrInstructionCount"
+        e.reset("cBench-v1/crc32")
+
+    actions = [
+        env.action_space.flags.index(flag)
+        for flag in ["-mem2reg", "-simplifycfg", "-instcombine", "-dce", "-mem2reg"]
+    ]
+    for action in actions:
+        expected = env.step(action)
+        actual = stream_env.step(action)
+        assert actual[:3] == expected[:3]
+        assert actual[3]["action_had_no_effect"] == expected[3]["action_had_no_effect"]
+
+    assert stream_env.actions == actions
+    assert stream_env._step_stream is not None  # pylint: disable=protected-access
+    assert stream_env.ir == env.ir
+
+
+def test_step_stream_recovers_from_error(stream_env: LlvmEnv):
+    # pylint: disable=protected-access
+    stream_env.reset("cBench-v1/crc32")
+    stream_env.step(0)
+    stream = stream_env._step_stream
+    with pytest.raises(ValueError):
+        stream_env.step(len(stream_env.action_space.flags))
+    assert stream.closed
+
+    # A new stream is opened for the next step.
+    _, _, done, info = stream_env.step(0)
+    assert not done, info
+    assert stream_env._step_stream is not stream
+    # The failed action is recorded, as it is for unary steps.
+    assert stream_env.actions[-1] == 0
+
+
+def test_step_stream_survives_reset_and_fork(stream_env: LlvmEnv):
+    stream_env.reset("cBench-v1/crc32")
+    stream_env.step(0)
+    stream_env.reset("cBench-v1/crc32")
+    _, _, done, info = stream_env.step(0)
+    assert not done, info
+
+    fkd = stream_env.fork()
+    try:
+        _, _, done, info = fkd.step(1)
+        assert not done, info
+        assert fkd.actions == [0, 1]
+        assert stream_env.actions == [0]
+    finally:
+        fkd.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -53,6 +53,28 @@ class ThreadedWorkerWithEnv(Thread):
         self.done = True
 
 
+class ForkingWorker(Thread):
+    """Fork an environment, step the fork, then close it, in a background thread."""
+
+    def __init__(self, env: CompilerEnv, actions: List[int]):
+        super().__init__()
+        self.done = False
+        self.env = env
+        self.actions = actions
+        assert actions
+
+    def run(self) -> None:
+        fkd = self.env.fork()
+        try:
+            for action in self.actions:
+                _, _, done, info = fkd.step(action)
+                assert not done, info["error_details"]
+        finally:
+            fkd.close()
+
+        self.done = True
+
+
 def test_running_environment_in_background_thread():
     """Test launching and running an LLVM environment in a background thread."""
     thread = ThreadedWorker(
@@ -89,5 +111,29 @@ def test_moving_environment_to_background_thread():
     env.close()
 
 
+def test_concurrent_forks_of_one_service():
+    """Test forking, stepping, and closing many sessions of a single service
+    concurrently from background threads.
+    """
+    env = gym.make("llvm-autophase-ic-v0")
+    try:
+        env.reset(benchmark="cBench-v1/crc32")
+
+        threads = [ForkingWorker(env=env, actions=[0, 0, 0]) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=60)
+
+        assert all(thread.done for thread in threads)
+
+        # The parent session is unaffected by its forks.
+        assert env.actions == []
+        _, _, done, info = env.step(0)
+        assert not done, info["error_details"]
+    finally:
+        env.close()
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,135 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Tests for the LLVM service's --transposition_table_size flag."""
+from pathlib import Path
+
+import gym
+import pytest
+
+from compiler_gym.envs import LlvmEnv, llvm
+from tests.test_main import main
+
+pytest_plugins = ["tests.pytest_plugins.llvm"]
+
+FLAGS = ["-mem2reg", "-simplifycfg", "-mem2reg", "-instcombine", "-dce"]
+
+BASELINE_OBSERVATION_SPACES = [
+    "IrInstructionCountO0",
+    "IrInstructionCountO3",
+    "IrInstructionCountOz",
+    "ObjectTextSizeO0",
+    "ObjectTextSizeO3",
+    "ObjectTextSizeOz",
+]
+
+
+@pytest.fixture(scope="function")
+def transposition_env(monkeypatch) -> LlvmEnv:
+    monkeypatch.setenv("COMPILER_GYM_SERVICE_ARGS", "--transposition_table_size=128")
+    env = gym.make("llvm-v0")
+    try:
+        yield env
+    finally:
+        env.close()
+
+
+def test_transposition_table_step_results_match(
+    env: LlvmEnv, transposition_env: LlvmEnv
+):
+    """Test that steps served from the transposition table match steps that
+    run the actions.
+    """
+    for e in [env, transposition_env]:
+        e.observation_space = "ModuleHash"
+        e.reward_space = "IrInstructionCount"
+
+    env.reset("cBench-v1/crc32")
+    actions = [env.action_space.flags.index(flag) for flag in FLAGS]
+    expected = [env.step(action)[:3] for action in actions]
+
+    # The first episode populates the table, the second is served from it.
+    for _ in range(2):
+        transposition_env.reset("cBench-v1/crc32")
+        for action, result in zip(actions, expected):
+            assert transposition_env.step(action)[:3] == result
+        assert transposition_env.ir == env.ir
+
+
+def test_transposition_table_is_shared_by_forks(transposition_env: LlvmEnv):
+    transposition_env.reset("cBench-v1/crc32")
+    action = transposition_env.action_space.flags.index("-mem2reg")
+
+    fkd = transposition_env.fork()
+    try:
+        transposition_env.step(action)
+        _, _, done, info = fkd.step(action)
+        assert not done
+        assert not info["action_had_no_effect"]
+        assert (
+            fkd.observation["ModuleHash"] == transposition_env.observation["ModuleHash"]
+        )
+        assert fkd.ir == transposition_env.ir
+    finally:
+        fkd.close()
+
+
+def test_transposition_table_action_had_no_effect_matches(
+    env: LlvmEnv, transposition_env: LlvmEnv
+):
+    """Test that steps served from the transposition table report whether the
+    action had an effect in the same way as steps that run the actions.
+    """
+    flags = FLAGS + ["-instcombine", "-simplifycfg", "-dce", "-mem2reg", "-sroa"]
+    actions = [env.action_space.flags.index(flag) for flag in flags]
+
+    env.reset("cBench-v1/crc32")
+    expected = [env.step(action)[3]["action_had_no_effect"] for action in actions]
+    assert any(expected) and not all(expected)
+
+    # The first episode populates the table, the second is served from it.
+    for _ in range(2):
+        transposition_env.reset("cBench-v1/crc32")
+        actual = [
+            transposition_env.step(action)[3]["action_had_no_effect"]
+            for action in actions
+        ]
+        assert actual == expected
+
+
+def test_baseline_observations_are_not_shared_between_benchmarks(
+    env: LlvmEnv, transposition_env: LlvmEnv, tmp_path: Path
+):
+    """Test that two benchmarks that reach the same module observe their own
+    baseline costs.
+    """
+    # The stack variable in the second benchmark is promoted to a register
+    # and removed by -mem2reg, leaving the same module as the first.
+    (tmp_path / "a.c").write_text("int A(int x) { return x; }")
+    (tmp_path / "b.c").write_text("int A(int x) { int y = x; return x; }")
+    benchmarks = [
+        llvm.make_benchmark(tmp_path / "a.c"),
+        llvm.make_benchmark(tmp_path / "b.c"),
+    ]
+    action = env.action_space.flags.index("-mem2reg")
+
+    module_hashes = []
+    for benchmark in benchmarks:
+        env.reset(benchmark=benchmark)
+        expected = env.observation.get_many(BASELINE_OBSERVATION_SPACES)
+
+        transposition_env.reset(benchmark=benchmark)
+        _, _, done, info = transposition_env.step(action)
+        assert not done, info
+        module_hashes.append(transposition_env.observation["ModuleHash"])
+        assert (
+            transposition_env.observation.get_many(BASELINE_OBSERVATION_SPACES)
+            == expected
+        )
+
+    assert module_hashes[0] == module_hashes[1]
+
+
+if __name__ == "__main__":
+    main()
@@ -131,3 +131,9 @@ def llvm_diff() -> Path:
 def clang() -> Path:
     """Test fixture that yields the path of clang."""
     return llvm.clang_path()
+
+
+@pytest.fixture(scope="module")
+def llvm_size() -> Path:
+    """Test fixture that yields the path of llvm-size."""
+    return llvm.llvm_size_path()
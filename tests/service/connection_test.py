@@ -3,6 +3,8 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 """Unit tests for //compiler_gym/service:connection."""
+from pathlib import Path
+
 import gym
 import pytest
 
@@ -95,5 +97,52 @@ def test_call_stub_negative_timeout(connection: CompilerGymServiceConnection):
     assert str(ctx.value) == "Deadline Exceeded (-10.0 seconds)"
 
 
+def test_ready_pipe_connection():
+    env = gym.make(
+        "llvm-v0", connection_settings=ConnectionOpts(local_service_ready_pipe=True)
+    )
+    try:
+        env.reset("cBench-v1/crc32")
+        _, _, done, info = env.step(0)
+        assert not done, info["error_details"]
+    finally:
+        env.close()
+
+
+def test_unix_socket_connection():
+    env = gym.make(
+        "llvm-v0", connection_settings=ConnectionOpts(local_service_unix_socket=True)
+    )
+    try:
+        assert env.service.connection.url.startswith("unix:")
+        env.reset("cBench-v1/crc32")
+        _, _, done, info = env.step(0)
+        assert not done, info["error_details"]
+        assert env.observation["Ir"]
+    finally:
+        env.close()
+
+
+def test_ready_pipe_service_terminated(tmp_path: Path):
+    """Test that a service that exits without writing to the ready pipe is
+    detected without waiting for the port timeout.
+    """
+    service = tmp_path / "service.sh"
+    with open(service, "w") as f:
+        f.write("#!/bin/sh\nexit 1\n")
+    service.chmod(0o755)
+
+    with pytest.raises(ServiceError) as ctx:
+        CompilerGymServiceConnection(
+            service,
+            ConnectionOpts(
+                init_max_attempts=1,
+                local_service_ready_pipe=True,
+                local_service_port_init_max_seconds=300,
+            ),
+        )
+    assert "Service terminated with returncode: 1" in str(ctx.value)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,206 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Unit tests for //compiler_gym/service:service_pool."""
+from time import sleep, time
+
+import gym
+import pytest
+
+import compiler_gym.envs  # noqa Register LLVM environments.
+from compiler_gym.datasets import Benchmark
+from compiler_gym.envs.llvm import LLVM_SERVICE_BINARY
+from compiler_gym.service import ConnectionOpts, ServiceIsClosed, ServicePool
+from compiler_gym.util.runfiles_path import runfiles_path
+from tests.test_main import main
+
+EXAMPLE_BITCODE_FILE = runfiles_path(
+    "compiler_gym/third_party/cBench/cBench-v1/crc32.bc"
+)
+
+
+def wait_for_idle(pool: ServicePool, count: int, timeout: float = 60) -> None:
+    """Wait until the pool has at least `count` idle connections."""
+    end_time = time() + timeout
+    while pool.idle_count < count:
+        assert time() < end_time, f"{pool} did not fill within {timeout} seconds"
+        sleep(0.05)
+
+
+def test_invalid_size():
+    with pytest.raises(ValueError) as ctx:
+        ServicePool(LLVM_SERVICE_BINARY, size=0)
+    assert str(ctx.value) == "ServicePool size must be at least 1, received: 0"
+
+
+def test_pool_fills_in_background():
+    with ServicePool(LLVM_SERVICE_BINARY, size=2) as pool:
+        wait_for_idle(pool, 2)
+        assert pool.idle_count == 2
+
+
+def test_acquire_release():
+    with ServicePool(LLVM_SERVICE_BINARY, size=1) as pool:
+        wait_for_idle(pool, 1)
+        connection = pool.acquire()
+        assert not connection.closed
+
+        pool.release(connection)
+        assert not connection.closed
+        assert pool.idle_count >= 1
+
+
+def test_release_to_full_pool_closes_connection():
+    with ServicePool(LLVM_SERVICE_BINARY, size=1) as pool:
+        connection = pool.acquire()
+        wait_for_idle(pool, 1)
+
+        pool.release(connection)
+        assert connection.closed
+        assert pool.idle_count == 1
+
+
+def test_close_pool():
+    pool = ServicePool(LLVM_SERVICE_BINARY, size=1)
+    wait_for_idle(pool, 1)
+    pool.close()
+
+    assert pool.closed
+    assert pool.idle_count == 0
+    with pytest.raises(ServiceIsClosed):
+        pool.acquire()
+
+
+def test_env_reuses_pooled_connection():
+    with ServicePool(LLVM_SERVICE_BINARY, size=1) as pool:
+        wait_for_idle(pool, 1)
+        env = gym.make("llvm-v0", service_pool=pool)
+        try:
+            connection = env.service
+            env.reset("cBench-v1/crc32")
+            env.step(0)
+        finally:
+            env.close()
+
+        # The connection is returned to the pool rather than closed.
+        assert not connection.closed
+
+        env = gym.make("llvm-v0", service_pool=pool)
+        try:
+            env.reset("cBench-v1/crc32")
+            assert env.actions == []
+        finally:
+            env.close()
+
+
+def test_fork_shares_pool():
+    with ServicePool(LLVM_SERVICE_BINARY, size=1) as pool:
+        env = gym.make("llvm-v0", service_pool=pool)
+        try:
+            env.reset("cBench-v1/crc32")
+            fkd = env.fork()
+            try:
+                assert fkd.service is env.service
+            finally:
+                fkd.close()
+            # Closing the fork does not release the shared connection.
+            assert not env.service.closed
+        finally:
+            env.close()
+
+
+def test_env_does_not_release_failed_service_to_pool():
+    with ServicePool(LLVM_SERVICE_BINARY, size=1) as pool:
+        wait_for_idle(pool, 1)
+        env = gym.make("llvm-v0", service_pool=pool)
+        try:
+            connection = env.service
+            env.reset("cBench-v1/crc32")
+            connection.connection.process.kill()
+
+            _, _, done, info = env.step(0)
+            assert done, info
+            # The connection is closed rather than returned to the pool.
+            assert connection.closed
+        finally:
+            env.close()
+
+        env = gym.make("llvm-v0", service_pool=pool)
+        try:
+            assert env.service is not connection
+            env.reset("cBench-v1/crc32")
+            _, _, done, info = env.step(0)
+            assert not done, info
+        finally:
+            env.close()
+
+
+def test_released_service_does_not_keep_custom_benchmarks():
+    benchmark = Benchmark.from_file("benchmark://new", EXAMPLE_BITCODE_FILE)
+    with ServicePool(LLVM_SERVICE_BINARY, size=1) as pool:
+        env = gym.make("llvm-v0", service_pool=pool)
+        try:
+            connection = env.service
+            env.reset(benchmark=benchmark)
+            assert env.benchmark == "benchmark://new"
+        finally:
+            env.close()
+
+        # The service that received the custom benchmark is not reused.
+        assert connection.closed
+
+        env = gym.make("llvm-v0", service_pool=pool)
+        try:
+            assert env.service is not connection
+            with pytest.raises(ValueError, match="Unknown benchmark"):
+                env.reset(benchmark="benchmark://new")
+        finally:
+            env.close()
+
+
+def test_pool_keys_connections_by_opts():
+    opts = ConnectionOpts(rpc_call_max_seconds=600)
+    with ServicePool(LLVM_SERVICE_BINARY, size=1) as pool:
+        wait_for_idle(pool, 1)
+        connection = pool.acquire(opts)
+        try:
+            assert connection.opts == opts
+        finally:
+            pool.release(connection)
+        assert not connection.closed
+
+        # The idle connection is only leased to callers with the same options.
+        default = pool.acquire()
+        try:
+            assert default is not connection
+            assert default.opts == pool.opts
+        finally:
+            pool.release(default)
+
+        env = gym.make("llvm-v0", service_pool=pool, connection_settings=opts)
+        try:
+            assert env.service is connection
+        finally:
+            env.close()
+
+
+def test_pool_does_not_reuse_terminated_service():
+    with ServicePool(LLVM_SERVICE_BINARY, size=1) as pool:
+        connection = pool.acquire()
+        connection.connection.process.kill()
+        connection.connection.process.wait()
+
+        pool.release(connection)
+        assert connection.closed
+
+        replacement = pool.acquire()
+        try:
+            assert replacement is not connection
+            assert not replacement.closed
+        finally:
+            pool.release(replacement)
+
+
+if __name__ == "__main__":
+    main()
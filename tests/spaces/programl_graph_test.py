@@ -0,0 +1,103 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Unit tests for //compiler_gym/spaces:programl_graph."""
+import numpy as np
+import pytest
+
+from compiler_gym.spaces import ProgramlGraph
+from tests.test_main import main
+
+
+def encode(nodes, edges, functions, strings) -> bytes:
+    """Encode a graph in the ProgramlBinary format."""
+    string_table = "".join(strings).encode("utf-8")
+    string_offsets = np.cumsum([0] + [len(s.encode("utf-8")) for s in strings])
+    header = [len(nodes), len(edges), len(functions), len(strings), len(string_table)]
+    node_arrays = np.array(nodes, dtype="<i4").reshape(-1, 4).T
+    edge_arrays = np.array(edges, dtype="<i4").reshape(-1, 4).T
+    return (
+        np.array(header, dtype="<i8").tobytes()
+        + node_arrays.tobytes()
+        + edge_arrays.tobytes()
+        + np.array(functions, dtype="<i4").tobytes()
+        + np.array(string_offsets, dtype="<i4").tobytes()
+        + string_table
+    )
+
+
+@pytest.fixture(scope="function")
+def graph() -> ProgramlGraph:
+    # Nodes are (type, text, function, block). Edges are (flow, position,
+    # source, target).
+    return ProgramlGraph.from_bytes(
+        encode(
+            nodes=[(0, 0, 0, 0), (0, 1, 0, 0), (1, 2, 0, 0)],
+            edges=[(0, 0, 0, 1), (1, 0, 2, 1), (1, 1, 0, 2)],
+            functions=[3],
+            strings=["[external]", "add", "i32", "main"],
+        )
+    )
+
+
+def test_from_bytes(graph: ProgramlGraph):
+    assert graph.num_nodes == 3
+    assert graph.num_edges == 3
+    assert graph.node_type.tolist() == [0, 0, 1]
+    assert [graph.text(i) for i in range(3)] == ["[external]", "add", "i32"]
+    assert graph.edge_index.tolist() == [[0, 2, 0], [1, 1, 2]]
+    assert graph.edge_flow.tolist() == [0, 1, 1]
+    assert graph.edge_position.tolist() == [0, 0, 1]
+    assert graph.strings[graph.function_name[0]] == "main"
+
+
+def test_from_bytes_empty_graph():
+    graph = ProgramlGraph.from_bytes(encode([], [], [], []))
+    assert graph.num_nodes == 0
+    assert graph.num_edges == 0
+    assert graph.edge_index.shape == (2, 0)
+
+
+def test_adjacency(graph: ProgramlGraph):
+    indptr, indices = graph.adjacency()
+    assert indptr.tolist() == [0, 2, 2, 3]
+    assert indices.tolist() == [1, 2, 1]
+
+
+def test_adjacency_by_flow(graph: ProgramlGraph):
+    indptr, indices = graph.adjacency(flow=1)
+    assert indptr.tolist() == [0, 1, 1, 2]
+    assert indices.tolist() == [2, 1]
+
+
+def test_to_networkx(graph: ProgramlGraph):
+    nx_graph = graph.to_networkx()
+    assert nx_graph.number_of_nodes() == 3
+    assert nx_graph.number_of_edges() == 3
+    assert nx_graph.nodes[2] == {"block": 0, "function": 0, "text": "i32", "type": 1}
+    assert nx_graph.edges[2, 1, 0] == {"flow": 1, "position": 0}
+
+
+def test_concatenate(graph: ProgramlGraph):
+    batch = ProgramlGraph.concatenate([graph, graph])
+    assert batch.num_nodes == 6
+    assert batch.num_edges == 6
+    assert batch.edge_index.tolist() == [[0, 2, 0, 3, 5, 3], [1, 1, 2, 4, 4, 5]]
+    assert batch.node_function.tolist() == [0, 0, 0, 1, 1, 1]
+    assert [batch.text(i) for i in range(6)] == ["[external]", "add", "i32"] * 2
+    assert batch.strings == graph.strings
+
+
+def test_concatenate_empty_list():
+    with pytest.raises(ValueError, match="No graphs to concatenate"):
+        ProgramlGraph.concatenate([])
+
+
+def test_equality(graph: ProgramlGraph):
+    assert graph == ProgramlGraph.concatenate([graph])
+    assert graph != ProgramlGraph.concatenate([graph, graph])
+
+
+if __name__ == "__main__":
+    main()
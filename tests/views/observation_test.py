@@ -3,10 +3,13 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 """Unit tests for //compiler_gym/views."""
+from pathlib import Path
+
 import numpy as np
 import pytest
 from gym.spaces import Box
 
+from compiler_gym.service import ServiceError
 from compiler_gym.service.proto import (
     DoubleList,
     Int64List,
@@ -15,6 +18,7 @@ from compiler_gym.service.proto import (
     ScalarLimit,
     ScalarRange,
     ScalarRangeList,
+    SharedMemoryBuffer,
     StepRequest,
 )
 from compiler_gym.views import ObservationView
@@ -196,5 +200,273 @@ def test_add_derived_space():
     ]
 
 
+def test_deterministic_observations_are_cached():
+    spaces = [
+        ObservationSpace(
+            name="ir",
+            string_size_range=ScalarRange(min=ScalarLimit(value=0)),
+            deterministic=True,
+        ),
+    ]
+    mock = MockGetObservation(
+        ret=[
+            Observation(string_value="Hello, world!"),
+            Observation(string_value="Goodbye, world!"),
+        ],
+    )
+    observation = ObservationView(mock, spaces)
+
+    assert observation["ir"] == "Hello, world!"
+    assert observation["ir"] == "Hello, world!"
+    assert mock.called_observation_spaces == [0]
+
+    observation.invalidate()
+    assert observation["ir"] == "Goodbye, world!"
+    assert mock.called_observation_spaces == [0, 0]
+
+
+def test_cached_arrays_are_read_only():
+    features_range = ScalarRangeList(
+        range=[
+            ScalarRange(min=ScalarLimit(value=-100), max=ScalarLimit(value=100)),
+            ScalarRange(min=ScalarLimit(value=-100), max=ScalarLimit(value=100)),
+        ]
+    )
+    spaces = [
+        ObservationSpace(
+            name="features",
+            int64_range_list=features_range,
+            deterministic=True,
+        ),
+        ObservationSpace(
+            name="runtime",
+            int64_range_list=features_range,
+            deterministic=False,
+        ),
+    ]
+    mock = MockGetObservation(
+        ret=[
+            Observation(int64_list=Int64List(value=[1, 2])),
+            Observation(int64_list=Int64List(value=[3, 4])),
+        ],
+    )
+    observation = ObservationView(mock, spaces)
+    observation.add_derived_space(
+        id="features_sum",
+        base_id="features",
+        translate=lambda base: base.sum(),
+    )
+
+    features = observation["features"]
+    with pytest.raises(ValueError):
+        features += 1
+    np.testing.assert_array_equal(observation["features"], [1, 2])
+    assert observation["features_sum"] == 3
+    assert mock.called_observation_spaces == [0]
+
+    # Observations that are not cached can be modified.
+    runtime = observation["runtime"]
+    runtime += 1
+    np.testing.assert_array_equal(runtime, [4, 5])
+
+
+def test_derived_spaces_share_base_observation():
+    spaces = [
+        ObservationSpace(
+            name="ir",
+            string_size_range=ScalarRange(min=ScalarLimit(value=0)),
+            deterministic=True,
+        ),
+    ]
+    mock = MockGetObservation(ret=[Observation(string_value="Hello, world!")])
+    observation = ObservationView(mock, spaces)
+    observation.add_derived_space(
+        id="words",
+        base_id="ir",
+        translate=lambda base: base.split(),
+    )
+    words_translated = []
+    observation.add_derived_space(
+        id="word_count",
+        base_id="words",
+        translate=lambda words: words_translated.append(words) or len(words),
+    )
+
+    assert observation["word_count"] == 2
+    assert observation["words"] == ["Hello,", "world!"]
+    assert observation["ir"] == "Hello, world!"
+    assert observation["word_count"] == 2
+
+    # The base observation is fetched once, and each derived observation is
+    # computed once.
+    assert mock.called_observation_spaces == [0]
+    assert len(words_translated) == 1
+
+
+def test_nondeterministic_observations_are_not_cached():
+    spaces = [
+        ObservationSpace(
+            name="path",
+            string_size_range=ScalarRange(min=ScalarLimit(value=0)),
+            deterministic=False,
+        ),
+    ]
+    mock = MockGetObservation(
+        ret=[
+            Observation(string_value="/tmp/a"),
+            Observation(string_value="/tmp/b"),
+        ],
+    )
+    observation = ObservationView(mock, spaces)
+
+    assert observation["path"] == "/tmp/a"
+    assert observation["path"] == "/tmp/b"
+    assert mock.called_observation_spaces == [0, 0]
+
+
+def test_get_many():
+    spaces = [
+        ObservationSpace(
+            name="ir",
+            string_size_range=ScalarRange(min=ScalarLimit(value=0)),
+            deterministic=True,
+        ),
+        ObservationSpace(
+            name="features",
+            int64_range_list=ScalarRangeList(
+                range=[
+                    ScalarRange(
+                        min=ScalarLimit(value=-100), max=ScalarLimit(value=100)
+                    ),
+                ]
+            ),
+            deterministic=True,
+        ),
+    ]
+    requests = []
+
+    def get_observation(request: StepRequest):
+        requests.append(list(request.observation_space))
+        values = {
+            0: Observation(string_value="Hello, world!"),
+            1: Observation(int64_list=Int64List(value=[5])),
+        }
+        reply = MockGetObservationReply(None)
+        reply.observation = [values[i] for i in request.observation_space]
+        return reply
+
+    observation = ObservationView(get_observation, spaces)
+    observation.add_derived_space(
+        id="ir_len",
+        base_id="ir",
+        translate=len,
+    )
+
+    ir, features, ir_len = observation.get_many(["ir", "features", "ir_len"])
+    assert ir == "Hello, world!"
+    np.testing.assert_array_equal(features, [5])
+    assert ir_len == len("Hello, world!")
+
+    # The observations were fetched using a single request.
+    assert requests == [[0, 1]]
+
+    # Cached observations are not fetched again.
+    assert observation.get_many(["ir_len", "features"])[0] == ir_len
+    assert requests == [[0, 1]]
+
+
+def test_get_many_invalid_observation_name():
+    spaces = [
+        ObservationSpace(
+            name="ir",
+            string_size_range=ScalarRange(min=ScalarLimit(value=0)),
+        )
+    ]
+    mock = MockGetObservation()
+    observation = ObservationView(mock, spaces)
+    with pytest.raises(KeyError):
+        observation.get_many(["ir", "invalid"])
+    assert not mock.called_observation_spaces
+
+
+def test_shared_memory_observations(tmp_path: Path):
+    spaces = [
+        ObservationSpace(
+            name="ir",
+            string_size_range=ScalarRange(min=ScalarLimit(value=0)),
+        ),
+        ObservationSpace(
+            name="binary",
+            binary_size_range=ScalarRange(min=ScalarLimit(value=0)),
+        ),
+    ]
+    with open(tmp_path / "ir.bin", "wb") as f:
+        f.write(b"Hello, IR")
+    with open(tmp_path / "binary.bin", "wb") as f:
+        f.write(b"headerHello, bytes\0")
+    mock = MockGetObservation(
+        ret=[
+            Observation(
+                shared_memory_buffer=SharedMemoryBuffer(
+                    path=str(tmp_path / "ir.bin"), offset=0, length=9
+                )
+            ),
+            Observation(
+                shared_memory_buffer=SharedMemoryBuffer(
+                    path=str(tmp_path / "binary.bin"), offset=6, length=13
+                )
+            ),
+        ]
+    )
+    observation = ObservationView(mock, spaces)
+
+    value = observation["ir"]
+    assert isinstance(value, str)
+    assert value == "Hello, IR"
+
+    value = observation["binary"]
+    assert isinstance(value, memoryview)
+    assert value == b"Hello, bytes\0"
+
+    # The client takes ownership of the shared memory files.
+    assert not list(tmp_path.iterdir())
+
+
+def test_shared_memory_files_are_deleted_on_error(tmp_path: Path):
+    """Test that the shared memory files of a reply are deleted when the reply
+    cannot be translated.
+    """
+    spaces = [
+        ObservationSpace(
+            name="ir",
+            string_size_range=ScalarRange(min=ScalarLimit(value=0)),
+        ),
+    ]
+    for name in ["a.bin", "b.bin"]:
+        with open(tmp_path / name, "wb") as f:
+            f.write(b"Hello, IR")
+
+    class MockGetTwoObservations(object):
+        def __call__(self, request: StepRequest):
+            reply = MockGetObservationReply(None)
+            reply.observation = [
+                Observation(
+                    shared_memory_buffer=SharedMemoryBuffer(
+                        path=str(tmp_path / name), offset=0, length=9
+                    )
+                )
+                for name in ["a.bin", "b.bin"]
+            ]
+            return reply
+
+    observation = ObservationView(MockGetTwoObservations(), spaces)
+
+    # The reply contains more observations than were requested.
+    with pytest.raises(ServiceError, match="Requested 1 observations"):
+        observation["ir"]
+
+    assert not list(tmp_path.iterdir())
+
+
 if __name__ == "__main__":
     main()